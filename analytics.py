@@ -0,0 +1,64 @@
+"""Column-oriented access to workout logs for vectorized analysis.
+
+All quantities are in the canonical units stored at write time:
+meters, seconds and seconds per kilometer. Missing values are NaN.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+from storage import StorageBackend
+
+# Numeric columns returned by load_log_arrays, in iter_log_values order
+LOG_COLUMNS = (
+    ("week", np.int32),
+    ("day", np.int8),
+    ("distance_m", np.float64),
+    ("duration_s", np.float64),
+    ("pace_s_per_km", np.float64),
+    ("intensity", np.float64),
+)
+
+def load_log_arrays(db: StorageBackend, plan_id: Optional[str] = None,
+                    session_id: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Load a plan's or session's logs as contiguous per-column arrays
+    
+    Besides the LOG_COLUMNS arrays, "plan" holds an int32 index into
+    "plan_ids" for each log. An archived plan's arrays are read-only
+    views of its memory-mapped archive file.
+    """
+    if plan_id is not None:
+        archive = db.open_archive(plan_id)
+        if archive is not None:
+            return archive.log_arrays()
+    
+    plan_ids = {}
+    plan_codes = []
+    blocks = []
+    for rows in db.iter_log_values(plan_id=plan_id, session_id=session_id):
+        plan_codes.append(np.fromiter(
+            (plan_ids.setdefault(row[0], len(plan_ids)) for row in rows),
+            dtype=np.int32, count=len(rows)))
+        # None becomes NaN when converting to a float array
+        blocks.append(np.array([row[1:] for row in rows], dtype=np.float64))
+    
+    data = np.concatenate(blocks) if blocks else np.empty((0, len(LOG_COLUMNS)))
+    arrays = {
+        name: np.ascontiguousarray(data[:, i]) if dtype == np.float64
+        else data[:, i].astype(dtype)
+        for i, (name, dtype) in enumerate(LOG_COLUMNS)
+    }
+    arrays["plan"] = np.concatenate(plan_codes) if plan_codes else np.empty(0, dtype=np.int32)
+    arrays["plan_ids"] = np.array(list(plan_ids), dtype=object)
+    return arrays
+
+def weekly_totals(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Sum distance and duration per week number, ignoring missing values"""
+    weeks = arrays["week"]
+    size = int(weeks.max()) + 1 if len(weeks) else 1
+    return {
+        "week": np.arange(1, size),
+        "distance_m": np.bincount(weeks, np.nan_to_num(arrays["distance_m"]), size)[1:],
+        "duration_s": np.bincount(weeks, np.nan_to_num(arrays["duration_s"]), size)[1:],
+        "workouts": np.bincount(weeks, minlength=size)[1:],
+    }
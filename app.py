@@ -1,11 +1,30 @@
 import dash
 import dash_bootstrap_components as dbc
-from database import Database
+import config
+from cache import RenderCache
+from storage import open_storage
+from templates import TemplateEngine
 from layouts import get_layout
 from callbacks import register_callbacks
+from export import register_export_routes
+from metrics import MetricsRegistry, instrument_callbacks, instrument_database, register_metrics_route
 
-# Initialize database
-db = Database("krunner.db")
+# Initialize storage (one SQLite file unless KRUNNER_STORAGE says otherwise)
+db = open_storage(config.STORAGE, config.DB_PATH, config.DB_SHARDS,
+                  pool_size=config.DB_POOL_SIZE,
+                  pool_timeout=config.DB_POOL_TIMEOUT_S,
+                  max_streams=config.DB_MAX_EXPORTS,
+                  busy_timeout=config.DB_BUSY_TIMEOUT_MS,
+                  write_retries=config.DB_WRITE_RETRIES,
+                  write_behind=config.DB_WRITE_BEHIND,
+                  maintenance_interval=config.MAINTENANCE_INTERVAL_S,
+                  purge_deleted_after_days=config.PURGE_DELETED_AFTER_DAYS)
+
+# Rendered training grids, reused until a plan's revision changes
+grid_cache = RenderCache(maxsize=256)
+
+# Workout templates compiled from the database; edits apply without a restart
+templates = TemplateEngine(db)
 
 # Initialize Dash app
 app = dash.Dash(
@@ -16,12 +35,31 @@ app = dash.Dash(
 )
 
 # Set layout
-app.layout = get_layout()
+app.layout = get_layout(sync_interval_ms=config.SYNC_INTERVAL_MS)
 
 # Register callbacks
-register_callbacks(app, db)
+register_callbacks(app, db, grid_cache, templates,
+                   soft_delete=config.PURGE_DELETED_AFTER_DAYS > 0)
+
+# Streaming CSV / JSON-lines downloads
+register_export_routes(app.server, db)
+
+# Latency metrics on /metrics and the slow-query log, both opt-in
+if config.METRICS or config.SLOW_QUERY_MS:
+    registry = MetricsRegistry() if config.METRICS else None
+    instrument_database(db, registry, slow_query_ms=config.SLOW_QUERY_MS)
+    if registry is not None:
+        instrument_callbacks(app, registry)
+        registry.add_collector(lambda: [("krunner_grid_cache_" + k, {}, v) for k, v in grid_cache.stats().items()])
+        registry.add_collector(lambda: [("krunner_write_behind_" + k, {}, v) for k, v in db.write_behind_stats().items()])
+        registry.add_collector(lambda: [("krunner_maintenance_" + k, {}, v) for k, v in db.maintenance_stats().items()])
+        registry.add_collector(lambda: [("krunner_db_storage_" + k, {}, v) for k, v in db.storage_stats().items()])
+        register_metrics_route(app.server, registry)
+
+# WSGI entry point for production servers: gunicorn -c gunicorn.conf.py app:server
+server = app.server
 
 if __name__ == "__main__":
     print("🏃 Starting Krunner...")
-    print("📍 Navigate to: http://localhost:8050")
-    app.run(debug=True, host="0.0.0.0", port=8050)
+    print(f"📍 Navigate to: http://localhost:{config.PORT}")
+    app.run(debug=config.DEBUG, host=config.HOST, port=config.PORT)
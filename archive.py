@@ -0,0 +1,216 @@
+"""Compact columnar files holding the workout logs of archived plans.
+
+One file per plan, laid out as
+
+    b"KRLA" | header length (uint32) | JSON header | columns...
+
+Numeric columns are fixed-width little-endian arrays, 8-byte aligned,
+read in place through mmap as zero-copy NumPy views. Strings (ids,
+notes, timestamps) are a pool of UTF-8 bytes plus uint32 offsets, and
+distance units are dictionary-encoded as uint8 codes. Missing numbers
+are NaN; missing strings are flagged in a per-column validity array.
+
+Usage:
+    python archive.py                      # archive plans finished over 14 days ago
+    python archive.py --grace-days 30
+    python archive.py --plan <plan_id>     # archive one plan now
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"KRLA"
+FORMAT_VERSION = 1
+ALIGN = 8
+
+# (column, dtype) stored as fixed-width arrays
+NUMERIC_COLUMNS = (
+    ("week", "<i4"),
+    ("day", "i1"),
+    ("actual_time", "<f8"),
+    ("actual_distance", "<f8"),
+    ("actual_pace", "<f8"),
+    ("intensity", "<f8"),
+    ("distance_m", "<f8"),
+    ("duration_s", "<f8"),
+    ("pace_s_per_km", "<f8"),
+)
+STRING_COLUMNS = ("id", "notes", "created_at", "updated_at")
+CODED_COLUMNS = ("distance_unit",)
+
+# workout_logs column order, so restored rows and dicts match SELECT *
+LOG_FIELDS = ("id", "plan_id", "week", "day", "actual_time", "actual_distance", "actual_pace",
+              "distance_unit", "intensity", "notes", "created_at", "updated_at",
+              "distance_m", "duration_s", "pace_s_per_km")
+
+def archive_path(archive_dir: str, plan_id: str) -> str:
+    """File holding a plan's archived logs"""
+    return os.path.join(archive_dir, f"{plan_id}.krla")
+
+def write_archive(path: str, plan: Dict, logs: List[Dict]):
+    """Write a plan and its logs (sorted by week, day) to an archive file atomically"""
+    blocks: List[Tuple[str, bytes]] = []
+    
+    def add(name: str, data: bytes):
+        blocks.append((name, data))
+    
+    for name, dtype in NUMERIC_COLUMNS:
+        values = [log[name] for log in logs]
+        add(name, np.array([np.nan if v is None else v for v in values], dtype=dtype).tobytes())
+    
+    dictionaries = {}
+    for name in CODED_COLUMNS:
+        values = [log[name] for log in logs]
+        dictionaries[name] = sorted({v for v in values if v is not None})
+        codes = {value: i + 1 for i, value in enumerate(dictionaries[name])}
+        # Code 0 is NULL
+        add(name, np.array([codes.get(v, 0) for v in values], dtype="u1").tobytes())
+    
+    for name in STRING_COLUMNS:
+        encoded = [str(log[name]).encode() if log[name] is not None else b"" for log in logs]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        add(f"{name}.offsets", offsets.tobytes())
+        add(f"{name}.valid", np.array([log[name] is not None for log in logs], dtype="u1").tobytes())
+        add(f"{name}.data", b"".join(encoded))
+    
+    # Offsets in the header are relative to the 8-byte aligned end of the header
+    columns, position = {}, 0
+    for name, data in blocks:
+        columns[name] = [position, len(data)]
+        position += len(data) + (-len(data) % ALIGN)
+    
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "rows": len(logs),
+        "plan": plan,
+        "columns": columns,
+        "dictionaries": dictionaries,
+    }, default=str).encode()
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % ALIGN)
+    
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix)
+        for _, data in blocks:
+            f.write(data)
+            f.write(b"\0" * (-len(data) % ALIGN))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class PlanArchive:
+    """Read-only, memory-mapped view of one archive file"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != MAGIC:
+            raise ValueError(f"{path} is not a workout archive")
+        (header_len,) = struct.unpack_from("<I", self._map, 4)
+        header = json.loads(self._map[8:8 + header_len])
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported archive version {header['version']} in {path}")
+        
+        self.rows: int = header["rows"]
+        self.plan: Dict = header["plan"]
+        self._base = 8 + header_len + (-(8 + header_len) % ALIGN)
+        self._columns: Dict[str, List[int]] = header["columns"]
+        self._dictionaries: Dict[str, List[str]] = header["dictionaries"]
+        self._dtypes = dict(NUMERIC_COLUMNS)
+    
+    def _view(self, name: str, dtype: str) -> np.ndarray:
+        offset, size = self._columns[name]
+        return np.frombuffer(self._map, dtype=dtype, count=size // np.dtype(dtype).itemsize,
+                             offset=self._base + offset)
+    
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy array of a numeric or dictionary-coded column"""
+        if name in self._dictionaries:
+            return self._view(name, "u1")
+        return self._view(name, self._dtypes[name])
+    
+    def strings(self, name: str) -> List[Optional[str]]:
+        """Decoded values of a string column"""
+        offsets = self._view(f"{name}.offsets", "<u4")
+        valid = self._view(f"{name}.valid", "u1")
+        start = self._base + self._columns[f"{name}.data"][0]
+        return [self._map[start + offsets[i]:start + offsets[i + 1]].decode() if valid[i] else None
+                for i in range(self.rows)]
+    
+    def log_arrays(self) -> Dict[str, np.ndarray]:
+        """Canonical-unit columns in analytics.LOG_COLUMNS layout, without copying"""
+        return {
+            "week": self.column("week"),
+            "day": self.column("day"),
+            "distance_m": self.column("distance_m"),
+            "duration_s": self.column("duration_s"),
+            "pace_s_per_km": self.column("pace_s_per_km"),
+            "intensity": self.column("intensity"),
+            "plan": np.zeros(self.rows, dtype=np.int32),
+            "plan_ids": np.array([self.plan["id"]], dtype=object),
+        }
+    
+    def cells(self) -> List[Tuple[int, int]]:
+        """(week, day) of every archived log"""
+        return list(zip(self.column("week").tolist(), self.column("day").tolist()))
+    
+    def log_rows(self) -> List[tuple]:
+        """Archived logs as tuples in workout_logs column order (LOG_FIELDS)"""
+        values = {name: self.column(name).tolist() for name, _ in NUMERIC_COLUMNS}
+        for name in STRING_COLUMNS:
+            values[name] = self.strings(name)
+        for name in CODED_COLUMNS:
+            dictionary = [None] + self._dictionaries[name]
+            values[name] = [dictionary[code] for code in self.column(name).tolist()]
+        values["intensity"] = [None if v != v else int(v) for v in values["intensity"]]
+        for name in ("actual_time", "actual_distance", "actual_pace",
+                     "distance_m", "duration_s", "pace_s_per_km"):
+            values[name] = [None if v != v else v for v in values[name]]
+        values["plan_id"] = [self.plan["id"]] * self.rows
+        return list(zip(*(values[name] for name in LOG_FIELDS)))
+    
+    def logs(self) -> List[Dict]:
+        """Archived logs as dicts, like rows of workout_logs"""
+        return [dict(zip(LOG_FIELDS, row)) for row in self.log_rows()]
+    
+    def log(self, week: int, day: int) -> Optional[Dict]:
+        """One archived log, or None"""
+        matches = np.flatnonzero((self.column("week") == week) & (self.column("day") == day))
+        if not len(matches):
+            return None
+        return self.logs()[int(matches[0])]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive the workout logs of finished Krunner plans")
+    parser.add_argument("--db", default="krunner.db", help="SQLite database path (default: krunner.db)")
+    parser.add_argument("--grace-days", type=int, default=14,
+                        help="days after a plan's race before it is archived (default: 14)")
+    parser.add_argument("--plan", help="archive this plan regardless of its race date")
+    args = parser.parse_args(argv)
+    
+    # Imported here because database imports this module
+    import config
+    from storage import open_storage
+    
+    db = open_storage(config.STORAGE, args.db, config.DB_SHARDS)
+    try:
+        if args.plan:
+            archived = int(db.archive_plan(args.plan))
+        else:
+            archived = db.archive_finished_plans(args.grace_days)
+        print(f"✅ Archived {archived} plan(s)")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""Online snapshots of the SQLite database files, taken while the app runs.
+
+Each file is copied with SQLite's backup API inside one read transaction
+on the source. In WAL mode that pins a consistent snapshot while writers
+keep committing, and the copy never restarts because of their writes.
+Pages are copied pages_per_step at a time with a short pause between
+steps, leaving I/O for the app. A snapshot is built in a ".partial"
+directory, every file is checked with PRAGMA integrity_check, and only
+then is it renamed into place, so every listed snapshot is complete.
+
+    <backup dir>/20261017T020000Z/
+        manifest.json       # files, pages, timings, integrity, write latency
+        krunner.db          # or krunner-00.db, krunner-01.db, ... when sharded
+        krunner-archive/    # hard links to the plan archives (archive.py)
+
+While a snapshot is taken, a probe repeatedly takes and releases each
+database's write lock, as a save would, and the manifest records how its
+latency compared with just before the backup.
+
+Usage:
+    python backup.py run                          # snapshot now, keep the newest 7
+    python backup.py schedule --interval 3600     # snapshot every hour until stopped
+    python backup.py list
+    python backup.py restore 20261017T020000Z     # stop the app first
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from database import default_archive_dir
+from sharding import shard_path
+
+MANIFEST = "manifest.json"
+PARTIAL_SUFFIX = ".partial"
+SNAPSHOT_TIME_FORMAT = "%Y%m%dT%H%M%SZ"
+
+def default_backup_dir(db_path: str) -> str:
+    """Directory holding a database's snapshots: krunner.db -> krunner-backups"""
+    return os.path.splitext(db_path)[0] + "-backups"
+
+def database_files(storage: str, db_path: str, shards: int) -> List[str]:
+    """SQLite files of a storage backend"""
+    if storage == "sqlite":
+        return [db_path]
+    if storage == "sharded":
+        return [shard_path(db_path, i) for i in range(shards)]
+    raise ValueError(f"{storage!r} storage has no database files to back up")
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    if not samples:
+        return {"samples": 0}
+    return {
+        "samples": len(samples),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+class WriteProbe:
+    """Background thread timing BEGIN IMMEDIATE / ROLLBACK on each database
+    
+    Nothing is written; the probe measures how long a save would wait
+    for the write lock.
+    """
+    
+    def __init__(self, paths: List[str], interval: float = 0.02, busy_timeout: int = 5000):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._connections = [sqlite3.connect(path, timeout=busy_timeout / 1000, isolation_level=None,
+                                             check_same_thread=False) for path in paths]
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _probe(self):
+        for conn in self._connections:
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ROLLBACK")
+            self.samples.append((time.perf_counter() - started) * 1000)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._probe()
+            self._stop.wait(self.interval)
+    
+    def measure(self, seconds: float) -> List[float]:
+        """Probe in the foreground for a while and return the samples"""
+        self.samples = []
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self._probe()
+            time.sleep(self.interval)
+        return self.samples
+    
+    def start(self):
+        self.samples = []
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="krunner-backup-probe", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> List[float]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+    
+    def close(self):
+        self.stop()
+        for conn in self._connections:
+            conn.close()
+
+def backup_file(source: str, dest: str, pages_per_step: int = 256, pause: float = 0.005) -> Dict:
+    """Copy a live database file to dest with the online backup API and verify the copy"""
+    started = time.perf_counter()
+    steps = 0
+    
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining and pause:
+            time.sleep(pause)
+    
+    src = sqlite3.connect(source, isolation_level=None)
+    dst = sqlite3.connect(dest, isolation_level=None)
+    try:
+        # Reading page_count opens the read snapshot every step copies from
+        src.execute("BEGIN")
+        pages = src.execute("PRAGMA page_count").fetchone()[0]
+        src.backup(dst, pages=pages_per_step, progress=progress)
+        src.execute("COMMIT")
+        copied = time.perf_counter()
+        integrity = [row[0] for row in dst.execute("PRAGMA integrity_check")]
+    finally:
+        dst.close()
+        src.close()
+    
+    return {
+        "file": os.path.basename(dest),
+        "pages": pages,
+        "bytes": os.path.getsize(dest),
+        "steps": steps,
+        "copy_seconds": round(copied - started, 4),
+        "verify_seconds": round(time.perf_counter() - copied, 4),
+        "integrity": "ok" if integrity == ["ok"] else "; ".join(integrity[:10]),
+    }
+
+def _link_or_copy(src: str, dest: str):
+    # Archive files are replaced or deleted, never modified in place, so a
+    # hard link keeps the snapshot's version
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+def _link_archives(archive_dir: str, dest_dir: str, plan_ids: Optional[set] = None):
+    """Link archive files into dest_dir, optionally only the given plans', skipping ones present"""
+    if not os.path.isdir(archive_dir):
+        return
+    os.makedirs(dest_dir, exist_ok=True)
+    for name in os.listdir(archive_dir):
+        plan_id, ext = os.path.splitext(name)
+        if ext != ".krla" or (plan_ids is not None and plan_id not in plan_ids):
+            continue
+        if not os.path.exists(os.path.join(dest_dir, name)):
+            _link_or_copy(os.path.join(archive_dir, name), os.path.join(dest_dir, name))
+
+def create_snapshot(db_files: List[str], backup_dir: str, pages_per_step: int = 256,
+                    pause: float = 0.005, probe_interval: float = 0.02, baseline_seconds: float = 0.25) -> Dict:
+    """Back up every database file (and its plan archives) into a new snapshot directory"""
+    missing = [path for path in db_files if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"No database at {', '.join(missing)}")
+    
+    name = time.strftime(SNAPSHOT_TIME_FORMAT, time.gmtime())
+    final = os.path.join(backup_dir, name)
+    if os.path.exists(final):
+        raise FileExistsError(f"Snapshot {final} already exists")
+    partial = final + PARTIAL_SUFFIX
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    
+    started = time.perf_counter()
+    probe = WriteProbe(db_files, probe_interval)
+    try:
+        baseline = probe.measure(baseline_seconds)
+        probe.start()
+        files = []
+        for path in db_files:
+            archive_dir = default_archive_dir(path)
+            archive_dest = os.path.join(partial, os.path.basename(archive_dir))
+            # Archives written before the snapshot, then those of plans the
+            # snapshot shows archived in the meantime
+            _link_archives(archive_dir, archive_dest)
+            dest = os.path.join(partial, os.path.basename(path))
+            files.append(backup_file(path, dest, pages_per_step, pause))
+            conn = sqlite3.connect(dest)
+            try:
+                archived = {row[0] for row in conn.execute(
+                    "SELECT id FROM training_plans WHERE archived_at IS NOT NULL")}
+            finally:
+                conn.close()
+            if archived:
+                _link_archives(archive_dir, archive_dest, archived)
+        during = probe.stop()
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    finally:
+        probe.close()
+    
+    manifest = {
+        "name": name,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        "seconds": round(time.perf_counter() - started, 4),
+        "bytes": sum(f["bytes"] for f in files),
+        "pages_per_step": pages_per_step,
+        "files": files,
+        "write_lock": {"before": _percentiles(baseline), "during": _percentiles(during)},
+    }
+    before, after = manifest["write_lock"]["before"], manifest["write_lock"]["during"]
+    if before.get("samples") and after.get("samples"):
+        manifest["write_latency_added_ms"] = round(max(0.0, after["p95_ms"] - before["p95_ms"]), 3)
+    
+    failed = [f["file"] for f in files if f["integrity"] != "ok"]
+    if failed:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise RuntimeError(f"Integrity check failed for {', '.join(failed)}; snapshot discarded")
+    
+    with open(os.path.join(partial, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(partial, final)
+    return manifest
+
+def list_snapshots(backup_dir: str) -> List[Dict]:
+    """Manifests of the complete snapshots in backup_dir, oldest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(backup_dir)):
+        path = os.path.join(backup_dir, name, MANIFEST)
+        if not name.endswith(PARTIAL_SUFFIX) and os.path.exists(path):
+            with open(path) as f:
+                snapshots.append(json.load(f))
+    return snapshots
+
+def prune_snapshots(backup_dir: str, keep: int) -> List[str]:
+    """Delete all but the newest keep snapshots; returns the deleted names"""
+    snapshots = list_snapshots(backup_dir)
+    expired = [s["name"] for s in snapshots[:max(0, len(snapshots) - keep)]]
+    for name in expired:
+        shutil.rmtree(os.path.join(backup_dir, name))
+    return expired
+
+def restore_snapshot(snapshot_dir: str, db_files: List[str], force: bool = False) -> float:
+    """Replace the database files and their archives with a snapshot's; returns seconds taken
+    
+    The app must be stopped. A database with a -shm file is taken to be
+    open and is refused unless force is set.
+    """
+    with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    names = [os.path.basename(path) for path in db_files]
+    if sorted(names) != sorted(f["file"] for f in manifest["files"]):
+        raise ValueError(f"Snapshot {manifest['name']} holds {', '.join(f['file'] for f in manifest['files'])}, "
+                         f"not {', '.join(names)}")
+    in_use = [path for path in db_files if os.path.exists(path + "-shm")]
+    if in_use and not force:
+        raise RuntimeError(f"{', '.join(in_use)} appears to be open (a -shm file exists); stop the app first")
+    
+    started = time.perf_counter()
+    for path in db_files:
+        # Copy next to the target, then swap it in with a rename
+        restoring = path + ".restoring"
+        shutil.copyfile(os.path.join(snapshot_dir, os.path.basename(path)), restoring)
+        with open(restoring, "rb") as f:
+            os.fsync(f.fileno())
+        # A leftover WAL would be replayed onto the restored file
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.replace(restoring, path)
+        
+        archive_dir = default_archive_dir(path)
+        restored_archives = archive_dir + ".restoring"
+        shutil.rmtree(restored_archives, ignore_errors=True)
+        os.makedirs(restored_archives)
+        _link_archives(os.path.join(snapshot_dir, os.path.basename(archive_dir)), restored_archives)
+        shutil.rmtree(archive_dir, ignore_errors=True)
+        os.rename(restored_archives, archive_dir)
+    return time.perf_counter() - started
+
+def describe(manifest: Dict) -> str:
+    """One-line summary of a snapshot"""
+    lock = manifest["write_lock"]
+    added = manifest.get("write_latency_added_ms")
+    latency = (f"write lock p95 {lock['before']['p95_ms']:.2f}ms -> {lock['during']['p95_ms']:.2f}ms"
+               f" (+{added:.2f}ms)" if added is not None else "write lock not measured")
+    return (f"{manifest['name']}: {len(manifest['files'])} file(s), {manifest['bytes'] / 1e6:.1f} MB "
+            f"in {manifest['seconds']:.2f}s, {latency}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up and restore the Krunner database while it runs")
+    parser.add_argument("--db", default="krunner.db", help="SQLite database path (default: krunner.db)")
+    parser.add_argument("--dir", help="snapshot directory (default: krunner-backups next to --db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("run", "take one snapshot now"),
+                               ("schedule", "take a snapshot every --interval seconds until stopped")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("--keep", type=int, default=7, help="snapshots to keep (default: 7)")
+        sub.add_argument("--pages", type=int, default=256, help="pages copied per step (default: 256)")
+        sub.add_argument("--pause-ms", type=float, default=5, help="pause between steps (default: 5)")
+        if command == "schedule":
+            sub.add_argument("--interval", type=float, default=3600,
+                             help="seconds between snapshots (default: 3600)")
+    subparsers.add_parser("list", help="print snapshots, oldest first")
+    restore = subparsers.add_parser("restore", help="replace the database with a snapshot")
+    restore.add_argument("snapshot", help="snapshot name or directory")
+    restore.add_argument("--force", action="store_true", help="restore even if the database looks open")
+    args = parser.parse_args(argv)
+    
+    # Imported here so the module can be used without the app's settings
+    import config
+    
+    db_files = database_files(config.STORAGE, args.db, config.DB_SHARDS)
+    backup_dir = args.dir or default_backup_dir(args.db)
+    
+    if args.command == "list":
+        for manifest in list_snapshots(backup_dir):
+            print(describe(manifest))
+        return 0
+    
+    if args.command == "restore":
+        snapshot_dir = args.snapshot if os.path.isdir(args.snapshot) else os.path.join(backup_dir, args.snapshot)
+        seconds = restore_snapshot(snapshot_dir, db_files, force=args.force)
+        print(f"✅ Restored {os.path.basename(os.path.normpath(snapshot_dir))} in {seconds:.2f}s")
+        return 0
+    
+    while True:
+        started = time.monotonic()
+        try:
+            manifest = create_snapshot(db_files, backup_dir, args.pages, args.pause_ms / 1000)
+            print(f"✅ {describe(manifest)}", flush=True)
+            for name in prune_snapshots(backup_dir, args.keep):
+                print(f"🗑️  Removed {name}", flush=True)
+        except (OSError, RuntimeError, sqlite3.Error) as e:
+            # A scheduled run carries on after a failed snapshot
+            if args.command == "run":
+                raise
+            print(f"❌ Snapshot failed: {e}", file=sys.stderr, flush=True)
+        if args.command == "run":
+            return 0
+        time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+if __name__ == "__main__":
+    sys.exit(main())
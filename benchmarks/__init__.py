@@ -0,0 +1 @@
+"""Benchmarks: python -m benchmarks.run (Database and layout hot paths), python -m benchmarks.loadtest (HTTP)"""
@@ -0,0 +1,345 @@
+"""Replay Dash callback traffic against a running app and measure capacity.
+
+Each simulated runner goes through the flow a browser drives in
+callbacks.py: page load (session id, plan list, training load), create a
+plan, select it (grid, summary, delete button), then log workouts. Opening
+a cell and saving are clientside, so saves reach the server as sync_logs
+batches of --saves-per-sync workouts.
+
+Callbacks are read from /_dash-dependencies and posted to
+/_dash-update-component exactly as the browser would, so the numbers
+cover routing, JSON (de)serialization and layout rendering as well as the
+database.
+
+Usage:
+    python -m benchmarks.loadtest                               # start app.py on a scratch database
+    python -m benchmarks.loadtest --sessions 500 --concurrency 32
+    python -m benchmarks.loadtest --server gunicorn --workers 4
+    python -m benchmarks.loadtest --url http://localhost:8050   # an app that is already running
+
+Results are JSON on stdout (or --output): throughput, plus request count,
+errors and p50/p95/p99 latency in milliseconds per callback, keyed by
+"<trigger> -> <first output>". With --max-p95-ms the exit code is 1 if
+any callback's p95 is slower.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RACE_DISTANCES = ["5K", "10K", "Half Marathon", "Marathon"]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+def parse_outputs(output: str) -> List[Dict]:
+    """Output ids of a callback from its dependency key, e.g. "..a.b...c.d@hash..\""""
+    keys = output[2:-2].split("...") if output.startswith("..") else [output]
+    outputs = []
+    for key in keys:
+        component, prop = key.rsplit(".", 1)
+        outputs.append({"id": json.loads(component) if component.startswith("{") else component,
+                        "property": prop.split("@")[0]})
+    return outputs
+
+class Callbacks:
+    """Server-side callbacks of the app, looked up by the prop that triggers them"""
+    
+    def __init__(self, dependencies: List[Dict]):
+        self.by_trigger: Dict[str, List[Dict]] = {}
+        for dep in dependencies:
+            if dep.get("clientside_function"):
+                continue
+            for spec in dep["inputs"]:
+                self.by_trigger.setdefault(f"{spec['id']}.{spec['property']}", []).append(dep)
+    
+    def triggered_by(self, prop: str, writes: Optional[bool] = None) -> List[Dict]:
+        """Callbacks a change of prop fires, optionally only those that do (or don't) also write it"""
+        deps = self.by_trigger.get(prop, [])
+        if writes is not None:
+            deps = [dep for dep in deps if (prop in dep["output"]) == writes]
+        return deps
+
+class Client:
+    """One keep-alive connection posting callback requests and recording latency"""
+    
+    def __init__(self, url: str, stats: "Stats"):
+        parts = urlsplit(url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        self.prefix = parts.path.rstrip("/")
+        self.stats = stats
+    
+    def fire(self, dep: Dict, trigger: str, values: Dict) -> Optional[Dict]:
+        """Post one callback with inputs and state taken from values; returns its response"""
+        def props(specs):
+            return [{"id": spec["id"], "property": spec["property"],
+                     "value": values.get(f"{spec['id']}.{spec['property']}")} for spec in specs]
+        
+        outputs = parse_outputs(dep["output"])
+        body = json.dumps({
+            "output": dep["output"],
+            "outputs": outputs if dep["output"].startswith("..") else outputs[0],
+            "inputs": props(dep["inputs"]),
+            "state": props(dep["state"]),
+            "changedPropIds": [trigger],
+        })
+        first = outputs[0]
+        label = f"{trigger} -> {first['id']}.{first['property']}"
+        
+        started = time.perf_counter()
+        try:
+            self.connection.request("POST", f"{self.prefix}/_dash-update-component", body,
+                                    {"Content-Type": "application/json"})
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.stats.record(label, time.perf_counter() - started, ok=False)
+            return None
+        
+        # 204 is PreventUpdate
+        ok = response.status in (200, 204)
+        self.stats.record(label, time.perf_counter() - started, ok)
+        if response.status != 200:
+            return None
+        return json.loads(data).get("response", {})
+    
+    def fire_all(self, callbacks: Callbacks, trigger: str, values: Dict,
+                 writes: Optional[bool] = None) -> Dict:
+        """Fire every callback a prop change triggers and merge their responses"""
+        merged: Dict = {}
+        for dep in callbacks.triggered_by(trigger, writes):
+            for component, props in (self.fire(dep, trigger, values) or {}).items():
+                merged.setdefault(component, {}).update(props)
+        return merged
+    
+    def close(self):
+        self.connection.close()
+
+class Stats:
+    """Latency samples per callback, shared by all client threads"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+    
+    def record(self, label: str, seconds: float, ok: bool):
+        with self._lock:
+            self.samples.setdefault(label, []).append(seconds * 1000)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+    
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+        for label, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            result[label] = {
+                "requests": len(samples),
+                "errors": self.errors.get(label, 0),
+                "p50_ms": round(percentile(samples, 0.50), 2),
+                "p95_ms": round(percentile(samples, 0.95), 2),
+                "p99_ms": round(percentile(samples, 0.99), 2),
+            }
+        return result
+
+def run_session(url: str, callbacks: Callbacks, stats: Stats, index: int, args) -> bool:
+    """Drive one simulated runner through the app; False if the flow broke off"""
+    rng = random.Random(args.seed + index)
+    client = Client(url, stats)
+    think = args.think_ms / 1000
+    try:
+        # Page load: the browser has no session id yet and is given one
+        response = client.fire_all(callbacks, "session-id.data", {"session-id.data": None}, writes=True)
+        session_id = response.get("session-id", {}).get("data")
+        if not session_id:
+            return False
+        values = {"session-id.data": session_id}
+        client.fire_all(callbacks, "session-id.data", values, writes=False)
+        time.sleep(think)
+        
+        weeks = rng.randint(8, args.weeks)
+        values.update({
+            "create-plan-btn.n_clicks": 1,
+            "plan-name-input.value": f"Load test {index}",
+            "plan-weeks-input.value": weeks,
+            "plan-distance-input.value": rng.choice(RACE_DISTANCES),
+        })
+        response = client.fire_all(callbacks, "create-plan-btn.n_clicks", values)
+        plan_id = response.get("plan-selector", {}).get("value")
+        if not plan_id:
+            return False
+        values["plan-selector.value"] = plan_id
+        client.fire_all(callbacks, "plan-selector.value", values)
+        time.sleep(think)
+        
+        pending = []
+        for save in range(1, args.saves + 1):
+            minutes = round(rng.uniform(20, 90), 1)
+            distance = round(minutes / rng.uniform(8, 11), 2)
+            pending.append({
+                "plan_id": plan_id, "week": rng.randint(1, weeks), "day": rng.randint(1, 3),
+                "actual_time": minutes, "actual_distance": distance,
+                "actual_pace": round(minutes / distance, 2), "distance_unit": "miles",
+                "intensity": rng.randint(1, 5), "notes": "load test",
+                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S.000", time.gmtime()),
+            })
+            if len(pending) == args.saves_per_sync or save == args.saves:
+                values.update({"sync-interval.n_intervals": save, "pending-logs.data": pending})
+                client.fire_all(callbacks, "sync-interval.n_intervals", values)
+                pending = []
+            time.sleep(think)
+        return True
+    finally:
+        client.close()
+
+def start_server(args, workdir: str) -> Tuple[subprocess.Popen, str]:
+    """Start the app on a scratch database and wait until it answers"""
+    port = free_port()
+    env = dict(os.environ,
+               KRUNNER_DB=os.path.join(workdir, "loadtest.db"),
+               KRUNNER_STORAGE=args.storage,
+               KRUNNER_DEBUG="0",
+               KRUNNER_HOST="127.0.0.1",
+               KRUNNER_PORT=str(port),
+               KRUNNER_BIND=f"127.0.0.1:{port}",
+               KRUNNER_WORKERS=str(args.workers))
+    if args.server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                   "--access-logfile", "/dev/null", "app:server"]
+    else:
+        command = [sys.executable, "app.py"]
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(command)} exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/_dash-layout")
+            if connection.getresponse().status == 200:
+                return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The app did not start within 60 seconds")
+
+def load_callbacks(url: str) -> Callbacks:
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    connection.request("GET", f"{parts.path.rstrip('/')}/_dash-dependencies")
+    response = connection.getresponse()
+    if response.status != 200:
+        raise RuntimeError(f"GET /_dash-dependencies returned {response.status}")
+    return Callbacks(json.loads(response.read()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Krunner HTTP load test")
+    parser.add_argument("--url", help="base URL of a running app (default: start one on a scratch database)")
+    parser.add_argument("--server", default="dev", choices=("dev", "gunicorn"),
+                        help="how to start the app: python app.py or gunicorn (default: dev)")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (default: 2)")
+    parser.add_argument("--storage", default="sqlite", help="KRUNNER_STORAGE for the started app (default: sqlite)")
+    parser.add_argument("--sessions", type=int, default=100, help="simulated runners (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=8, help="runners active at once (default: 8)")
+    parser.add_argument("--weeks", type=int, default=24, help="longest plan a runner creates (default: 24)")
+    parser.add_argument("--saves", type=int, default=12, help="workouts each runner logs (default: 12)")
+    parser.add_argument("--saves-per-sync", type=int, default=3,
+                        help="workouts queued in the browser per sync request (default: 3)")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a runner's steps (default: 0)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if any callback's p95 exceeds this")
+    args = parser.parse_args(argv)
+    
+    workdir = tempfile.mkdtemp(prefix="krunner-loadtest-")
+    process = None
+    try:
+        url = args.url
+        if not url:
+            process, url = start_server(args, workdir)
+        callbacks = load_callbacks(url)
+        
+        print(f"🏃 {args.sessions} runners, {args.concurrency} at a time, against {url}", file=sys.stderr)
+        stats = Stats()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            completed = sum(pool.map(lambda i: run_session(url, callbacks, stats, i, args),
+                                     range(args.sessions)))
+        elapsed = time.perf_counter() - started
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    summary = stats.summary()
+    requests = sum(s["requests"] for s in summary.values())
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "url": args.url or f"{args.server} server",
+            "storage": None if args.url else args.storage,
+            "sessions": args.sessions,
+            "concurrency": args.concurrency,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "sessions_completed": completed,
+        "requests": requests,
+        "errors": sum(s["errors"] for s in summary.values()),
+        "requests_per_s": round(requests / elapsed, 1),
+        "sessions_per_s": round(completed / elapsed, 2),
+        "callbacks": summary,
+    }
+    
+    for label, s in summary.items():
+        print(f"  {label:<62} {s['requests']:>6}  p50 {s['p50_ms']:>8.1f}ms  p95 {s['p95_ms']:>8.1f}ms"
+              f"  p99 {s['p99_ms']:>8.1f}ms" + (f"  {s['errors']} errors" if s["errors"] else ""),
+              file=sys.stderr)
+    print(f"  {requests} requests in {elapsed:.1f}s: {results['requests_per_s']} req/s, "
+          f"{completed}/{args.sessions} runners completed", file=sys.stderr)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    
+    slow = [label for label, s in summary.items() if args.max_p95_ms and s["p95_ms"] > args.max_p95_ms]
+    if slow or results["errors"] or completed < args.sessions:
+        if slow:
+            print(f"❌ p95 over {args.max_p95_ms}ms: {', '.join(slow)}", file=sys.stderr)
+        if results["errors"] or completed < args.sessions:
+            print(f"❌ {results['errors']} failed requests, {args.sessions - completed} runners broke off",
+                  file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Time Database and layout hot paths at several data sizes.
+
+Usage:
+    python -m benchmarks.run                        # compare against benchmarks/baseline.json
+    python -m benchmarks.run --sizes small,large --output results.json
+    python -m benchmarks.run --update-baseline
+
+Results are JSON on stdout (or --output): per size and operation, the median and p95 latency in
+microseconds. Operations whose median is more than --tolerance slower
+than the baseline are reported as regressions and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from storage import BACKENDS, open_storage
+from layouts import create_grid_table
+from benchmarks import synthetic
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# sessions, each with one dense 52-week plan
+SIZES = {
+    "small": 100,
+    "medium": 1000,
+    "large": 10000,
+}
+
+WEEKS = 52
+
+def measure(fn: Callable[[int], None], ops: int) -> Dict[str, float]:
+    """Call fn(i) for i in range(ops) and summarize per-call latency in microseconds"""
+    samples = []
+    for i in range(ops):
+        started = time.perf_counter_ns()
+        fn(i)
+        samples.append((time.perf_counter_ns() - started) / 1000)
+    samples.sort()
+    return {
+        "ops": ops,
+        "median_us": round(statistics.median(samples), 2),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }
+
+def run_size(sessions: int, ops: int, seed: int = 42, backend: str = "sqlite") -> Dict[str, Dict]:
+    """Populate a scratch database with the given number of sessions and time each operation"""
+    workdir = tempfile.mkdtemp(prefix="krunner-bench-")
+    try:
+        db = open_storage(backend, os.path.join(workdir, "bench.db"))
+        synthetic.populate(db, sessions, weeks=WEEKS, seed=seed)
+        rng = random.Random(seed)
+        plan_ids = [synthetic.plan_id(rng.randrange(sessions), 0) for _ in range(ops)]
+        cells = {plan: db.get_completed_cells(plan) for plan in set(plan_ids)}
+        
+        results = {}
+        new_plans: List[str] = []
+        results["create_plan"] = measure(
+            lambda i: new_plans.append(db.create_plan(f"bench-{i}", "Bench plan", WEEKS, "5K")), ops)
+        results["save_workout_log"] = measure(
+            lambda i: db.save_workout_log(plan_ids[i], rng.randint(1, WEEKS), rng.randint(1, 3),
+                                          actual_time=30.0, actual_distance=3.1, intensity=3,
+                                          notes="bench"), ops)
+        results["get_completed_cells"] = measure(lambda i: db.get_completed_cells(plan_ids[i]), ops)
+        results["get_all_logs_for_plan"] = measure(lambda i: db.get_all_logs_for_plan(plan_ids[i]), ops)
+        results["create_grid_table"] = measure(
+            lambda i: create_grid_table(WEEKS, plan_ids[i], cells[plan_ids[i]]), ops)
+        
+        # Give the throwaway plans a dense set of logs so deletes do real work
+        db.import_workout_logs(
+            {**record, "plan_id": new_plans[n], "session_id": f"bench-{n}"}
+            for n in range(ops)
+            for record in synthetic.generate_records(1, weeks=WEEKS, seed=n)
+        )
+        results["delete_plan"] = measure(lambda i: db.delete_plan(new_plans[i]), ops)
+        
+        db.close()
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print a per-operation diff against the baseline and return the regressions"""
+    regressions = []
+    for size, operations in results["results"].items():
+        for op, stats in operations.items():
+            base = baseline.get("results", {}).get(size, {}).get(op)
+            if not base:
+                print(f"  {size:<7} {op:<22} {stats['median_us']:>10.1f}us   (no baseline)", file=sys.stderr)
+                continue
+            ratio = stats["median_us"] / base["median_us"] if base["median_us"] else 1.0
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{size}/{op}")
+            elif ratio < 1 - tolerance:
+                flag = "  faster"
+            print(f"  {size:<7} {op:<22} {stats['median_us']:>10.1f}us  vs {base['median_us']:>10.1f}us"
+                  f"  ({ratio - 1:+.0%}){flag}", file=sys.stderr)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Krunner benchmark suite")
+    parser.add_argument("--sizes", default="small,medium",
+                        help=f"comma-separated sizes from {', '.join(SIZES)} (default: small,medium)")
+    parser.add_argument("--ops", type=int, default=200, help="timed calls per operation")
+    parser.add_argument("--backend", default="sqlite", choices=BACKENDS,
+                        help="storage backend to time (default: sqlite, which the baseline uses)")
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="overwrite the baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (default: 0.25)")
+    args = parser.parse_args(argv)
+    
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "ops": args.ops,
+            "backend": args.backend,
+        },
+        "results": {},
+    }
+    for size in args.sizes.split(","):
+        sessions = SIZES[size]
+        print(f"⏱️  {size}: {sessions:,} sessions x {WEEKS} weeks", file=sys.stderr)
+        results["results"][size] = run_size(sessions, args.ops, backend=args.backend)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+    if not args.output:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --update-baseline", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print("Comparison with baseline:", file=sys.stderr)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    print("✅ No regressions", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
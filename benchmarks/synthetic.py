@@ -0,0 +1,58 @@
+"""Deterministic synthetic training data for benchmarks"""
+import random
+import uuid
+from typing import Dict, Iterator
+
+from storage import StorageBackend
+
+# Fixed namespace so a given seed always produces the same ids
+SYNTHETIC_NAMESPACE = uuid.UUID("0b6a3c1e-8f55-4f3e-a2d4-91c7e6b0d2a8")
+
+RACE_DISTANCES = ["5K", "10K", "Half Marathon", "Marathon"]
+NOTES = ["", "", "", "felt good", "legs heavy", "windy", "knee pain", "great tempo"]
+
+def session_id(index: int) -> str:
+    return str(uuid.uuid5(SYNTHETIC_NAMESPACE, f"session-{index}"))
+
+def plan_id(session_index: int, plan_index: int) -> str:
+    return str(uuid.uuid5(SYNTHETIC_NAMESPACE, f"plan-{session_index}-{plan_index}"))
+
+def generate_records(sessions: int, plans_per_session: int = 1, weeks: int = 52,
+                     density: float = 1.0, seed: int = 42) -> Iterator[Dict]:
+    """Yield normalized workout records (see importer.normalize_record) for synthetic runners
+    
+    density is the fraction of (week, day) cells that have a log.
+    """
+    rng = random.Random(seed)
+    for s in range(sessions):
+        for p in range(plans_per_session):
+            race_distance = rng.choice(RACE_DISTANCES)
+            for week in range(1, weeks + 1):
+                for day in (1, 2, 3):
+                    if rng.random() >= density:
+                        continue
+                    unit = "miles" if rng.random() < 0.7 else "km"
+                    minutes = round(rng.uniform(20, 90), 1)
+                    distance = round(minutes / rng.uniform(8, 11), 2)
+                    yield {
+                        "session_id": session_id(s),
+                        "plan_id": plan_id(s, p),
+                        "plan_name": f"Plan {p + 1}",
+                        "weeks": weeks,
+                        "race_distance": race_distance,
+                        "week": week,
+                        "day": day,
+                        "actual_time": minutes,
+                        "actual_distance": distance,
+                        "actual_pace": round(minutes / distance, 2),
+                        "distance_unit": unit,
+                        "intensity": rng.randint(1, 5),
+                        "notes": rng.choice(NOTES),
+                        "created_at": None,
+                    }
+
+def populate(db: StorageBackend, sessions: int, plans_per_session: int = 1, weeks: int = 52,
+             density: float = 1.0, seed: int = 42) -> int:
+    """Fill a database with synthetic plans and logs, returning the number of logs"""
+    records = generate_records(sessions, plans_per_session, weeks, density, seed)
+    return db.import_workout_logs(records, chunk_size=10000)
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+class RenderCache:
+    """Bounded LRU cache of rendered components, validated by a version per key
+    
+    Each key holds a single entry tagged with the version it was rendered
+    for. A lookup with a different version counts as a miss and the entry
+    is replaced, so stale renders never need explicit invalidation.
+    """
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get_or_render(self, key: Hashable, version: Hashable, render: Callable[[], Any]) -> Any:
+        """Return the cached value for key at version, rendering it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        # Render outside the lock; concurrent misses just render twice
+        value = render()
+        
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+    
+    def invalidate(self, key: Hashable):
+        """Drop the entry for key, if any"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters plus the current size"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
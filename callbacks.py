@@ -1,12 +1,69 @@
-from dash import Input, Output, State, ALL, ctx, no_update
+from dash import Input, Output, State, ALL, Patch, no_update
 import dash_bootstrap_components as dbc
 from dash import html
+import base64
+import io
 import uuid
-from database import Database
-from layouts import create_grid_table
+from typing import Optional
+from cache import RenderCache
+from storage import StorageBackend, sync_result
+from layouts import (create_grid_table, create_notes_results, create_summary_table,
+                     create_track_summary, create_training_load_chart)
+from templates import TemplateEngine
+from training_load import current_day, daily_series
 
-def register_callbacks(app, db: Database):
-    """Register all application callbacks"""
+# Log fields the browser keeps for each workout of the selected plan
+CACHED_LOG_FIELDS = ("actual_time", "actual_distance", "actual_pace", "distance_unit",
+                     "intensity", "notes", "updated_at")
+
+# Plans sent to the selector per request; the rest are reached by typing
+PLAN_PAGE_SIZE = 20
+
+def register_callbacks(app, db: StorageBackend, grid_cache: Optional[RenderCache] = None,
+                       templates: Optional[TemplateEngine] = None, soft_delete: bool = False):
+    """Register all application callbacks
+    
+    With soft_delete, deleted plans are only hidden; maintenance purges them later.
+    """
+    # Rendered grids and their log-cache payloads keyed by plan id and validated by the plan revision
+    grid_cache = grid_cache if grid_cache is not None else RenderCache()
+    templates = templates if templates is not None else TemplateEngine(db)
+    
+    def owns_plan(plan_id, session_id):
+        """Whether the plan exists and belongs to the session"""
+        plan = db.get_plan(plan_id) if plan_id and session_id else None
+        return plan is not None and plan["session_id"] == session_id
+    
+    def plan_options(session_id, search=None, selected=None):
+        """Selector options for the first page of matching plans, keeping the selected one"""
+        plans, cursor = db.search_plans(session_id, search or "", limit=PLAN_PAGE_SIZE)
+        options = [{"label": p["name"], "value": p["id"]} for p in plans]
+        
+        # The dropdown only shows a label for a value that is among its options
+        if selected and all(option["value"] != selected for option in options):
+            plan = db.get_plan(selected)
+            if plan and plan["session_id"] == session_id:
+                options.insert(0, {"label": plan["name"], "value": plan["id"]})
+        
+        if cursor is not None:
+            options.append({"label": "Type to search more plans…", "value": "", "disabled": True})
+        return options
+    
+    def training_load_chart(session_id):
+        """Training load chart for a session, running up to today"""
+        return create_training_load_chart(daily_series(db.get_training_load(session_id), current_day()))
+    
+    def cached_log(log, track=False):
+        """A workout log as the browser keeps it"""
+        return {**{field: log.get(field) for field in CACHED_LOG_FIELDS}, "track": track}
+    
+    def plan_log_cache(plan_id):
+        """Every log of a plan keyed by "week-day", for the log-cache store"""
+        tracks = set(db.get_track_cells(plan_id))
+        return {"plan": plan_id, "logs": {
+            f"{log['week']}-{log['day']}": cached_log(log, (log["week"], log["day"]) in tracks)
+            for log in db.get_all_logs_for_plan(plan_id)
+        }}
     
     # Initialize session ID
     @app.callback(
@@ -46,9 +103,7 @@ def register_callbacks(app, db: Database):
             return no_update, no_update, no_update, no_update, no_update, toast
         
         plan_id = db.create_plan(session_id, name, weeks, distance)
-        plans = db.get_plans(session_id)
-        
-        options = [{"label": p["name"], "value": p["id"]} for p in plans]
+        options = plan_options(session_id, selected=plan_id)
         
         toast = dbc.Toast(
             f"Training plan '{name}' created successfully!",
@@ -69,10 +124,22 @@ def register_callbacks(app, db: Database):
     )
     def load_plans(session_id):
         if session_id:
-            plans = db.get_plans(session_id)
-            return [{"label": p["name"], "value": p["id"]} for p in plans]
+            return plan_options(session_id)
         return []
     
+    # Fetch matching plans as the user types in the selector
+    @app.callback(
+        Output("plan-selector", "options", allow_duplicate=True),
+        Input("plan-selector", "search_value"),
+        [State("plan-selector", "value"),
+         State("session-id", "data")],
+        prevent_initial_call=True
+    )
+    def search_plans(search_value, plan_id, session_id):
+        if not session_id:
+            return no_update
+        return plan_options(session_id, search_value, plan_id)
+    
     # Enable/disable delete button based on plan selection
     @app.callback(
         Output("delete-plan-btn", "disabled"),
@@ -86,6 +153,8 @@ def register_callbacks(app, db: Database):
         [Output("plan-selector", "options", allow_duplicate=True),
          Output("plan-selector", "value", allow_duplicate=True),
          Output("training-grid-container", "children", allow_duplicate=True),
+         Output("weekly-summary-container", "children", allow_duplicate=True),
+         Output("training-load-container", "children", allow_duplicate=True),
          Output("notification-container", "children", allow_duplicate=True)],
         Input("delete-plan-btn", "n_clicks"),
         [State("plan-selector", "value"),
@@ -94,18 +163,18 @@ def register_callbacks(app, db: Database):
     )
     def delete_plan(n_clicks, plan_id, session_id):
         if not plan_id:
-            return no_update, no_update, no_update, no_update
+            return (no_update,) * 6
         
         # Get plan name before deleting
         plan = db.get_plan(plan_id)
         plan_name = plan["name"] if plan else "Unknown"
         
         # Delete the plan
-        db.delete_plan(plan_id)
+        db.delete_plan(plan_id, soft=soft_delete)
+        grid_cache.invalidate(plan_id)
         
         # Reload plans
-        plans = db.get_plans(session_id)
-        options = [{"label": p["name"], "value": p["id"]} for p in plans]
+        options = plan_options(session_id)
         
         # Clear grid
         empty_grid = html.Div("Select a training plan to view the schedule", 
@@ -121,28 +190,133 @@ def register_callbacks(app, db: Database):
             style={"position": "fixed", "top": 20, "right": 20, "zIndex": 9999}
         )
         
-        return options, None, empty_grid, toast
+        return options, None, empty_grid, None, training_load_chart(session_id), toast
+    
+    # Search workout notes across the session's plans
+    @app.callback(
+        Output("notes-search-results", "children"),
+        Input("notes-search-input", "value"),
+        State("session-id", "data"),
+        prevent_initial_call=True
+    )
+    def search_notes(query, session_id):
+        if not query or not session_id:
+            return None
+        return create_notes_results(db.search_notes(session_id, query))
     
     # Display training grid when plan is selected
     @app.callback(
-        Output("training-grid-container", "children"),
+        [Output("training-grid-container", "children"),
+         Output("log-cache", "data")],
         Input("plan-selector", "value"),
         prevent_initial_call=True
     )
     def display_grid(plan_id):
         if not plan_id:
             return html.Div("Select a training plan to view the schedule", 
-                          className="text-muted text-center p-5")
+                          className="text-muted text-center p-5"), None
         
         plan = db.get_plan(plan_id)
         if not plan:
-            return html.Div("Plan not found", className="text-muted text-center p-5")
+            return html.Div("Plan not found", className="text-muted text-center p-5"), None
+        
+        # Read the version first so a concurrent reload can only cause a re-render
+        template_version = templates.version
+        schedule = templates.schedule(plan["race_distance"], plan["weeks"])
+        
+        # The log-cache payload changes with the same version as the grid
+        def render():
+            completed_cells = db.get_completed_cells(plan_id)
+            grid = create_grid_table(plan["weeks"], plan_id, completed_cells, schedule)
+            return grid, plan_log_cache(plan_id)
         
-        completed_cells = db.get_completed_cells(plan_id)
-        return create_grid_table(plan["weeks"], plan_id, completed_cells)
+        # Queued write-behind saves are not in the revision yet
+        version = (plan["revision"], db.pending_writes(plan_id), template_version)
+        return grid_cache.get_or_render(plan_id, version, render)
+    
+    # Completed cells follow the cached logs plus saves waiting to sync
+    app.clientside_callback(
+        """
+        function(cache, pending, ids) {
+            const done = new Set();
+            if (cache) {
+                Object.keys(cache.logs).forEach(key => done.add(cache.plan + ":" + key));
+            }
+            (pending || []).forEach(log => done.add(log.plan_id + ":" + log.week + "-" + log.day));
+            return ids.map(id => done.has(id.plan + ":" + id.week + "-" + id.day)
+                ? "grid-cell completed" : "grid-cell");
+        }
+        """,
+        Output({"type": "workout-cell", "week": ALL, "day": ALL, "plan": ALL}, "className"),
+        [Input("log-cache", "data"),
+         Input("pending-logs", "data")],
+        State({"type": "workout-cell", "week": ALL, "day": ALL, "plan": ALL}, "id")
+    )
+    
+    # Forward only the clicked cell's identity to the server. The n_clicks of
+    # every cell stay in the browser instead of riding along with each click.
+    app.clientside_callback(
+        """
+        function(cellClicks) {
+            const triggered = dash_clientside.callback_context.triggered;
+            if (!triggered.length || !triggered[0].value) {
+                return dash_clientside.no_update;
+            }
+            const propId = triggered[0].prop_id;
+            const cell = JSON.parse(propId.slice(0, propId.lastIndexOf(".")));
+            return {week: cell.week, day: cell.day, plan: cell.plan, clicks: triggered[0].value};
+        }
+        """,
+        Output("selected-cell", "data"),
+        Input({"type": "workout-cell", "week": ALL, "day": ALL, "plan": ALL}, "n_clicks"),
+        prevent_initial_call=True
+    )
     
-    # Open workout modal when cell is clicked
+    # Training load across all of the session's plans
     @app.callback(
+        Output("training-load-container", "children"),
+        Input("session-id", "data"),
+        prevent_initial_call=True
+    )
+    def display_training_load(session_id):
+        if not session_id:
+            return None
+        return training_load_chart(session_id)
+    
+    # Display weekly summary for the selected plan
+    @app.callback(
+        Output("weekly-summary-container", "children"),
+        Input("plan-selector", "value"),
+        prevent_initial_call=True
+    )
+    def display_summary(plan_id):
+        if not plan_id:
+            return None
+        return create_summary_table(db.get_weekly_summaries(plan_id))
+    
+    # Open workout modal for the selected cell from the browser's copy of the
+    # logs; an unsynced save of the cell takes precedence over the cache
+    app.clientside_callback(
+        """
+        function(cell, cache, pending) {
+            if (!cell) {
+                return Array(14).fill(dash_clientside.no_update);
+            }
+            const sameCell = log => log.plan_id === cell.plan && log.week === cell.week && log.day === cell.day;
+            const cached = cache && cache.plan === cell.plan ? cache.logs[cell.week + "-" + cell.day] : null;
+            const log = (pending || []).find(sameCell) || cached || {};
+            const dayNames = {1: "Recovery", 2: "Speed", 3: "Endurance"};
+            const title = "Week " + cell.week + " - Day " + cell.day + ": " + (dayNames[cell.day] || "Workout");
+            // clicks makes reopening the same workout show its track again
+            const track = cached && cached.track
+                ? {plan: cell.plan, week: cell.week, day: cell.day, clicks: cell.clicks} : null;
+            // Clearing the upload lets the same file be attached to another workout
+            return [true, title, cell.week, cell.day, cell.plan,
+                    log.actual_time ?? null, log.actual_distance ?? null, log.actual_pace ?? null,
+                    log.distance_unit || "miles", log.intensity || 3, log.notes || "",
+                    null, null, track];
+        }
+        """,
         [Output("workout-modal", "is_open"),
          Output("modal-title", "children"),
          Output("modal-week", "data"),
@@ -153,10 +327,109 @@ def register_callbacks(app, db: Database):
          Output("actual-pace", "value"),
          Output("distance-unit", "value"),
          Output("intensity-slider", "value"),
-         Output("workout-notes", "value")],
-        [Input({"type": "workout-cell", "week": ALL, "day": ALL, "plan": ALL}, "n_clicks"),
-         Input("modal-cancel", "n_clicks"),
-         Input("modal-save", "n_clicks")],
+         Output("workout-notes", "value"),
+         Output("track-summary", "children"),
+         Output("track-upload", "contents"),
+         Output("track-cell", "data")],
+        Input("selected-cell", "data"),
+        [State("log-cache", "data"),
+         State("pending-logs", "data")],
+        prevent_initial_call=True
+    )
+    
+    # Show the GPS track of the opened workout
+    @app.callback(
+        Output("track-summary", "children", allow_duplicate=True),
+        Input("track-cell", "data"),
+        [State("distance-unit", "value"),
+         State("session-id", "data")],
+        prevent_initial_call=True
+    )
+    def display_track(cell, unit_val, session_id):
+        # Only the session's own plans show their tracks
+        if not cell or not owns_plan(cell["plan"], session_id):
+            return no_update
+        track = db.get_track(cell["plan"], cell["week"], cell["day"])
+        return create_track_summary(track, unit_val or "miles")
+    
+    # Attach a GPS file to the open workout and fill in its time, distance and pace
+    @app.callback(
+        [Output("actual-time", "value", allow_duplicate=True),
+         Output("actual-distance", "value", allow_duplicate=True),
+         Output("actual-pace", "value", allow_duplicate=True),
+         Output("track-summary", "children", allow_duplicate=True),
+         Output("log-cache", "data", allow_duplicate=True),
+         Output("weekly-summary-container", "children", allow_duplicate=True),
+         Output("training-load-container", "children", allow_duplicate=True)],
+        Input("track-upload", "contents"),
+        [State("modal-week", "data"),
+         State("modal-day", "data"),
+         State("modal-plan", "data"),
+         State("distance-unit", "value"),
+         State("plan-selector", "value"),
+         State("session-id", "data")],
+        prevent_initial_call=True
+    )
+    def attach_track(contents, week, day, plan_id, unit_val, selected_plan, session_id):
+        if not (contents and plan_id and week and day):
+            return (no_update,) * 7
+        if not owns_plan(plan_id, session_id):
+            error = html.Div("Plan not found", className="track-summary text-danger")
+            return no_update, no_update, no_update, error, no_update, no_update, no_update
+        
+        # contents is a data URL: "data:<type>;base64,<payload>"
+        data = base64.b64decode(contents.partition(",")[2])
+        unit = unit_val or "miles"
+        try:
+            track = db.attach_track(plan_id, week, day, io.BytesIO(data), unit)
+        except ValueError as e:
+            error = html.Div(str(e), className="track-summary text-danger")
+            return no_update, no_update, no_update, error, no_update, no_update, no_update
+        
+        log = db.get_workout_log(plan_id, week, day)
+        chart = training_load_chart(session_id)
+        if plan_id != selected_plan:
+            cache, summary = no_update, no_update
+        else:
+            cache = Patch()
+            cache["logs"][f"{week}-{day}"] = cached_log(log, track=True)
+            summary = create_summary_table(db.get_weekly_summaries(plan_id))
+        return (log["actual_time"], log["actual_distance"], log["actual_pace"],
+                create_track_summary(track, unit), cache, summary, chart)
+    
+    # Close modal
+    @app.callback(
+        Output("workout-modal", "is_open", allow_duplicate=True),
+        Input("modal-cancel", "n_clicks"),
+        prevent_initial_call=True
+    )
+    def close_workout_modal(n_clicks):
+        return False
+    
+    # Save workout into the browser's queue; the sync below sends it to the
+    # server. A later save of the same cell replaces the queued one.
+    app.clientside_callback(
+        """
+        function(nClicks, week, day, plan, time, distance, pace, unit, intensity, notes, pending) {
+            if (!(plan && week && day)) {
+                return [false, dash_clientside.no_update];
+            }
+            const log = {
+                plan_id: plan, week: week, day: day,
+                actual_time: time ?? null, actual_distance: distance ?? null, actual_pace: pace ?? null,
+                distance_unit: unit || "miles", intensity: intensity ?? null, notes: notes || "",
+                // UTC, in the server's timestamp format, for last-write-wins
+                updated_at: new Date().toISOString().replace("T", " ").slice(0, 23)
+            };
+            const queue = (pending || []).filter(
+                queued => !(queued.plan_id === plan && queued.week === week && queued.day === day));
+            queue.push(log);
+            return [false, queue];
+        }
+        """,
+        [Output("workout-modal", "is_open", allow_duplicate=True),
+         Output("pending-logs", "data")],
+        Input("modal-save", "n_clicks"),
         [State("modal-week", "data"),
          State("modal-day", "data"),
          State("modal-plan", "data"),
@@ -165,87 +438,101 @@ def register_callbacks(app, db: Database):
          State("actual-pace", "value"),
          State("distance-unit", "value"),
          State("intensity-slider", "value"),
-         State("workout-notes", "value")],
-        prevent_initial_call=True
-    )
-    def handle_modal(cell_clicks, cancel_clicks, save_clicks, 
-                    stored_week, stored_day, stored_plan,
-                    time_val, dist_val, pace_val, unit_val, intensity_val, notes_val):
-        
-        triggered_id = ctx.triggered_id
-        
-        # Close modal
-        if triggered_id == "modal-cancel":
-            return False, "", None, None, None, None, None, None, "miles", 3, ""
-        
-        # Save workout
-        if triggered_id == "modal-save":
-            if stored_plan and stored_week and stored_day:
-                db.save_workout_log(
-                    plan_id=stored_plan,
-                    week=stored_week,
-                    day=stored_day,
-                    actual_time=time_val,
-                    actual_distance=dist_val,
-                    actual_pace=pace_val,
-                    distance_unit=unit_val,
-                    intensity=intensity_val,
-                    notes=notes_val or ""
-                )
-            return False, "", None, None, None, None, None, None, "miles", 3, ""
-        
-        # Open modal for cell click
-        if isinstance(triggered_id, dict) and triggered_id.get("type") == "workout-cell":
-            # Get the index of the clicked cell
-            clicked_index = None
-            for i, clicks in enumerate(cell_clicks):
-                if clicks and clicks > 0:
-                    clicked_index = i
-                    break
-            
-            # Only open modal if a cell was actually clicked (not just rendered)
-            if clicked_index is None:
-                return no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update
-            
-            week = triggered_id["week"]
-            day = triggered_id["day"]
-            plan_id = triggered_id["plan"]
-            
-            # Check if there's existing log
-            existing_log = db.get_workout_log(plan_id, week, day)
-            
-            day_names = {1: "Recovery", 2: "Speed", 3: "Endurance"}
-            title = f"Week {week} - Day {day}: {day_names.get(day, 'Workout')}"
-            
-            if existing_log:
-                return (True, title, week, day, plan_id,
-                       existing_log.get("actual_time"),
-                       existing_log.get("actual_distance"),
-                       existing_log.get("actual_pace"),
-                       existing_log.get("distance_unit", "miles"),
-                       existing_log.get("intensity", 3),
-                       existing_log.get("notes", ""))
-            else:
-                return True, title, week, day, plan_id, None, None, None, "miles", 3, ""
-        
-        return no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update
-    
-    # Refresh grid after saving
+         State("workout-notes", "value"),
+         State("pending-logs", "data")],
+        prevent_initial_call=True
+    )
+    
+    # Sync only while there are saves waiting
+    app.clientside_callback(
+        """
+        function(pending) {
+            return !(pending && pending.length);
+        }
+        """,
+        Output("sync-interval", "disabled"),
+        Input("pending-logs", "data")
+    )
+    
+    # Send queued saves in one batch
     @app.callback(
-        Output("training-grid-container", "children", allow_duplicate=True),
-        Input("modal-save", "n_clicks"),
-        [State("modal-plan", "data"),
+        [Output("sync-ack", "data"),
+         Output("weekly-summary-container", "children", allow_duplicate=True),
+         Output("training-load-container", "children", allow_duplicate=True)],
+        Input("sync-interval", "n_intervals"),
+        [State("pending-logs", "data"),
+         State("session-id", "data"),
          State("plan-selector", "value")],
         prevent_initial_call=True
     )
-    def refresh_grid_after_save(n_clicks, modal_plan, selected_plan):
-        plan_id = modal_plan or selected_plan
-        if not plan_id:
-            return no_update
+    def sync_logs(n_intervals, pending, session_id, selected_plan):
+        if not (pending and session_id):
+            return no_update, no_update, no_update
         
-        plan = db.get_plan(plan_id)
-        if not plan:
-            return no_update
+        # Only the session's own plans take edits; the rest are dropped
+        def plan_of(log):
+            plan_id = log.get("plan_id") if isinstance(log, dict) else None
+            return plan_id if isinstance(plan_id, str) else None
         
-        completed_cells = db.get_completed_cells(plan_id)
-        return create_grid_table(plan["weeks"], plan_id, completed_cells)
+        owned = {plan_id for plan_id in {plan_of(log) for log in pending} - {None}
+                 if owns_plan(plan_id, session_id)}
+        synced = iter(db.sync_workout_logs([log for log in pending if plan_of(log) in owned]))
+        
+        results = []
+        for log in pending:
+            if plan_of(log) not in owned:
+                results.append(sync_result(log))
+                continue
+            result = next(synced)
+            if not result["applied"] and "error" not in result:
+                # A newer edit is on the server; the browser takes that one
+                current = db.get_workout_log(log["plan_id"], log["week"], log["day"])
+                result["current"] = cached_log(current) if current else None
+            results.append(result)
+        
+        if not any(result["applied"] for result in results):
+            return results, no_update, no_update
+        summary = no_update
+        if any(result["applied"] and result["plan_id"] == selected_plan for result in results):
+            summary = create_summary_table(db.get_weekly_summaries(selected_plan))
+        return results, summary, training_load_chart(session_id)
+    
+    # Drop acknowledged saves from the queue and fold them into the cache.
+    # Saves made while the batch was in flight have a different updated_at
+    # and stay queued.
+    app.clientside_callback(
+        """
+        function(ack, pending, cache) {
+            if (!ack) {
+                return [dash_clientside.no_update, dash_clientside.no_update];
+            }
+            // Missing fields come back as null from the server
+            const key = log => ["plan_id", "week", "day", "updated_at"]
+                .map(field => String((log || {})[field] ?? null)).join(":");
+            const sent = new Map((pending || []).map(log => [key(log), log]));
+            const acked = new Set(ack.map(key));
+            const queue = (pending || []).filter(log => !acked.has(key(log)));
+            if (!cache) {
+                return [queue, dash_clientside.no_update];
+            }
+            const logs = Object.assign({}, cache.logs);
+            ack.forEach(result => {
+                if (result.plan_id !== cache.plan) {
+                    return;
+                }
+                const cell = result.week + "-" + result.day;
+                const log = result.applied ? sent.get(key(result)) : result.current;
+                if (log) {
+                    logs[cell] = Object.assign({track: false}, logs[cell], log);
+                }
+            });
+            return [queue, {plan: cache.plan, logs: logs}];
+        }
+        """,
+        [Output("pending-logs", "data", allow_duplicate=True),
+         Output("log-cache", "data", allow_duplicate=True)],
+        Input("sync-ack", "data"),
+        [State("pending-logs", "data"),
+         State("log-cache", "data")],
+        prevent_initial_call=True
+    )
@@ -0,0 +1,97 @@
+"""Provision the same plan for a whole coaching cohort at once.
+
+Plans for every runner are inserted in one transaction (one per shard
+with sharded storage). With --clone, the new plans take an existing
+plan's name, length and race distance unless given, and start with a
+copy of its logged workouts, e.g. the targets a coach filled in.
+
+Usage:
+    python cohort.py --name "Spring block" --weeks 12 --distance "Half Marathon" < sessions.txt
+    python cohort.py --clone <plan_id> --sessions sessions.txt --output plans.csv
+
+Session ids are read one per line; blank lines and repeats are skipped.
+The new plans are written as session_id,plan_id CSV.
+"""
+import argparse
+import csv
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import config
+from storage import StorageBackend, open_storage
+
+def provision_cohort(db: StorageBackend, session_ids: Iterable[str], name: Optional[str] = None,
+                     weeks: Optional[int] = None, race_distance: Optional[str] = None,
+                     clone_from: Optional[str] = None) -> Dict:
+    """Create a plan for each session and report how long it took
+    
+    Returns the plan ids by session plus plans, logs, seconds and rows_per_s.
+    """
+    sessions = list(dict.fromkeys(s.strip() for s in session_ids if s.strip()))
+    logs: List[Dict] = []
+    if clone_from:
+        source = db.get_plan(clone_from)
+        if source is None:
+            raise KeyError(f"Unknown training plan {clone_from}")
+        name = name or source["name"]
+        weeks = weeks or source["weeks"]
+        race_distance = race_distance or source["race_distance"]
+        logs = [log for log in db.get_all_logs_for_plan(clone_from) if log["week"] <= weeks]
+    if not (name and weeks and race_distance):
+        raise ValueError("A plan name, length in weeks and race distance are needed (or a plan to clone)")
+    
+    started = time.perf_counter()
+    plan_ids = db.create_plans_bulk(sessions, name, weeks, race_distance, logs) if sessions else []
+    seconds = time.perf_counter() - started
+    
+    rows = len(plan_ids) * (1 + len(logs))
+    return {
+        "plans": dict(zip(sessions, plan_ids)),
+        "logs": len(plan_ids) * len(logs),
+        "seconds": seconds,
+        "rows_per_s": rows / seconds if seconds else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create a Krunner plan for every runner in a cohort")
+    parser.add_argument("--db", default="krunner.db", help="SQLite database path (default: krunner.db)")
+    parser.add_argument("--sessions", help="file of session ids, one per line (default: stdin)")
+    parser.add_argument("--name", help="plan name")
+    parser.add_argument("--weeks", type=int, help="plan length in weeks")
+    parser.add_argument("--distance", help="race distance, e.g. \"Half Marathon\"")
+    parser.add_argument("--clone", metavar="PLAN_ID", help="copy this plan's settings and logged workouts")
+    parser.add_argument("--output", help="write session_id,plan_id CSV here (default: stdout)")
+    args = parser.parse_args(argv)
+    
+    if args.sessions:
+        with open(args.sessions) as f:
+            session_ids = f.read().splitlines()
+    else:
+        session_ids = sys.stdin.read().splitlines()
+    
+    db = open_storage(config.STORAGE, args.db, config.DB_SHARDS)
+    try:
+        try:
+            result = provision_cohort(db, session_ids, args.name, args.weeks, args.distance, args.clone)
+        except (KeyError, ValueError) as e:
+            print(f"❌ {e.args[0]}", file=sys.stderr)
+            return 1
+    finally:
+        db.close()
+    
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["session_id", "plan_id"])
+        writer.writerows(result["plans"].items())
+    finally:
+        if args.output:
+            out.close()
+    
+    print(f"✅ Created {len(result['plans']):,} plan(s) and {result['logs']:,} log(s) "
+          f"in {result['seconds'] * 1000:.1f} ms ({result['rows_per_s']:,.0f} rows/s)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Runtime settings, read from KRUNNER_* environment variables"""
+import os
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+# Database
+STORAGE = os.environ.get("KRUNNER_STORAGE", "sqlite")
+DB_PATH = os.environ.get("KRUNNER_DB", "krunner.db")
+DB_SHARDS = env_int("KRUNNER_DB_SHARDS", 8)
+DB_POOL_SIZE = env_int("KRUNNER_DB_POOL_SIZE", 8)
+DB_POOL_TIMEOUT_S = env_int("KRUNNER_DB_POOL_TIMEOUT_S", 30)
+DB_MAX_EXPORTS = env_int("KRUNNER_DB_MAX_EXPORTS", 2)
+DB_BUSY_TIMEOUT_MS = env_int("KRUNNER_DB_BUSY_TIMEOUT_MS", 5000)
+DB_WRITE_RETRIES = env_int("KRUNNER_DB_WRITE_RETRIES", 5)
+DB_WRITE_BEHIND = env_bool("KRUNNER_DB_WRITE_BEHIND", False)
+
+# Maintenance; 0 turns the background pass off, and makes deletes immediate.
+# Every process runs its own pass, so enable it in one process only.
+MAINTENANCE_INTERVAL_S = env_int("KRUNNER_MAINTENANCE_INTERVAL_S", 0)
+PURGE_DELETED_AFTER_DAYS = env_int("KRUNNER_PURGE_DELETED_AFTER_DAYS", 0)
+
+# Instrumentation
+METRICS = env_bool("KRUNNER_METRICS", False)
+SLOW_QUERY_MS = env_int("KRUNNER_SLOW_QUERY_MS", 0)
+
+# Browser
+SYNC_INTERVAL_MS = env_int("KRUNNER_SYNC_INTERVAL_MS", 15000)
+
+# Development server (python app.py); production runs through gunicorn.conf.py
+DEBUG = env_bool("KRUNNER_DEBUG", False)
+HOST = os.environ.get("KRUNNER_HOST", "0.0.0.0")
+PORT = env_int("KRUNNER_PORT", 8050)
@@ -1,203 +1,1767 @@
+import functools
+import itertools
+import json
+import operator
+import os
+import queue
+import random
+import re
+import shutil
 import sqlite3
+import tempfile
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-class Database:
-    def __init__(self, db_path: str = "krunner.db"):
+import numpy as np
+
+from archive import LOG_FIELDS, PlanArchive, archive_path, write_archive
+from importer import normalize_log, parse_timestamp
+from storage import StorageBackend, sync_result
+from tracks import pack_track, parse_track, summarize_track, unpack_track
+from training_load import ACUTE_ALPHA, CHRONIC_ALPHA, days_since_epoch, ewma
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Append new entries; never edit one that has shipped.
+MIGRATIONS = [
+    # 1: base schema
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS training_plans (
+            id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            weeks INTEGER NOT NULL,
+            race_distance TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS workout_logs (
+            id TEXT PRIMARY KEY,
+            plan_id TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            actual_time REAL,
+            actual_distance REAL,
+            actual_pace REAL,
+            distance_unit TEXT DEFAULT 'miles',
+            intensity INTEGER,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (plan_id) REFERENCES training_plans(id) ON DELETE CASCADE
+        )
+        ''',
+    ],
+    # 2: lookup indexes and one log per (plan, week, day)
+    [
+        # Keep only the most recently updated duplicate before enforcing uniqueness
+        '''
+        DELETE FROM workout_logs WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, ROW_NUMBER() OVER (
+                    PARTITION BY plan_id, week, day
+                    ORDER BY updated_at DESC, rowid DESC
+                ) AS rank FROM workout_logs
+            ) WHERE rank > 1
+        )
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_workout_logs_plan_week_day ON workout_logs (plan_id, week, day)',
+        'CREATE INDEX IF NOT EXISTS idx_training_plans_session ON training_plans (session_id, created_at)',
+    ],
+    # 3: plan revision counter, bumped whenever a plan's logs change
+    [
+        'ALTER TABLE training_plans ADD COLUMN revision INTEGER NOT NULL DEFAULT 0',
+    ],
+    # 4: per-(plan, week) training aggregates, backfilled from existing logs
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS weekly_summaries (
+            plan_id TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            workouts INTEGER NOT NULL DEFAULT 0,
+            total_miles REAL NOT NULL DEFAULT 0,
+            total_minutes REAL NOT NULL DEFAULT 0,
+            paced_miles REAL NOT NULL DEFAULT 0,
+            paced_minutes REAL NOT NULL DEFAULT 0,
+            intensity_total INTEGER NOT NULL DEFAULT 0,
+            intensity_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (plan_id, week),
+            FOREIGN KEY (plan_id) REFERENCES training_plans(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO weekly_summaries
+        SELECT plan_id, week, COUNT(*), TOTAL(miles), TOTAL(actual_time),
+               TOTAL(CASE WHEN actual_time > 0 THEN miles END),
+               TOTAL(CASE WHEN miles > 0 THEN actual_time END),
+               TOTAL(intensity), COUNT(intensity)
+        FROM (
+            SELECT plan_id, week, actual_time, intensity,
+                   CASE WHEN distance_unit = 'km' THEN actual_distance / 1.609344
+                        ELSE actual_distance END AS miles
+            FROM workout_logs
+        )
+        GROUP BY plan_id, week
+        ''',
+    ],
+    # 5: canonical units (meters, seconds, seconds per km), backfilled
+    [
+        'ALTER TABLE workout_logs ADD COLUMN distance_m REAL',
+        'ALTER TABLE workout_logs ADD COLUMN duration_s REAL',
+        'ALTER TABLE workout_logs ADD COLUMN pace_s_per_km REAL',
+        '''
+        UPDATE workout_logs SET
+            distance_m = actual_distance * CASE WHEN distance_unit = 'km' THEN 1000.0 ELSE 1609.344 END,
+            duration_s = actual_time * 60.0
+        ''',
+        '''
+        UPDATE workout_logs SET pace_s_per_km = CASE
+            WHEN actual_pace IS NOT NULL
+                THEN actual_pace * 60.0 / CASE WHEN distance_unit = 'km' THEN 1.0 ELSE 1.609344 END
+            WHEN duration_s > 0 AND distance_m > 0
+                THEN duration_s / (distance_m / 1000.0)
+        END
+        ''',
+    ],
+    # 6: workout templates keyed by race distance and the plan length they were written for
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS workout_templates (
+            race_distance TEXT NOT NULL,
+            weeks INTEGER NOT NULL,
+            schedule TEXT NOT NULL,
+            revision INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (race_distance, weeks)
+        ) WITHOUT ROWID
+        ''',
+        # The schedule create_grid_table used to hard-code, as the 5K and fallback template
+        '''
+        INSERT OR IGNORE INTO workout_templates (race_distance, weeks, schedule)
+        SELECT distance, 7, '[
+            ["20 min ez", "10 min ez, 10 min (8:30-9 pace), 10 min ez", "3.5 miles"],
+            ["20 min ez", "10 min ez, 10 min (8:30-9 pace), 10 min ez", "4.5 miles"],
+            ["25 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "6 miles"],
+            ["30 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "5 miles"],
+            ["30 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "5-5.5 miles"],
+            ["20 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "4.5 miles"],
+            ["20 min ez", "20 min ez or rest", "RACE"]
+        ]'
+        FROM (SELECT '5k' AS distance UNION ALL SELECT '*')
+        ''',
+    ],
+    # 7: keyset pagination of a session's plans, newest first or by name prefix
+    [
+        'DROP INDEX IF EXISTS idx_training_plans_session',
+        'CREATE INDEX IF NOT EXISTS idx_training_plans_session_recent ON training_plans (session_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_training_plans_session_name ON training_plans (session_id, name COLLATE NOCASE, id)',
+    ],
+    # 8: full-text index of workout notes, kept in sync by triggers and backfilled.
+    # The session is indexed too, so a search intersects with one session's postings.
+    [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS workout_notes_fts USING fts5(
+            notes, session_id, tokenize = 'porter unicode61'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS workout_logs_notes_insert AFTER INSERT ON workout_logs
+        WHEN new.notes <> '' BEGIN
+            INSERT INTO workout_notes_fts (rowid, notes, session_id)
+            SELECT new.rowid, new.notes, session_id FROM training_plans WHERE id = new.plan_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS workout_logs_notes_update AFTER UPDATE OF notes ON workout_logs BEGIN
+            DELETE FROM workout_notes_fts WHERE rowid = old.rowid;
+            INSERT INTO workout_notes_fts (rowid, notes, session_id)
+            SELECT new.rowid, new.notes, session_id FROM training_plans
+            WHERE id = new.plan_id AND new.notes <> '';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS workout_logs_notes_delete AFTER DELETE ON workout_logs
+        WHEN old.notes <> '' BEGIN
+            DELETE FROM workout_notes_fts WHERE rowid = old.rowid;
+        END
+        ''',
+        '''
+        INSERT INTO workout_notes_fts (rowid, notes, session_id)
+        SELECT l.rowid, l.notes, p.session_id
+        FROM workout_logs l JOIN training_plans p ON p.id = l.plan_id
+        WHERE l.notes <> ''
+        ''',
+    ],
+    # 9: reindex notes only when an update actually changes them
+    [
+        'DROP TRIGGER IF EXISTS workout_logs_notes_update',
+        '''
+        CREATE TRIGGER workout_logs_notes_update AFTER UPDATE OF notes ON workout_logs
+        WHEN old.notes IS NOT new.notes BEGIN
+            DELETE FROM workout_notes_fts WHERE rowid = old.rowid;
+            INSERT INTO workout_notes_fts (rowid, notes, session_id)
+            SELECT new.rowid, new.notes, session_id FROM training_plans
+            WHERE id = new.plan_id AND new.notes <> '';
+        END
+        ''',
+    ],
+    # 10: archived plans keep their row; their logs move to columnar files (see archive.py)
+    [
+        'ALTER TABLE training_plans ADD COLUMN archived_at TIMESTAMP',
+        'CREATE INDEX IF NOT EXISTS idx_training_plans_archived ON training_plans (session_id) WHERE archived_at IS NOT NULL',
+    ],
+    # 11: GPS tracks, one per workout cell, with their summary and packed samples (see tracks.py).
+    # Keyed by the cell rather than the log id, so tracks stay put while a plan is archived.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS workout_tracks (
+            plan_id TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            started_at TIMESTAMP,
+            distance_m REAL NOT NULL,
+            elapsed_s REAL NOT NULL,
+            moving_s REAL NOT NULL,
+            elevation_gain_m REAL NOT NULL,
+            split_m REAL NOT NULL,
+            splits TEXT NOT NULL,
+            samples BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (plan_id, week, day),
+            FOREIGN KEY (plan_id) REFERENCES training_plans(id) ON DELETE CASCADE
+        )
+        ''',
+    ],
+    # 12: per-session training load, one row per day with load (see training_load.py).
+    # Sessions listed as stale are rebuilt in full on next use, which also backfills existing ones.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS training_load (
+            session_id TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            load REAL NOT NULL,
+            acute REAL NOT NULL,
+            chronic REAL NOT NULL,
+            PRIMARY KEY (session_id, day)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE TABLE IF NOT EXISTS training_load_stale (session_id TEXT PRIMARY KEY) WITHOUT ROWID',
+        'INSERT OR IGNORE INTO training_load_stale SELECT DISTINCT session_id FROM training_plans',
+    ],
+    # 13: soft-deleted plans wait in place until purged. Foreign keys are enforced from now on,
+    # so clear out rows left behind by plans deleted while they were not.
+    [
+        'ALTER TABLE training_plans ADD COLUMN deleted_at TIMESTAMP',
+        'CREATE INDEX IF NOT EXISTS idx_training_plans_deleted ON training_plans (deleted_at) WHERE deleted_at IS NOT NULL',
+        'DELETE FROM workout_logs WHERE plan_id NOT IN (SELECT id FROM training_plans)',
+        'DELETE FROM weekly_summaries WHERE plan_id NOT IN (SELECT id FROM training_plans)',
+        'DELETE FROM workout_tracks WHERE plan_id NOT IN (SELECT id FROM training_plans)',
+    ],
+    # 14: notes of archived plans stay searchable. Their own full-text index, since rowids of
+    # deleted logs may be reused; Database.init_db indexes plans archived before this.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS archived_notes (
+            id INTEGER PRIMARY KEY,
+            plan_id TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            notes TEXT NOT NULL,
+            created_at TIMESTAMP,
+            FOREIGN KEY (plan_id) REFERENCES training_plans(id) ON DELETE CASCADE
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_archived_notes_plan ON archived_notes (plan_id)',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS archived_notes_fts USING fts5(
+            notes, session_id, tokenize = 'porter unicode61'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS archived_notes_insert AFTER INSERT ON archived_notes BEGIN
+            INSERT INTO archived_notes_fts (rowid, notes, session_id)
+            SELECT new.id, new.notes, session_id FROM training_plans WHERE id = new.plan_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS archived_notes_delete AFTER DELETE ON archived_notes BEGIN
+            DELETE FROM archived_notes_fts WHERE rowid = old.id;
+        END
+        ''',
+    ],
+]
+
+# Schema version that added archived_notes, backfilled from archive files by init_db
+ARCHIVED_NOTES_VERSION = 14
+
+# Tables whose statistics the planner uses, refreshed by analyze()
+ANALYZED_TABLES = ('training_plans', 'workout_logs', 'weekly_summaries', 'workout_tracks',
+                   'training_load', 'workout_templates')
+
+METERS_PER_UNIT = {'miles': 1609.344, 'km': 1000.0}
+
+# Column order shared by save_workout_log and import_workout_logs
+INSERT_PLAN_SQL = '''
+    INSERT INTO training_plans (id, session_id, name, weeks, race_distance)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+UPSERT_WORKOUT_LOG_SQL = '''
+    INSERT INTO workout_logs
+    (id, plan_id, week, day, actual_time, actual_distance,
+     actual_pace, distance_unit, intensity, notes, created_at,
+     distance_m, duration_s, pace_s_per_km, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?,
+            strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT (plan_id, week, day) DO UPDATE SET
+        actual_time = excluded.actual_time,
+        actual_distance = excluded.actual_distance,
+        actual_pace = excluded.actual_pace,
+        distance_unit = excluded.distance_unit,
+        intensity = excluded.intensity,
+        notes = excluded.notes,
+        distance_m = excluded.distance_m,
+        duration_s = excluded.duration_s,
+        pace_s_per_km = excluded.pace_s_per_km,
+        updated_at = excluded.updated_at
+'''
+
+# updated_at has milliseconds on every write, so server saves and synced edits compare
+# correctly within the same second. Whole-second values from before sort first.
+
+# Applies an edit made offline only if it is newer than the stored log (last writer wins).
+# Times from a client clock running ahead are capped at the current time.
+SYNC_WORKOUT_LOG_SQL = '''
+    INSERT INTO workout_logs
+    (id, plan_id, week, day, actual_time, actual_distance,
+     actual_pace, distance_unit, intensity, notes, created_at,
+     distance_m, duration_s, pace_s_per_km, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+            COALESCE(MIN(?, strftime('%Y-%m-%d %H:%M:%f', 'now')), CURRENT_TIMESTAMP), ?, ?, ?,
+            MIN(?, strftime('%Y-%m-%d %H:%M:%f', 'now')))
+    ON CONFLICT (plan_id, week, day) DO UPDATE SET
+        actual_time = excluded.actual_time,
+        actual_distance = excluded.actual_distance,
+        actual_pace = excluded.actual_pace,
+        distance_unit = excluded.distance_unit,
+        intensity = excluded.intensity,
+        notes = excluded.notes,
+        distance_m = excluded.distance_m,
+        duration_s = excluded.duration_s,
+        pace_s_per_km = excluded.pace_s_per_km,
+        updated_at = excluded.updated_at
+    WHERE excluded.updated_at > workout_logs.updated_at
+    RETURNING id
+'''
+
+# Imported plans grow to cover the highest week seen
+UPSERT_PLAN_SQL = '''
+    INSERT INTO training_plans (id, session_id, name, weeks, race_distance)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        weeks = MAX(weeks, excluded.weeks),
+        revision = revision + 1
+'''
+
+# Aggregates logs into weekly_summaries rows. Average pace is total time over
+# total distance of the workouts that record both.
+WEEK_SUMMARY_SELECT_SQL = '''
+    SELECT plan_id, week, COUNT(*), TOTAL(miles), TOTAL(actual_time),
+           TOTAL(CASE WHEN actual_time > 0 THEN miles END),
+           TOTAL(CASE WHEN miles > 0 THEN actual_time END),
+           TOTAL(intensity), COUNT(intensity)
+    FROM (
+        SELECT plan_id, week, intensity,
+               duration_s / 60.0 AS actual_time,
+               distance_m / 1609.344 AS miles
+        FROM workout_logs
+        {where}
+    )
+    GROUP BY plan_id, week
+'''
+
+# Recomputes one (plan, week) summary from its few logs via the unique index
+REFRESH_WEEK_SUMMARY_SQL = ('INSERT OR REPLACE INTO weekly_summaries' +
+                            WEEK_SUMMARY_SELECT_SQL.format(where='WHERE plan_id = ? AND week = ?'))
+
+# Delimiters around matched terms in search_notes snippets
+SNIPPET_MARK_START = '\x02'
+SNIPPET_MARK_END = '\x03'
+
+# Puts archived logs back exactly as they were, ids and timestamps included
+RESTORE_LOG_SQL = f'''
+    INSERT OR IGNORE INTO workout_logs ({', '.join(LOG_FIELDS)})
+    VALUES ({', '.join('?' * len(LOG_FIELDS))})
+'''
+
+# Keeps an archived log's notes in the notes search
+ARCHIVE_NOTE_SQL = '''
+    INSERT INTO archived_notes (plan_id, week, day, notes, created_at)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Open archive files kept mapped per process
+ARCHIVE_CACHE_SIZE = 64
+
+# Replaces a cell's track summary and samples together
+UPSERT_TRACK_SQL = '''
+    INSERT OR REPLACE INTO workout_tracks
+    (plan_id, week, day, format, points, started_at, distance_m, elapsed_s,
+     moving_s, elevation_gain_m, split_m, splits, samples)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Everything get_track returns except the samples blob
+TRACK_SUMMARY_COLUMNS = ('plan_id, week, day, format, points, started_at, distance_m, elapsed_s, '
+                         'moving_s, elevation_gain_m, split_m, splits, created_at')
+
+# UTC day number (days since 1970-01-01) of a timestamp column
+LOAD_DAY_SQL = 'CAST(julianday({column}) - 2440587.5 AS INTEGER)'
+
+# Session, day and load of the log in one cell, or in a JSON list of [plan_id, week, day] cells
+LOG_LOADS_SELECT_SQL = f'''
+    SELECT p.session_id, {LOAD_DAY_SQL.format(column='l.created_at')} AS load_day,
+           COALESCE(l.duration_s / 60.0 * l.intensity, 0) AS load
+    FROM {{source}}
+    JOIN training_plans p ON p.id = l.plan_id AND p.deleted_at IS NULL
+'''
+# The same for a log just written, read back by the upsert itself
+RETURNING_LOG_LOAD_SQL = f'''
+    RETURNING id,
+        (SELECT session_id FROM training_plans p WHERE p.id = workout_logs.plan_id AND p.deleted_at IS NULL) AS session_id,
+        {LOAD_DAY_SQL.format(column='created_at')} AS load_day,
+        COALESCE(duration_s / 60.0 * intensity, 0) AS load
+'''
+LOG_LOAD_SQL = LOG_LOADS_SELECT_SQL.format(source='workout_logs l') + ' WHERE l.plan_id = ? AND l.week = ? AND l.day = ?'
+LOG_LOADS_SQL = LOG_LOADS_SELECT_SQL.format(source='''json_each(?) c
+    JOIN workout_logs l ON l.plan_id = json_extract(c.value, '$[0]')
+        AND l.week = json_extract(c.value, '$[1]') AND l.day = json_extract(c.value, '$[2]')''')
+
+# Total load per day over a session's logs still in workout_logs
+SESSION_DAILY_LOAD_SQL = f'''
+    SELECT {LOAD_DAY_SQL.format(column='l.created_at')} AS load_day,
+           TOTAL(l.duration_s / 60.0 * l.intensity) AS load
+    FROM training_plans p JOIN workout_logs l ON l.plan_id = p.id
+    WHERE p.session_id = ? AND p.deleted_at IS NULL
+    GROUP BY load_day
+'''
+
+# Whether a session's load awaits a rebuild, and its latest day (NULLs if it has none), in one query
+LATEST_TRAINING_LOAD_SQL = '''
+    SELECT EXISTS (SELECT 1 FROM training_load_stale WHERE session_id = ?) AS stale,
+           t.day, t.load, t.acute, t.chronic
+    FROM (SELECT 1) LEFT JOIN (
+        SELECT day, load, acute, chronic FROM training_load
+        WHERE session_id = ?
+        ORDER BY day DESC LIMIT 1
+    ) t
+'''
+UPSERT_TRAINING_LOAD_SQL = 'INSERT OR REPLACE INTO training_load VALUES (?, ?, ?, ?, ?)'
+
+BUMP_REVISION_SQL = 'UPDATE training_plans SET revision = revision + 1 WHERE id = ?'
+
+def notes_match_query(session_id: str, text: str) -> Optional[str]:
+    """FTS5 query for free-text search terms within one session
+    
+    Every word must match and the last one may be a prefix, so the search
+    narrows as the user types. Terms are quoted, so FTS5 syntax in user
+    input is matched literally instead of raising an error.
+    """
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    phrases = ' '.join(f'"{term}"' for term in terms)
+    session = session_id.replace('"', '""')
+    return f'session_id : "{session}" AND notes : ({phrases}*)'
+
+def canonical_units(actual_time: Optional[float], actual_distance: Optional[float],
+                    actual_pace: Optional[float], distance_unit: str) -> Tuple[Optional[float], ...]:
+    """Convert user-entered minutes/distance/pace into (meters, seconds, seconds per km)"""
+    meters_per_unit = METERS_PER_UNIT.get(distance_unit, METERS_PER_UNIT['miles'])
+    distance_m = actual_distance * meters_per_unit if actual_distance is not None else None
+    duration_s = actual_time * 60.0 if actual_time is not None else None
+    
+    if actual_pace is not None:
+        pace_s_per_km = actual_pace * 60.0 * 1000.0 / meters_per_unit
+    elif duration_s and distance_m:
+        pace_s_per_km = duration_s / (distance_m / 1000.0)
+    else:
+        pace_s_per_km = None
+    
+    return distance_m, duration_s, pace_s_per_km
+
+def retry_when_locked(method):
+    """Retry a write with jittered exponential backoff while another process holds the lock
+    
+    busy_timeout already waits inside SQLite; this covers contention that
+    outlasts it. Calls nested in an enclosing transaction are not retried,
+    since only the outermost transaction can be safely replayed.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        delay = self.retry_delay
+        for attempt in range(self.write_retries + 1):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                locked = 'locked' in str(e) or 'busy' in str(e)
+                if not locked or attempt == self.write_retries or self.in_transaction():
+                    raise
+                time.sleep(delay * (1 + random.random()))
+                delay *= 2
+    return wrapper
+
+def default_archive_dir(db_path: str) -> str:
+    """Directory holding a database file's plan archives: krunner.db -> krunner-archive"""
+    return os.path.splitext(db_path)[0] + "-archive"
+
+def workout_log_params(log: Dict) -> tuple:
+    """Parameters for UPSERT_WORKOUT_LOG_SQL from a log dict, with canonical units filled in"""
+    distance_unit = log.get('distance_unit') or 'miles'
+    return (
+        log.get('id') or str(uuid.uuid4()), log['plan_id'], log['week'], log['day'],
+        log.get('actual_time'), log.get('actual_distance'), log.get('actual_pace'),
+        distance_unit, log.get('intensity'), log.get('notes') or '', log.get('created_at'),
+        *canonical_units(log.get('actual_time'), log.get('actual_distance'),
+                         log.get('actual_pace'), distance_unit),
+    )
+
+def checked_sync_log(log: Dict) -> Dict:
+    """A log edited on a client, validated like an imported record; raises on bad fields"""
+    plan_id = log.get('plan_id')
+    if not isinstance(plan_id, str) or not plan_id:
+        raise ValueError(f"invalid plan_id: {plan_id!r}")
+    updated_at = parse_timestamp(log.get('updated_at'), milliseconds=True)
+    if updated_at is None:
+        raise ValueError("missing updated_at")
+    return {'plan_id': plan_id, **normalize_log(log), 'updated_at': updated_at}
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections
+    
+    Long readers such as exports get a dedicated connection instead, so
+    a stalled download never holds a pooled one. Waiting longer than
+    timeout seconds for either raises TimeoutError.
+    """
+    
+    def __init__(self, factory, max_size: int = 8, timeout: float = 30.0, max_dedicated: int = 2):
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_dedicated = max_dedicated
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._dedicated = threading.BoundedSemaphore(max_dedicated)
+        self._pid = os.getpid()
+        self._inherited = []
+    
+    def _check_fork(self):
+        # SQLite connections must not cross fork(); a forked worker starts a
+        # fresh pool and keeps the parent's connections unclosed
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            while True:
+                try:
+                    self._inherited.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+            self._slots = threading.BoundedSemaphore(self.max_size)
+            self._dedicated = threading.BoundedSemaphore(self.max_dedicated)
+    
+    def _wait(self, slots: threading.BoundedSemaphore, what: str):
+        if not slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No {what} free after {self.timeout:g}s")
+    
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, opening a new one only if none are idle"""
+        self._check_fork()
+        self._wait(self._slots, "database connection")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self.factory()
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool"""
+        self._idle.put(conn)
+        self._slots.release()
+    
+    @contextmanager
+    def dedicated(self):
+        """Open a connection outside the pool, closed on exit; at most max_dedicated at once"""
+        self._check_fork()
+        self._wait(self._dedicated, "export connection")
+        try:
+            conn = self.factory()
+            try:
+                yield conn
+            finally:
+                conn.close()
+        finally:
+            self._dedicated.release()
+    
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class Database(StorageBackend):
+    def __init__(self, db_path: str = "krunner.db", pool_size: int = 8,
+                 busy_timeout: int = 5000, cache_size: int = -16000,
+                 write_retries: int = 5, retry_delay: float = 0.05,
+                 write_behind: bool = False, archive_dir: Optional[str] = None,
+                 maintenance_interval: float = 0, purge_deleted_after_days: Optional[float] = None,
+                 pool_timeout: float = 30.0, max_streams: int = 2):
         self.db_path = db_path
+        self.archive_dir = archive_dir or default_archive_dir(db_path)
+        self._archives = OrderedDict()
+        self._archive_lock = threading.Lock()
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+        self.write_retries = write_retries
+        self.retry_delay = retry_delay
+        self.pool = ConnectionPool(self._connect, pool_size, pool_timeout, max_streams)
+        self._local = threading.local()
         self.init_db()
+        
+        # Optional background group commit of workout saves
+        self.write_queue = None
+        if write_behind:
+            from write_behind import WriteBehindQueue
+            self.write_queue = WriteBehindQueue(self)
+        
+        # Optional background purge of soft-deleted plans, incremental vacuum and ANALYZE
+        self.maintenance = None
+        if maintenance_interval:
+            from maintenance import MaintenanceThread
+            self.maintenance = MaintenanceThread(self, maintenance_interval, purge_deleted_after_days)
     
-    def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection with the standard pragmas applied"""
+        # Transactions are managed explicitly by transaction()
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000,
+                               isolation_level=None, check_same_thread=False,
+                               uri=self.db_path.startswith('file:'))
         conn.row_factory = sqlite3.Row
+        # Only takes effect when the file is created, so it must come first;
+        # older files are converted once by python maintenance.py vacuum
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+        conn.execute(f'PRAGMA cache_size = {int(self.cache_size)}')
+        conn.execute('PRAGMA foreign_keys = ON')
         return conn
     
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; nested calls on one thread share it"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        
+        conn = self.pool.acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self.pool.release(conn)
+    
+    def in_transaction(self) -> bool:
+        """Whether this thread is inside a transaction() block"""
+        conn = getattr(self._local, "conn", None)
+        return conn is not None and conn.in_transaction
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block inside a single transaction, yielding a cursor"""
+        with self.connection() as conn:
+            # Join the enclosing transaction when nested
+            if conn.in_transaction:
+                yield conn.cursor()
+                return
+            
+            # Take the write lock up front so busy_timeout applies instead of
+            # failing on a read-to-write lock upgrade
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn.cursor()
+                conn.execute('COMMIT')
+            except BaseException:
+                # Never hand a connection back to the pool mid-transaction
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+    
+    def stream(self, query: str, params: tuple = (), chunk_size: int = 500) -> Iterator[Dict]:
+        """Yield result rows as dicts, fetching chunk_size rows at a time
+        
+        Rows come from a dedicated connection, opened on the first row and
+        closed when the generator finishes or is closed, so a slow consumer
+        doesn't hold a pooled one. At most max_streams run at once; raises
+        TimeoutError when no stream frees up within pool_timeout.
+        """
+        with self.pool.dedicated() as conn:
+            cursor = conn.execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield dict(row)
+            finally:
+                cursor.close()
+    
+    def flush(self):
+        """Wait until every queued write-behind save is committed"""
+        if self.write_queue is not None:
+            self.write_queue.flush()
+    
+    def pending_writes(self, plan_id: str) -> int:
+        """Number of queued saves for a plan that are not committed yet"""
+        if self.write_queue is None:
+            return 0
+        return len(self.write_queue.pending_cells(plan_id))
+    
+    def write_behind_stats(self) -> Dict[str, int]:
+        """Queue depth and batch-size metrics of the write-behind queue"""
+        return self.write_queue.stats() if self.write_queue is not None else {}
+    
+    def maintenance_stats(self) -> Dict[str, float]:
+        """Counters of the background maintenance thread"""
+        return self.maintenance.stats() if self.maintenance is not None else {}
+    
+    def close(self):
+        """Flush queued writes and close all pooled connections"""
+        if self.maintenance is not None:
+            self.maintenance.close()
+        if self.write_queue is not None:
+            self.write_queue.close()
+        self.pool.close()
+    
+    @retry_when_locked
     def init_db(self):
-        """Initialize database schema"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Training plans table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS training_plans (
-                id TEXT PRIMARY KEY,
-                session_id TEXT NOT NULL,
-                name TEXT NOT NULL,
-                weeks INTEGER NOT NULL,
-                race_distance TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Workout logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS workout_logs (
-                id TEXT PRIMARY KEY,
-                plan_id TEXT NOT NULL,
-                week INTEGER NOT NULL,
-                day INTEGER NOT NULL,
-                actual_time REAL,
-                actual_distance REAL,
-                actual_pace REAL,
-                distance_unit TEXT DEFAULT 'miles',
-                intensity INTEGER,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (plan_id) REFERENCES training_plans(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Initialize database schema, applying any pending migrations"""
+        with self.transaction() as cursor:
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            for target, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f'PRAGMA user_version = {target}')
+            
+            # Archive files are outside SQL, so plans archived before the notes index are done here
+            if version < ARCHIVED_NOTES_VERSION <= len(MIGRATIONS):
+                for row in cursor.execute('''
+                    SELECT id, archived_at FROM training_plans WHERE archived_at IS NOT NULL
+                ''').fetchall():
+                    if os.path.exists(archive_path(self.archive_dir, row['id'])):
+                        self._index_archived_notes(cursor, row['id'],
+                                                   self._open_archive(row['id'], row['archived_at']).logs())
     
     # Training Plans
+    @retry_when_locked
     def create_plan(self, session_id: str, name: str, weeks: int, race_distance: str) -> str:
         """Create a new training plan"""
         plan_id = str(uuid.uuid4())
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.transaction() as cursor:
+            cursor.execute(INSERT_PLAN_SQL, (plan_id, session_id, name, weeks, race_distance))
         
-        cursor.execute('''
-            INSERT INTO training_plans (id, session_id, name, weeks, race_distance)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (plan_id, session_id, name, weeks, race_distance))
-        
-        conn.commit()
-        conn.close()
         return plan_id
     
-    def get_plans(self, session_id: str) -> List[Dict]:
-        """Get all training plans for a session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    @retry_when_locked
+    def create_plans_bulk(self, session_ids: List[str], name: str, weeks: int, race_distance: str,
+                          logs: Optional[List[Dict]] = None) -> List[str]:
+        """Create one plan per session in a single transaction, each starting with a copy of logs
         
-        cursor.execute('''
-            SELECT * FROM training_plans 
-            WHERE session_id = ?
-            ORDER BY created_at DESC
-        ''', (session_id,))
+        Logs beyond the plan's weeks are skipped. Returns the new plan ids
+        in session order.
+        """
+        plan_ids = [str(uuid.uuid4()) for _ in session_ids]
+        logs = [log for log in logs or [] if log['week'] <= weeks]
+        with self.transaction() as cursor:
+            cursor.executemany(INSERT_PLAN_SQL, [(plan_id, session_id, name, weeks, race_distance)
+                                                 for plan_id, session_id in zip(plan_ids, session_ids)])
+            if logs:
+                # Units are converted once per template log; copies differ only in id and plan
+                copies = [workout_log_params({**log, 'created_at': None})[2:] for log in logs]
+                cursor.executemany(UPSERT_WORKOUT_LOG_SQL, [
+                    (str(uuid.uuid4()), plan_id, *params) for plan_id in plan_ids for params in copies
+                ])
+                weeks_logged = {log['week'] for log in logs}
+                cursor.executemany(REFRESH_WEEK_SUMMARY_SQL,
+                                   [(plan_id, week) for plan_id in plan_ids for week in weeks_logged])
+                # Rebuilt once per session on next use rather than per copied log
+                cursor.executemany('INSERT OR IGNORE INTO training_load_stale VALUES (?)',
+                                   {(session_id,) for session_id in session_ids})
         
-        plans = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return plans
+        return plan_ids
+    
+    def get_plans(self, session_id: str) -> List[Dict]:
+        """Get all training plans for a session"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM training_plans
+                WHERE session_id = ? AND deleted_at IS NULL
+                ORDER BY created_at DESC
+            ''', (session_id,))
+            
+            return [dict(row) for row in cursor.fetchall()]
     
     def get_plan(self, plan_id: str) -> Optional[Dict]:
-        """Get a specific training plan"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM training_plans WHERE id = ?', (plan_id,))
-        row = cursor.fetchone()
-        conn.close()
+        """Get a specific training plan, or None if it doesn't exist or is deleted"""
+        with self.connection() as conn:
+            row = conn.execute('SELECT * FROM training_plans WHERE id = ? AND deleted_at IS NULL',
+                               (plan_id,)).fetchone()
         
         return dict(row) if row else None
     
-    def delete_plan(self, plan_id: str) -> bool:
+    def search_plans(self, session_id: str, prefix: str = "", after: Optional[Tuple] = None,
+                     limit: int = 20) -> Tuple[List[Dict], Optional[Tuple]]:
+        """Get one page of a session's plans and the cursor for the next page
+        
+        Plans come newest first, or alphabetically when filtered by a
+        case-insensitive name prefix. Pass the returned cursor as after to
+        continue; it is None on the last page.
+        """
+        if prefix:
+            # A NOCASE range on the name index; U+10FFFF sorts after any continuation
+            query = '''
+                SELECT * FROM training_plans
+                WHERE session_id = ? AND name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE
+                  AND deleted_at IS NULL
+                {after}
+                ORDER BY name COLLATE NOCASE, id
+                LIMIT ?
+            '''.format(after='AND (name COLLATE NOCASE, id) > (?, ?)' if after else '')
+            params = (session_id, prefix, prefix + '\U0010ffff') + tuple(after or ()) + (limit + 1,)
+        else:
+            query = '''
+                SELECT * FROM training_plans
+                WHERE session_id = ? AND deleted_at IS NULL
+                {after}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            '''.format(after='AND (created_at, id) < (?, ?)' if after else '')
+            params = (session_id,) + tuple(after or ()) + (limit + 1,)
+        
+        with self.connection() as conn:
+            plans = [dict(row) for row in conn.execute(query, params).fetchall()]
+        
+        if len(plans) <= limit:
+            return plans, None
+        plans = plans[:limit]
+        last = plans[-1]
+        return plans, (last['name'], last['id']) if prefix else (last['created_at'], last['id'])
+    
+    def export_plans(self, session_id: Optional[str] = None, chunk_size: int = 500) -> Iterator[Dict]:
+        """Stream training plans for one session, or for every session; deleted plans are left out"""
+        if session_id is None:
+            return self.stream('SELECT * FROM training_plans WHERE deleted_at IS NULL', (), chunk_size)
+        return self.stream('''
+            SELECT * FROM training_plans
+            WHERE session_id = ? AND deleted_at IS NULL
+            ORDER BY created_at
+        ''', (session_id,), chunk_size)
+    
+    def delete_plan(self, plan_id: str, soft: bool = False) -> bool:
         """Delete a training plan and all associated workout logs"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        return self.delete_plans([plan_id], soft) > 0
+    
+    @retry_when_locked
+    def delete_plans(self, plan_ids: Iterable[str], soft: bool = False) -> int:
+        """Delete training plans with their logs, summaries and tracks; returns how many were deleted
         
-        # Delete workout logs first
-        cursor.execute('DELETE FROM workout_logs WHERE plan_id = ?', (plan_id,))
+        With soft=True the plans are only marked deleted: they disappear
+        from the app at once and purge_deleted_plans removes them later.
+        """
+        ids = json.dumps(list(plan_ids))
+        # Queued saves must not land after the delete
+        self.flush()
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT OR IGNORE INTO training_load_stale
+                SELECT DISTINCT session_id FROM training_plans WHERE id IN (SELECT value FROM json_each(?))
+            ''', (ids,))
+            if soft:
+                cursor.execute('''
+                    UPDATE training_plans SET deleted_at = CURRENT_TIMESTAMP, revision = revision + 1
+                    WHERE id IN (SELECT value FROM json_each(?)) AND deleted_at IS NULL
+                ''', (ids,))
+                return cursor.rowcount
+            
+            # Logs, summaries and tracks follow through ON DELETE CASCADE
+            deleted = [row[0] for row in cursor.execute(
+                'DELETE FROM training_plans WHERE id IN (SELECT value FROM json_each(?)) RETURNING id',
+                (ids,)).fetchall()]
+        
+        if deleted and not self.in_transaction():
+            self._discard_archives(deleted)
+        return len(deleted)
+    
+    @retry_when_locked
+    def undelete_plan(self, plan_id: str) -> bool:
+        """Bring back a soft-deleted plan that has not been purged yet"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE training_plans SET deleted_at = NULL, revision = revision + 1
+                WHERE id = ? AND deleted_at IS NOT NULL
+            ''', (plan_id,))
+            if not cursor.rowcount:
+                return False
+            cursor.execute('''
+                INSERT OR IGNORE INTO training_load_stale
+                SELECT session_id FROM training_plans WHERE id = ?
+            ''', (plan_id,))
+        return True
+    
+    def purge_deleted_plans(self, older_than_days: float = 0, limit: int = 100) -> int:
+        """Permanently delete up to limit plans soft-deleted at least older_than_days ago"""
+        with self.connection() as conn:
+            plan_ids = [row[0] for row in conn.execute('''
+                SELECT id FROM training_plans
+                WHERE deleted_at IS NOT NULL AND deleted_at <= datetime('now', ?)
+                ORDER BY deleted_at
+                LIMIT ?
+            ''', (f'-{float(older_than_days)} days', limit))]
+        return self.delete_plans(plan_ids) if plan_ids else 0
+    
+    # Space and statistics
+    @retry_when_locked
+    def incremental_vacuum(self, pages: int = 256) -> int:
+        """Return up to pages free pages to the filesystem; returns how many were released"""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                raise RuntimeError("incremental_vacuum cannot run inside a transaction")
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            # execute() would step the pragma once, releasing a single page
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages)})')
+            return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    
+    @retry_when_locked
+    def analyze(self, analysis_limit: int = 400):
+        """Refresh query planner statistics, sampling about analysis_limit rows per index"""
+        with self.connection() as conn:
+            conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+            # One short write transaction per table
+            for table in ANALYZED_TABLES:
+                conn.execute(f'ANALYZE {table}')
+    
+    def vacuum(self):
+        """Rebuild the file in full, switching an older database to incremental auto-vacuum
         
-        # Delete the plan
-        cursor.execute('DELETE FROM training_plans WHERE id = ?', (plan_id,))
+        Blocks writers for the duration; the app's maintenance thread only
+        ever does incremental steps.
+        """
+        with self.connection() as conn:
+            conn.execute('VACUUM')
+    
+    def storage_stats(self) -> Dict[str, int]:
+        """Size of the database file in pages, and how many of them are free"""
+        with self.connection() as conn:
+            page_size, page_count, freelist_count, auto_vacuum = (
+                conn.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum'))
+        return {
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'bytes': page_size * page_count,
+            'incremental_vacuum': int(auto_vacuum == 2),
+        }
+    
+    # Archive
+    @retry_when_locked
+    def archive_plan(self, plan_id: str) -> bool:
+        """Move a plan's logs out of workout_logs into a memory-mapped columnar file
         
-        conn.commit()
-        rows_deleted = cursor.rowcount
-        conn.close()
+        The plan row and its weekly summaries stay. Reads fall through to
+        the archive; the next write to the plan restores its logs first.
+        """
+        # Queued saves must land before the logs are moved
+        self.flush()
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with self.transaction() as cursor:
+            plan = cursor.execute('SELECT * FROM training_plans WHERE id = ?', (plan_id,)).fetchone()
+            if plan is None or plan['archived_at'] is not None:
+                return False
+            
+            logs = [dict(row) for row in cursor.execute('''
+                SELECT * FROM workout_logs
+                WHERE plan_id = ?
+                ORDER BY week, day
+            ''', (plan_id,))]
+            # Millisecond precision tells a re-archived plan's file apart in the cache
+            archived_at = cursor.execute("SELECT strftime('%Y-%m-%d %H:%M:%f', 'now')").fetchone()[0]
+            
+            # The write lock is held, so no save can slip in between the copy and the delete
+            write_archive(archive_path(self.archive_dir, plan_id), {**dict(plan), 'archived_at': archived_at}, logs)
+            # Deleting the logs drops their notes from the live index
+            self._index_archived_notes(cursor, plan_id, logs)
+            cursor.execute('DELETE FROM workout_logs WHERE plan_id = ?', (plan_id,))
+            cursor.execute('''
+                UPDATE training_plans SET archived_at = ?, revision = revision + 1
+                WHERE id = ?
+            ''', (archived_at, plan_id))
         
-        return rows_deleted > 0
+        return True
+    
+    def archive_finished_plans(self, grace_days: int = 14) -> int:
+        """Archive plans whose race is over and whose logs have been idle for grace_days"""
+        with self.connection() as conn:
+            plan_ids = [row['id'] for row in conn.execute('''
+                SELECT p.id FROM training_plans p
+                WHERE p.archived_at IS NULL AND p.deleted_at IS NULL
+                  AND datetime(p.created_at, '+' || (p.weeks * 7 + ?) || ' days') < datetime('now')
+                  AND NOT EXISTS (
+                      SELECT 1 FROM workout_logs l
+                      WHERE l.plan_id = p.id AND l.updated_at >= datetime('now', ?)
+                  )
+            ''', (grace_days, f'-{int(grace_days)} days'))]
+        
+        return sum(self.archive_plan(plan_id) for plan_id in plan_ids)
+    
+    def open_archive(self, plan_id: str) -> Optional[PlanArchive]:
+        """Memory-mapped archive of a plan's logs, or None if the plan is not archived"""
+        with self.connection() as conn:
+            row = conn.execute('SELECT archived_at FROM training_plans WHERE id = ?', (plan_id,)).fetchone()
+        
+        if row is None or row['archived_at'] is None:
+            return None
+        return self._open_archive(plan_id, row['archived_at'])
+    
+    def _open_archive(self, plan_id: str, archived_at: str) -> PlanArchive:
+        key = (plan_id, archived_at)
+        with self._archive_lock:
+            archive = self._archives.get(key)
+            if archive is not None:
+                self._archives.move_to_end(key)
+                return archive
+        
+        archive = PlanArchive(archive_path(self.archive_dir, plan_id))
+        with self._archive_lock:
+            self._archives[key] = archive
+            # Evicted maps close once no array views of them remain
+            while len(self._archives) > ARCHIVE_CACHE_SIZE:
+                self._archives.popitem(last=False)
+        return archive
+    
+    def _archived_plans(self, session_id: Optional[str] = None, plan_id: Optional[str] = None) -> List[Dict]:
+        query = '''
+            SELECT id, session_id, archived_at FROM training_plans
+            WHERE archived_at IS NOT NULL AND deleted_at IS NULL
+        '''
+        params = []
+        if session_id is not None:
+            query += ' AND session_id = ?'
+            params.append(session_id)
+        if plan_id is not None:
+            query += ' AND id = ?'
+            params.append(plan_id)
+        with self.connection() as conn:
+            return [dict(row) for row in conn.execute(query + ' ORDER BY id', params).fetchall()]
+    
+    def _restore_archived(self, cursor: sqlite3.Cursor, plan_ids: Iterable[str]) -> List[str]:
+        """Move archived logs of these plans back into workout_logs ahead of a write"""
+        archived = cursor.execute('''
+            SELECT id, archived_at FROM training_plans
+            WHERE archived_at IS NOT NULL AND id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(plan_ids)),)).fetchall()
+        
+        for row in archived:
+            archive = self._open_archive(row['id'], row['archived_at'])
+            # The notes triggers re-index restored notes
+            cursor.executemany(RESTORE_LOG_SQL, archive.log_rows())
+            cursor.execute('DELETE FROM archived_notes WHERE plan_id = ?', (row['id'],))
+            cursor.execute('''
+                UPDATE training_plans SET archived_at = NULL, revision = revision + 1
+                WHERE id = ?
+            ''', (row['id'],))
+        return [row['id'] for row in archived]
+    
+    def _index_archived_notes(self, cursor: sqlite3.Cursor, plan_id: str, logs: Iterable[Dict]):
+        """Add the notes of an archived plan's logs to the archived notes index"""
+        cursor.executemany(ARCHIVE_NOTE_SQL, [
+            (plan_id, log['week'], log['day'], log['notes'], log['created_at'])
+            for log in logs if log['notes']
+        ])
+    
+    def _discard_archives(self, plan_ids: Iterable[str]):
+        """Remove archive files once the change that made them obsolete is committed"""
+        for plan_id in plan_ids:
+            with self._archive_lock:
+                for key in [key for key in self._archives if key[0] == plan_id]:
+                    del self._archives[key]
+            try:
+                os.remove(archive_path(self.archive_dir, plan_id))
+            except FileNotFoundError:
+                pass
+    
+    # Workout Templates
+    def get_workout_templates(self) -> List[Dict]:
+        """Get every stored workout template with its decoded schedule"""
+        with self.connection() as conn:
+            cursor = conn.execute('SELECT race_distance, weeks, schedule, revision FROM workout_templates')
+            
+            return [{
+                "race_distance": row['race_distance'],
+                "weeks": row['weeks'],
+                "schedule": json.loads(row['schedule']),
+                "revision": row['revision'],
+            } for row in cursor.fetchall()]
+    
+    def workout_templates_signature(self) -> Tuple[int, int]:
+        """(count, newest revision) of the templates; changes whenever any template does"""
+        with self.connection() as conn:
+            row = conn.execute('SELECT COUNT(*), COALESCE(MAX(revision), 0) FROM workout_templates').fetchone()
+        
+        return row[0], row[1]
+    
+    @retry_when_locked
+    def save_workout_template(self, race_distance: str, weeks: int, schedule: List[List[str]]):
+        """Add or replace the template for a race distance and plan length"""
+        with self.transaction() as cursor:
+            # Revisions only grow, so the signature changes even after a delete
+            cursor.execute('''
+                INSERT INTO workout_templates (race_distance, weeks, schedule, revision)
+                VALUES (?, ?, ?, MAX(?, (SELECT COALESCE(MAX(revision), 0) + 1 FROM workout_templates)))
+                ON CONFLICT (race_distance, weeks) DO UPDATE SET
+                    schedule = excluded.schedule,
+                    revision = excluded.revision,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (race_distance, weeks, json.dumps(schedule), time.time_ns()))
+    
+    @retry_when_locked
+    def delete_workout_template(self, race_distance: str, weeks: int) -> bool:
+        """Delete the template for a race distance and plan length"""
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM workout_templates WHERE race_distance = ? AND weeks = ?',
+                           (race_distance, weeks))
+            return cursor.rowcount > 0
     
     # Workout Logs
-    def save_workout_log(self, plan_id: str, week: int, day: int, 
+    def save_workout_log(self, plan_id: str, week: int, day: int,
                         actual_time: Optional[float] = None,
                         actual_distance: Optional[float] = None,
                         actual_pace: Optional[float] = None,
                         distance_unit: str = 'miles',
                         intensity: Optional[int] = None,
                         notes: str = '') -> str:
-        """Save or update a workout log"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Check if log exists
-        cursor.execute('''
-            SELECT id FROM workout_logs 
-            WHERE plan_id = ? AND week = ? AND day = ?
-        ''', (plan_id, week, day))
+        """Save or update a workout log
         
-        existing = cursor.fetchone()
+        In write-behind mode the log is queued and the returned id is
+        provisional: an update keeps the id already stored for the cell.
+        """
+        log = {
+            'id': str(uuid.uuid4()), 'plan_id': plan_id, 'week': week, 'day': day,
+            'actual_time': actual_time, 'actual_distance': actual_distance,
+            'actual_pace': actual_pace, 'distance_unit': distance_unit,
+            'intensity': intensity, 'notes': notes,
+        }
+        if self.write_queue is not None:
+            self.write_queue.submit(log)
+            return log['id']
+        return self._save_workout_log(log)
+    
+    @retry_when_locked
+    def _save_workout_log(self, log: Dict) -> str:
+        cells = [(log['plan_id'], log['week'], log['day'])]
+        with self.transaction() as cursor:
+            restored = self._restore_archived(cursor, [log['plan_id']])
+            before = self._log_loads(cursor, cells)
+            saved = cursor.execute(UPSERT_WORKOUT_LOG_SQL + RETURNING_LOG_LOAD_SQL,
+                                   workout_log_params(log)).fetchall()[0]
+            
+            # The existing id is kept when the log is updated
+            log_id = saved['id']
+            cursor.execute(REFRESH_WEEK_SUMMARY_SQL, (log['plan_id'], log['week']))
+            cursor.execute(BUMP_REVISION_SQL, (log['plan_id'],))
+            self._apply_training_load(cursor, before, [saved] if saved['session_id'] is not None else [])
         
-        if existing:
-            # Update existing log
-            log_id = existing['id']
-            cursor.execute('''
-                UPDATE workout_logs 
-                SET actual_time = ?, actual_distance = ?, actual_pace = ?,
-                    distance_unit = ?, intensity = ?, notes = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (actual_time, actual_distance, actual_pace, distance_unit, 
-                  intensity, notes, log_id))
-        else:
-            # Create new log
-            log_id = str(uuid.uuid4())
-            cursor.execute('''
-                INSERT INTO workout_logs 
-                (id, plan_id, week, day, actual_time, actual_distance, 
-                 actual_pace, distance_unit, intensity, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (log_id, plan_id, week, day, actual_time, actual_distance,
-                  actual_pace, distance_unit, intensity, notes))
-        
-        conn.commit()
-        conn.close()
+        # An enclosing transaction may still roll back, so the file stays until then
+        if restored and not self.in_transaction():
+            self._discard_archives(restored)
         return log_id
     
+    @retry_when_locked
+    def save_workout_logs(self, logs: List[Dict]) -> int:
+        """Save or update many workout logs in one transaction; later duplicates win"""
+        plan_ids = {log['plan_id'] for log in logs}
+        cells = {(log['plan_id'], log['week'], log['day']) for log in logs}
+        with self.transaction() as cursor:
+            restored = self._restore_archived(cursor, plan_ids)
+            before = self._log_loads(cursor, cells)
+            cursor.executemany(UPSERT_WORKOUT_LOG_SQL, [workout_log_params(log) for log in logs])
+            cursor.executemany(REFRESH_WEEK_SUMMARY_SQL, {(log['plan_id'], log['week']) for log in logs})
+            cursor.executemany(BUMP_REVISION_SQL, [(plan_id,) for plan_id in plan_ids])
+            self._apply_training_load(cursor, before, self._log_loads(cursor, cells))
+        
+        if restored and not self.in_transaction():
+            self._discard_archives(restored)
+        return len(logs)
+    
+    @retry_when_locked
+    def sync_workout_logs(self, logs: List[Dict]) -> List[Dict]:
+        """Apply a batch of edits made on a client, keeping the most recently edited version
+        
+        Each log carries the client's updated_at ('YYYY-MM-DD HH:MM:SS.fff'
+        UTC) and is applied only if newer than the stored log. Returns one
+        result per log; applied is False for edits that lost or whose plan
+        no longer exists, and for invalid logs, which also get an error.
+        """
+        if not logs:
+            return []
+        # Checked like imported records, so one bad log cannot fail the batch
+        checked: List[Union[Dict, str]] = []
+        for log in logs:
+            try:
+                checked.append(checked_sync_log(log))
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                checked.append(str(e))
+        valid = [log for log in checked if isinstance(log, dict)]
+        
+        # Queued saves must be in place to be compared against
+        self.flush()
+        plan_ids = {log['plan_id'] for log in valid}
+        cells = {(log['plan_id'], log['week'], log['day']) for log in valid}
+        results = []
+        with self.transaction() as cursor:
+            weeks = {row['id']: row['weeks'] for row in cursor.execute(
+                'SELECT id, weeks FROM training_plans WHERE id IN (SELECT value FROM json_each(?)) AND deleted_at IS NULL',
+                (json.dumps(list(plan_ids)),))}
+            restored = self._restore_archived(cursor, weeks)
+            before = self._log_loads(cursor, cells)
+            
+            for sent, log in zip(logs, checked):
+                if not isinstance(log, dict):
+                    results.append(sync_result(sent, error=log))
+                    continue
+                if log['plan_id'] in weeks and log['week'] > weeks[log['plan_id']]:
+                    results.append(sync_result(sent, error=f"week {log['week']} is past the end of the plan"))
+                    continue
+                applied = False
+                if log['plan_id'] in weeks:
+                    # A log created offline counts from when it was edited
+                    params = workout_log_params({**log, 'created_at': log['created_at'] or log['updated_at']})
+                    applied = cursor.execute(SYNC_WORKOUT_LOG_SQL, (*params, log['updated_at'])).fetchone() is not None
+                results.append(sync_result(sent, applied))
+            
+            changed = [log for log, result in zip(checked, results) if result['applied']]
+            cursor.executemany(REFRESH_WEEK_SUMMARY_SQL, {(log['plan_id'], log['week']) for log in changed})
+            cursor.executemany(BUMP_REVISION_SQL, {(log['plan_id'],) for log in changed})
+            self._apply_training_load(cursor, before, self._log_loads(cursor, cells))
+        
+        if restored and not self.in_transaction():
+            self._discard_archives(restored)
+        return results
+    
+    def import_workout_logs(self, records: Iterable[Dict], chunk_size: int = 5000,
+                            progress: Optional[Callable[[int], None]] = None) -> int:
+        """Upsert normalized workout logs in chunked transactions, creating plans as needed
+        
+        Records are consumed lazily, so memory use is bounded by chunk_size.
+        See importer.normalize_record for the expected keys.
+        """
+        records = iter(records)
+        total = 0
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                break
+            
+            self._import_chunk(chunk)
+            total += len(chunk)
+            if progress:
+                progress(total)
+        
+        return total
+    
+    @retry_when_locked
+    def _import_chunk(self, chunk: List[Dict]):
+        """Write one chunk of normalized records in a single transaction"""
+        plans = {}
+        for record in chunk:
+            plan = plans.get(record['plan_id'])
+            if plan is None or plan[3] < record['weeks']:
+                plans[record['plan_id']] = (record['plan_id'], record['session_id'],
+                                            record['plan_name'], record['weeks'],
+                                            record['race_distance'])
+        
+        with self.transaction() as cursor:
+            restored = self._restore_archived(cursor, plans)
+            cursor.executemany(UPSERT_PLAN_SQL, plans.values())
+            cursor.executemany(UPSERT_WORKOUT_LOG_SQL, [workout_log_params(r) for r in chunk])
+            cursor.executemany(REFRESH_WEEK_SUMMARY_SQL,
+                               {(r['plan_id'], r['week']) for r in chunk})
+            # Imported history is mostly backdated, so rebuild each session once on next use
+            cursor.executemany('INSERT OR IGNORE INTO training_load_stale VALUES (?)',
+                               {(plan[1],) for plan in plans.values()})
+        
+        if restored and not self.in_transaction():
+            self._discard_archives(restored)
+    
+    # GPS Tracks
+    @retry_when_locked
+    def attach_track(self, plan_id: str, week: int, day: int, source: Union[str, BinaryIO],
+                     distance_unit: str = 'miles') -> Dict:
+        """Store a GPX/TCX track for a workout and fill in the log's time, distance and pace
+        
+        The log is created if needed and keeps its intensity and notes.
+        Time and pace use moving time. Returns the track summary.
+        """
+        track = parse_track(source)
+        meters_per_unit = METERS_PER_UNIT.get(distance_unit, METERS_PER_UNIT['miles'])
+        summary = {'plan_id': plan_id, 'week': week, 'day': day, 'format': track['format'],
+                   **summarize_track(track, meters_per_unit)}
+        samples = pack_track(track)
+        
+        distance = round(summary['distance_m'] / meters_per_unit, 2)
+        minutes = round(summary['moving_s'] / 60.0, 2)
+        
+        # A queued save of this cell must not land after the track's totals
+        self.flush()
+        with self.transaction() as cursor:
+            restored = self._restore_archived(cursor, [plan_id])
+            existing = cursor.execute('''
+                SELECT intensity, notes FROM workout_logs
+                WHERE plan_id = ? AND week = ? AND day = ?
+            ''', (plan_id, week, day)).fetchone()
+            before = self._log_loads(cursor, [(plan_id, week, day)])
+            cursor.execute(UPSERT_WORKOUT_LOG_SQL, workout_log_params({
+                'plan_id': plan_id, 'week': week, 'day': day,
+                'actual_time': minutes, 'actual_distance': distance,
+                'actual_pace': round(minutes / distance, 2) if distance else None,
+                'distance_unit': distance_unit,
+                'intensity': existing['intensity'] if existing else None,
+                'notes': existing['notes'] if existing else '',
+            }))
+            cursor.execute(UPSERT_TRACK_SQL, (
+                plan_id, week, day, summary['format'], summary['points'], summary['started_at'],
+                summary['distance_m'], summary['elapsed_s'], summary['moving_s'],
+                summary['elevation_gain_m'], summary['split_m'], json.dumps(summary['splits']),
+                samples,
+            ))
+            cursor.execute(REFRESH_WEEK_SUMMARY_SQL, (plan_id, week))
+            cursor.execute(BUMP_REVISION_SQL, (plan_id,))
+            self._apply_training_load(cursor, before, self._log_loads(cursor, [(plan_id, week, day)]))
+        
+        if restored and not self.in_transaction():
+            self._discard_archives(restored)
+        return summary
+    
+    def get_track_cells(self, plan_id: str) -> List[Tuple[int, int]]:
+        """Get list of (week, day) tuples that have a GPS track"""
+        with self.connection() as conn:
+            cursor = conn.execute('SELECT week, day FROM workout_tracks WHERE plan_id = ?', (plan_id,))
+            return [(row['week'], row['day']) for row in cursor.fetchall()]
+    
+    def get_track(self, plan_id: str, week: int, day: int, samples: bool = False) -> Optional[Dict]:
+        """Get a workout's track summary, with its decoded samples if asked"""
+        columns = TRACK_SUMMARY_COLUMNS + (', samples' if samples else '')
+        with self.connection() as conn:
+            row = conn.execute(f'''
+                SELECT {columns} FROM workout_tracks
+                WHERE plan_id = ? AND week = ? AND day = ?
+            ''', (plan_id, week, day)).fetchone()
+        
+        if row is None:
+            return None
+        track = dict(row)
+        track['splits'] = json.loads(track['splits'])
+        if samples:
+            track['samples'] = unpack_track(track['samples'])
+        return track
+    
+    # Training Load
+    def get_training_load(self, session_id: str) -> List[Dict]:
+        """Days with load for a session, oldest first, with acute and chronic load after each"""
+        with self.connection() as conn:
+            stale = conn.execute('SELECT 1 FROM training_load_stale WHERE session_id = ?',
+                                 (session_id,)).fetchone()
+        if stale:
+            self.rebuild_training_load(session_id)
+        
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT day, load, acute, chronic FROM training_load
+                WHERE session_id = ?
+                ORDER BY day
+            ''', (session_id,))
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @retry_when_locked
+    def rebuild_training_load(self, session_id: Optional[str] = None) -> int:
+        """Recompute training load from the logs of one session, or of every session"""
+        with self.transaction() as cursor:
+            if session_id is None:
+                sessions = [row[0] for row in cursor.execute('SELECT DISTINCT session_id FROM training_plans')]
+                cursor.execute('DELETE FROM training_load')
+                cursor.execute('DELETE FROM training_load_stale')
+            else:
+                sessions = [session_id]
+            return sum(self._rebuild_training_load(cursor, session) for session in sessions)
+    
+    def _rebuild_training_load(self, cursor: sqlite3.Cursor, session_id: str) -> int:
+        loads = {row['load_day']: row['load'] for row in cursor.execute(SESSION_DAILY_LOAD_SQL, (session_id,))}
+        
+        # Archived plans still count towards the runner's history
+        for plan in cursor.execute('''
+            SELECT id, archived_at FROM training_plans
+            WHERE session_id = ? AND archived_at IS NOT NULL AND deleted_at IS NULL
+        ''', (session_id,)).fetchall():
+            archive = self._open_archive(plan['id'], plan['archived_at'])
+            load = archive.column('duration_s') / 60.0 * archive.column('intensity')
+            valid = ~np.isnan(load)
+            days, index = np.unique(days_since_epoch(archive.strings('created_at'))[valid], return_inverse=True)
+            for day, total in zip(days.tolist(), np.bincount(index, load[valid]).tolist()):
+                loads[day] = loads.get(day, 0.0) + total
+        
+        cursor.execute('DELETE FROM training_load WHERE session_id = ?', (session_id,))
+        cursor.execute('DELETE FROM training_load_stale WHERE session_id = ?', (session_id,))
+        return self._write_training_load(cursor, session_id, loads, None)
+    
+    def _write_training_load(self, cursor: sqlite3.Cursor, session_id: str, loads: Dict[int, float],
+                             previous: Optional[sqlite3.Row]) -> int:
+        """Store loads by day and their moving averages, continuing from the previous row"""
+        loads = {day: load for day, load in loads.items() if load}
+        if not loads:
+            return 0
+        
+        days = np.array(sorted(loads), dtype=np.int64)
+        offsets = days - days[0]
+        daily = np.zeros(int(offsets[-1]) + 1)
+        daily[offsets] = [loads[day] for day in days.tolist()]
+        
+        acute = chronic = 0.0
+        if previous is not None:
+            # Decay the previous averages over the days without load in between
+            gap = int(days[0]) - 1 - previous['day']
+            acute = previous['acute'] * (1 - ACUTE_ALPHA) ** gap
+            chronic = previous['chronic'] * (1 - CHRONIC_ALPHA) ** gap
+        
+        cursor.executemany(UPSERT_TRAINING_LOAD_SQL, zip(
+            itertools.repeat(session_id), days.tolist(), daily[offsets].tolist(),
+            ewma(daily, ACUTE_ALPHA, acute)[offsets].tolist(),
+            ewma(daily, CHRONIC_ALPHA, chronic)[offsets].tolist(),
+        ))
+        return len(days)
+    
+    def _log_loads(self, cursor: sqlite3.Cursor, cells: Iterable[Tuple[str, int, int]]) -> List[sqlite3.Row]:
+        """Session, day and load of the logs currently in these (plan, week, day) cells"""
+        cells = list(cells)
+        if len(cells) == 1:
+            return cursor.execute(LOG_LOAD_SQL, cells[0]).fetchall()
+        return cursor.execute(LOG_LOADS_SQL, (json.dumps(cells),)).fetchall()
+    
+    def _apply_training_load(self, cursor: sqlite3.Cursor, before: List[sqlite3.Row], after: List[sqlite3.Row]):
+        """Update training load for logs that changed from before to after
+        
+        Changes on a session's latest day or later move the averages
+        forward in O(1) per day; an earlier change recomputes from its day.
+        """
+        changes: Dict[str, Dict[int, float]] = {}
+        for rows, sign in ((before, -1.0), (after, 1.0)):
+            for row in rows:
+                days = changes.setdefault(row['session_id'], {})
+                days[row['load_day']] = days.get(row['load_day'], 0.0) + sign * row['load']
+        
+        for session_id, days in changes.items():
+            days = {day: delta for day, delta in days.items() if delta}
+            if not days:
+                continue
+            last = cursor.execute(LATEST_TRAINING_LOAD_SQL, (session_id, session_id)).fetchone()
+            if last['stale']:
+                continue
+            if last['day'] is None:
+                last = None
+            
+            if last is not None and min(days) < last['day']:
+                start = min(days)
+                previous = cursor.execute('''
+                    SELECT day, acute, chronic FROM training_load
+                    WHERE session_id = ? AND day < ?
+                    ORDER BY day DESC LIMIT 1
+                ''', (session_id, start)).fetchone()
+                loads = {row['day']: row['load'] for row in cursor.execute(
+                    'SELECT day, load FROM training_load WHERE session_id = ? AND day >= ?', (session_id, start))}
+                for day, delta in days.items():
+                    loads[day] = loads.get(day, 0.0) + delta
+                cursor.execute('DELETE FROM training_load WHERE session_id = ? AND day >= ?', (session_id, start))
+                self._write_training_load(cursor, session_id, loads, previous)
+                continue
+            
+            for day in sorted(days):
+                delta = days[day]
+                if last is not None and last['day'] == day:
+                    load = last['load'] + delta
+                    acute = last['acute'] + ACUTE_ALPHA * delta
+                    chronic = last['chronic'] + CHRONIC_ALPHA * delta
+                else:
+                    gap = day - last['day'] if last is not None else 0
+                    load = delta
+                    acute = (last['acute'] * (1 - ACUTE_ALPHA) ** gap if last is not None else 0.0) + ACUTE_ALPHA * delta
+                    chronic = (last['chronic'] * (1 - CHRONIC_ALPHA) ** gap if last is not None else 0.0) + CHRONIC_ALPHA * delta
+                cursor.execute(UPSERT_TRAINING_LOAD_SQL, (session_id, day, load, acute, chronic))
+                last = {'day': day, 'load': load, 'acute': acute, 'chronic': chronic}
+    
+    # Weekly Summaries
+    def get_weekly_summaries(self, plan_id: str) -> List[Dict]:
+        """Get precomputed per-week totals for a plan (distance in miles, time in minutes)"""
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM weekly_summaries
+                WHERE plan_id = ?
+                ORDER BY week
+            ''', (plan_id,))
+            
+            summaries = []
+            for row in cursor.fetchall():
+                summaries.append({
+                    "week": row['week'],
+                    "workouts": row['workouts'],
+                    "total_miles": row['total_miles'],
+                    "total_minutes": row['total_minutes'],
+                    "avg_pace": row['paced_minutes'] / row['paced_miles'] if row['paced_miles'] else None,
+                    "avg_intensity": row['intensity_total'] / row['intensity_count'] if row['intensity_count'] else None,
+                })
+            return summaries
+    
+    @retry_when_locked
+    def rebuild_weekly_summaries(self, plan_id: Optional[str] = None) -> int:
+        """Recompute weekly summaries from the logs of one plan, or of every plan
+        
+        Archived plans keep their summaries, since their logs are no longer
+        in workout_logs to recompute from.
+        """
+        with self.transaction() as cursor:
+            if plan_id is None:
+                cursor.execute('''
+                    DELETE FROM weekly_summaries WHERE plan_id NOT IN (
+                        SELECT id FROM training_plans WHERE archived_at IS NOT NULL
+                    )
+                ''')
+                cursor.execute('INSERT INTO weekly_summaries' + WEEK_SUMMARY_SELECT_SQL.format(where=''))
+            else:
+                archived = cursor.execute(
+                    'SELECT 1 FROM training_plans WHERE id = ? AND archived_at IS NOT NULL', (plan_id,)
+                ).fetchone()
+                if archived:
+                    return 0
+                cursor.execute('DELETE FROM weekly_summaries WHERE plan_id = ?', (plan_id,))
+                cursor.execute('INSERT INTO weekly_summaries' +
+                               WEEK_SUMMARY_SELECT_SQL.format(where='WHERE plan_id = ?'), (plan_id,))
+            return cursor.rowcount
+    
     def get_workout_log(self, plan_id: str, week: int, day: int) -> Optional[Dict]:
         """Get a specific workout log"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM workout_logs 
-            WHERE plan_id = ? AND week = ? AND day = ?
-        ''', (plan_id, week, day))
+        if self.write_queue is not None:
+            pending = self.write_queue.pending_log(plan_id, week, day)
+            if pending is not None:
+                return pending
         
-        row = cursor.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT * FROM workout_logs
+                WHERE plan_id = ? AND week = ? AND day = ?
+            ''', (plan_id, week, day)).fetchone()
         
-        return dict(row) if row else None
+        if row is None:
+            archive = self.open_archive(plan_id)
+            return archive.log(week, day) if archive is not None else None
+        return dict(row)
     
     def get_all_logs_for_plan(self, plan_id: str) -> List[Dict]:
         """Get all workout logs for a plan"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM workout_logs
+                WHERE plan_id = ?
+                ORDER BY week, day
+            ''', (plan_id,))
+            
+            logs = [dict(row) for row in cursor.fetchall()]
         
-        cursor.execute('''
-            SELECT * FROM workout_logs 
-            WHERE plan_id = ?
-            ORDER BY week, day
-        ''', (plan_id,))
+        # Only a plan without hot logs can be archived
+        if not logs:
+            archive = self.open_archive(plan_id)
+            if archive is not None:
+                logs = archive.logs()
         
-        logs = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        if self.write_queue is not None:
+            pending = self.write_queue.pending_logs(plan_id)
+            if pending:
+                merged = {(log['week'], log['day']): log for log in logs}
+                merged.update(((log['week'], log['day']), log) for log in pending)
+                logs = [merged[key] for key in sorted(merged)]
         return logs
     
+    def export_logs(self, session_id: Optional[str] = None, plan_id: Optional[str] = None,
+                    chunk_size: int = 500) -> Iterator[Dict]:
+        """Stream workout logs for a plan, a session, or the whole database; deleted plans are left out"""
+        query = '''
+            SELECT p.session_id, l.* FROM workout_logs l
+            JOIN training_plans p ON p.id = l.plan_id
+            WHERE p.deleted_at IS NULL
+        '''
+        params = []
+        if session_id is not None:
+            query += ' AND p.session_id = ?'
+            params.append(session_id)
+        if plan_id is not None:
+            query += ' AND l.plan_id = ?'
+            params.append(plan_id)
+        query += ' ORDER BY l.plan_id, l.week, l.day'
+        
+        return itertools.chain(self.stream(query, tuple(params), chunk_size),
+                               self._iter_archived_logs(session_id, plan_id))
+    
+    def _iter_archived_logs(self, session_id: Optional[str], plan_id: Optional[str]) -> Iterator[Dict]:
+        """Logs of archived plans, shaped like export_logs rows"""
+        for plan in self._archived_plans(session_id, plan_id):
+            for log in self._open_archive(plan['id'], plan['archived_at']).logs():
+                yield {'session_id': plan['session_id'], **log}
+    
+    def iter_log_values(self, plan_id: Optional[str] = None, session_id: Optional[str] = None,
+                        chunk_size: int = 5000) -> Iterator[List[tuple]]:
+        """Yield chunks of (plan_id, week, day, distance_m, duration_s, pace_s_per_km, intensity)
+        
+        Plain tuples in canonical units, meant for building column arrays.
+        """
+        query = '''
+            SELECT l.plan_id, l.week, l.day, l.distance_m, l.duration_s,
+                   l.pace_s_per_km, l.intensity
+            FROM workout_logs l
+        '''
+        if plan_id is not None:
+            query += ' WHERE l.plan_id = ? ORDER BY l.week, l.day'
+            params = (plan_id,)
+        elif session_id is not None:
+            query += '''
+                JOIN training_plans p ON p.id = l.plan_id
+                WHERE p.session_id = ? AND p.deleted_at IS NULL
+                ORDER BY l.plan_id, l.week, l.day
+            '''
+            params = (session_id,)
+        else:
+            raise ValueError("plan_id or session_id is required")
+        
+        conn = self.pool.acquire()
+        cursor = None
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            if cursor is not None:
+                cursor.close()
+            self.pool.release(conn)
+        
+        values = operator.itemgetter(*(LOG_FIELDS.index(name) for name in (
+            'plan_id', 'week', 'day', 'distance_m', 'duration_s', 'pace_s_per_km', 'intensity')))
+        for plan in self._archived_plans(session_id if plan_id is None else None, plan_id):
+            rows = [values(row) for row in self._open_archive(plan['id'], plan['archived_at']).log_rows()]
+            for start in range(0, len(rows), chunk_size):
+                yield rows[start:start + chunk_size]
+    
+    def search_notes(self, session_id: str, query: str, limit: int = 20) -> List[Dict]:
+        """Find a session's workouts by their notes, best matches first, with highlighted snippets
+        
+        Matched terms in the snippet are wrapped in SNIPPET_MARK_START and SNIPPET_MARK_END.
+        """
+        match = notes_match_query(session_id, query)
+        if match is None:
+            return []
+        marks = (SNIPPET_MARK_START, SNIPPET_MARK_END)
+        with self.connection() as conn:
+            # Live logs and archived plans' notes, ranked together
+            cursor = conn.execute('''
+                SELECT l.plan_id, p.name AS plan_name, l.week, l.day, l.created_at,
+                       snippet(workout_notes_fts, 0, ?, ?, '…', 12) AS snippet,
+                       bm25(workout_notes_fts, 1.0, 0.0) AS rank
+                FROM workout_notes_fts
+                JOIN workout_logs l ON l.rowid = workout_notes_fts.rowid
+                JOIN training_plans p ON p.id = l.plan_id
+                WHERE workout_notes_fts MATCH ? AND p.session_id = ? AND p.deleted_at IS NULL
+                UNION ALL
+                SELECT a.plan_id, p.name AS plan_name, a.week, a.day, a.created_at,
+                       snippet(archived_notes_fts, 0, ?, ?, '…', 12) AS snippet,
+                       bm25(archived_notes_fts, 1.0, 0.0) AS rank
+                FROM archived_notes_fts
+                JOIN archived_notes a ON a.id = archived_notes_fts.rowid
+                JOIN training_plans p ON p.id = a.plan_id
+                WHERE archived_notes_fts MATCH ? AND p.session_id = ? AND p.deleted_at IS NULL
+                ORDER BY rank
+                LIMIT ?
+            ''', (*marks, match, session_id, *marks, match, session_id, limit))
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
     def get_completed_cells(self, plan_id: str) -> List[Tuple[int, int]]:
         """Get list of (week, day) tuples that have completed logs"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                SELECT week, day FROM workout_logs
+                WHERE plan_id = ?
+            ''', (plan_id,))
+            
+            cells = [(row['week'], row['day']) for row in cursor.fetchall()]
         
-        cursor.execute('''
-            SELECT week, day FROM workout_logs 
-            WHERE plan_id = ?
-        ''', (plan_id,))
+        if not cells:
+            archive = self.open_archive(plan_id)
+            if archive is not None:
+                cells = archive.cells()
         
-        cells = [(row['week'], row['day']) for row in cursor.fetchall()]
-        conn.close()
+        if self.write_queue is not None:
+            cells = list(set(cells).union(self.write_queue.pending_cells(plan_id)))
         return cells
+
+class MemoryDatabase(Database):
+    """Database in a private in-memory SQLite database, for tests and benchmarks
+    
+    Pooled connections share one database through SQLite's shared cache.
+    It lives until close(); archives go to a scratch directory removed then.
+    """
+    
+    def __init__(self, **options):
+        db_path = f"file:krunner-{uuid.uuid4()}?mode=memory&cache=shared"
+        # A shared-cache memory database is dropped when its last connection closes
+        self._keepalive = sqlite3.connect(db_path, uri=True, check_same_thread=False)
+        self._scratch_dir = None
+        if options.get('archive_dir') is None:
+            self._scratch_dir = options['archive_dir'] = tempfile.mkdtemp(prefix="krunner-archive-")
+        super().__init__(db_path, **options)
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = super()._connect()
+        # Let readers see past another connection's table write lock
+        conn.execute('PRAGMA read_uncommitted = 1')
+        return conn
+    
+    def close(self):
+        """Flush queued writes and drop the database"""
+        super().close()
+        self._keepalive.close()
+        if self._scratch_dir is not None:
+            shutil.rmtree(self._scratch_dir, ignore_errors=True)
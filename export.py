@@ -0,0 +1,110 @@
+"""Streaming CSV / JSON-lines export of plans and workout logs.
+
+Served over HTTP by register_export_routes, or from the command line:
+    python export.py logs --format csv [--session SESSION_ID] > logs.csv
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import sys
+from typing import Dict, Iterable, Iterator
+
+from flask import Response, abort, request, stream_with_context
+
+import config
+from storage import StorageBackend, open_storage
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+def encode_csv(rows: Iterable[Dict], batch_size: int = 500) -> Iterator[str]:
+    """Encode rows as CSV text, yielding one string per batch of rows"""
+    buffer = io.StringIO()
+    writer = None
+    pending = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def encode_jsonl(rows: Iterable[Dict], batch_size: int = 500) -> Iterator[str]:
+    """Encode rows as JSON lines, yielding one string per batch of rows"""
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row, default=str))
+        if len(batch) >= batch_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+ENCODERS = {
+    "csv": encode_csv,
+    "jsonl": encode_jsonl,
+}
+
+def export_rows(db: StorageBackend, kind: str, session_id=None, plan_id=None) -> Iterator[Dict]:
+    """Pick the streaming query for an export kind"""
+    if kind == "plans":
+        return db.export_plans(session_id)
+    if kind == "logs":
+        return db.export_logs(session_id, plan_id)
+    raise ValueError(f"Unknown export kind: {kind}")
+
+def register_export_routes(server, db: StorageBackend):
+    """Register the streaming export routes on the Flask server"""
+    
+    @server.route("/export/<kind>.<fmt>")
+    def export(kind, fmt):
+        if kind not in ("plans", "logs") or fmt not in FORMATS:
+            abort(404)
+        
+        # Only one runner's data is served over HTTP; use the CLI for full dumps
+        session_id = request.args.get("session_id")
+        plan_id = request.args.get("plan_id")
+        if not session_id and (kind == "plans" or not plan_id):
+            abort(400, "session_id is required")
+        
+        # Take the export's connection now, so a busy server answers 503
+        # instead of cutting off a response that has already started
+        rows = export_rows(db, kind, session_id, plan_id)
+        try:
+            first = next(rows, None)
+        except TimeoutError:
+            abort(503, "Too many exports in progress; try again shortly")
+        rows = itertools.chain([first], rows) if first is not None else iter(())
+        return Response(
+            stream_with_context(ENCODERS[fmt](rows)),
+            mimetype=FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename=krunner-{kind}.{fmt}"}
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Krunner plans or workout logs")
+    parser.add_argument("kind", choices=["plans", "logs"])
+    parser.add_argument("--db", default="krunner.db", help="database file (default: krunner.db)")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--session", help="only export this session")
+    parser.add_argument("--plan", help="only export this plan (logs only)")
+    args = parser.parse_args(argv)
+    
+    db = open_storage(config.STORAGE, args.db, config.DB_SHARDS)
+    rows = export_rows(db, args.kind, args.session, args.plan)
+    for chunk in ENCODERS[args.format](rows):
+        sys.stdout.write(chunk)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Production launcher settings: gunicorn -c gunicorn.conf.py app:server
+
+Every worker process imports app.py and opens its own connection pool.
+SQLite serializes writers across processes; Database waits on
+busy_timeout and retries with backoff, so workers can share one file.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("KRUNNER_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("KRUNNER_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("KRUNNER_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("KRUNNER_TIMEOUT", 60))
+
+# Load the app in each worker so no SQLite connection is opened before fork
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
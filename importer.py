@@ -0,0 +1,200 @@
+"""Bulk import of workout history from CSV or JSON-lines files.
+
+Usage:
+    python importer.py history.csv [--db krunner.db] [--format csv|jsonl]
+
+Each row describes one workout log. Required columns are session_id,
+week and day, plus either plan_id or plan_name. Optional columns are
+weeks, race_distance, actual_time, actual_distance, actual_pace,
+distance_unit, intensity, notes and created_at (an ISO 8601 date or time;
+ones with a UTC offset are stored in UTC).
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Union
+
+import config
+from storage import StorageBackend, open_storage
+
+# Stable namespace so re-importing a file maps rows onto the same plans
+PLAN_NAMESPACE = uuid.UUID("6f1c2a7e-4d0b-5b8e-9a51-2f4c8e9d7b30")
+
+DISTANCE_UNITS = {
+    "mi": "miles", "mile": "miles", "miles": "miles",
+    "km": "km", "kms": "km", "kilometer": "km", "kilometers": "km",
+    "kilometre": "km", "kilometres": "km",
+}
+
+def iter_records(path: str, fmt: Optional[str] = None) -> Iterator[Union[Dict, ValueError]]:
+    """Stream raw records from a CSV or JSON-lines file one at a time
+    
+    A row or line that cannot be parsed is yielded as a ValueError in its
+    place, so one corrupt line doesn't end the stream.
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            while True:
+                try:
+                    record = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    record = ValueError(f"unreadable row: {e}")
+                yield record
+        elif fmt == "jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    record = ValueError(f"invalid JSON: {e}")
+                else:
+                    if not isinstance(record, dict):
+                        record = ValueError(f"not a JSON object: {line.strip()[:40]}")
+                yield record
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+
+def _optional_float(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    number = float(value)
+    if number < 0:
+        raise ValueError(f"negative value: {value}")
+    return number
+
+def parse_timestamp(value, milliseconds: bool = False) -> Optional[str]:
+    """ISO 8601 date or time as 'YYYY-MM-DD HH:MM:SS[.fff]' in UTC, or None if empty"""
+    if value is None or value == "":
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"invalid timestamp: {value}") from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if milliseconds:
+        return moment.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+def normalize_log(record: Dict) -> Dict:
+    """Validate a raw record's workout fields: week, day, numbers, unit, intensity, notes and created_at"""
+    week = int(record["week"])
+    day = int(record["day"])
+    if week < 1 or not 1 <= day <= 3:
+        raise ValueError(f"invalid week/day: {week}/{day}")
+    
+    unit = str(record.get("distance_unit") or "miles").strip().lower()
+    if unit not in DISTANCE_UNITS:
+        raise ValueError(f"unknown distance unit: {unit}")
+    
+    intensity = record.get("intensity")
+    intensity = int(intensity) if intensity not in (None, "") else None
+    if intensity is not None and not 1 <= intensity <= 5:
+        raise ValueError(f"intensity out of range: {intensity}")
+    
+    return {
+        "week": week,
+        "day": day,
+        "actual_time": _optional_float(record.get("actual_time")),
+        "actual_distance": _optional_float(record.get("actual_distance")),
+        "actual_pace": _optional_float(record.get("actual_pace")),
+        "distance_unit": DISTANCE_UNITS[unit],
+        "intensity": intensity,
+        "notes": str(record.get("notes") or ""),
+        "created_at": parse_timestamp(record.get("created_at")),
+    }
+
+def normalize_record(record: Dict) -> Dict:
+    """Validate a raw record and convert it to the shape import_workout_logs expects"""
+    session_id = str(record.get("session_id") or "").strip()
+    if not session_id:
+        raise ValueError("missing session_id")
+    
+    plan_name = str(record.get("plan_name") or "").strip()
+    plan_id = str(record.get("plan_id") or "").strip()
+    if not plan_id:
+        if not plan_name:
+            raise ValueError("missing plan_id or plan_name")
+        plan_id = str(uuid.uuid5(PLAN_NAMESPACE, f"{session_id}/{plan_name}"))
+    
+    log = normalize_log(record)
+    weeks = record.get("weeks")
+    return {
+        "session_id": session_id,
+        "plan_id": plan_id,
+        "plan_name": plan_name or "Imported plan",
+        "weeks": max(int(weeks), log["week"]) if weeks not in (None, "") else log["week"],
+        "race_distance": str(record.get("race_distance") or "Unknown").strip(),
+        **log,
+    }
+
+class ImportStats:
+    """Running counters for an import, reported as rows per second"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imported = 0
+        self.skipped = 0
+    
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+    
+    @property
+    def rows_per_sec(self) -> float:
+        return self.imported / self.elapsed if self.elapsed > 0 else 0.0
+    
+    def __str__(self):
+        return (f"{self.imported:,} rows imported, {self.skipped:,} skipped "
+                f"in {self.elapsed:.1f}s ({self.rows_per_sec:,.0f} rows/s)")
+
+def import_file(db: StorageBackend, path: str, fmt: Optional[str] = None,
+                chunk_size: int = 5000, verbose: bool = True) -> ImportStats:
+    """Stream a history file into the database and return the import statistics"""
+    stats = ImportStats()
+    last_report = [0.0]
+    
+    def valid_records():
+        for line_no, record in enumerate(iter_records(path, fmt), start=1):
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                yield normalize_record(record)
+            except (KeyError, TypeError, ValueError) as e:
+                stats.skipped += 1
+                if verbose and stats.skipped <= 10:
+                    print(f"  skipping record {line_no}: {e}", file=sys.stderr)
+    
+    def report(total):
+        stats.imported = total
+        if verbose and stats.elapsed - last_report[0] >= 1.0:
+            last_report[0] = stats.elapsed
+            print(f"  {stats}", file=sys.stderr)
+    
+    stats.imported = db.import_workout_logs(valid_records(), chunk_size=chunk_size, progress=report)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import workout history into Krunner")
+    parser.add_argument("path", help="CSV or JSON-lines file to import")
+    parser.add_argument("--db", default="krunner.db", help="database file (default: krunner.db)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default: from extension)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per transaction")
+    args = parser.parse_args(argv)
+    
+    db = open_storage(config.STORAGE, args.db, config.DB_SHARDS)
+    print(f"📥 Importing {args.path} into {args.db}...")
+    stats = import_file(db, args.path, args.format, args.chunk_size)
+    print(f"✅ {stats}")
+
+if __name__ == "__main__":
+    main()
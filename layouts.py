@@ -1,5 +1,15 @@
+from typing import Iterable, List, Optional, Tuple
 from dash import html, dcc
 import dash_bootstrap_components as dbc
+from database import METERS_PER_UNIT, SNIPPET_MARK_END, SNIPPET_MARK_START
+from templates import FALLBACK_WEEK
+from training_load import ACUTE_DAYS, CHRONIC_DAYS
+
+# Largest GPS file accepted by the workout modal
+GPS_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+
+# Days of history shown in the training load chart
+TRAINING_LOAD_CHART_DAYS = 120
 
 def get_header():
     """App header with branding"""
@@ -39,7 +49,8 @@ def get_plan_selector():
                 dbc.Label("Active Training Plan", className="selector-label"),
                 dcc.Dropdown(
                     id="plan-selector",
-                    placeholder="Select a training plan...",
+                    placeholder="Select or search training plans...",
+                    search_order="original",
                     className="plan-dropdown"
                 )
             ], md=10),
@@ -51,26 +62,56 @@ def get_plan_selector():
         ])
     ], className="plan-selector mb-4")
 
+def get_notes_search():
+    """Full-text search over the session's workout notes"""
+    return html.Div([
+        dbc.Label("Search Workout Notes", className="selector-label"),
+        dbc.Input(id="notes-search-input", type="search", debounce=True,
+                  placeholder="e.g., knee pain"),
+        html.Div(id="notes-search-results", className="notes-results")
+    ], className="plan-selector mb-4")
+
+def _highlight(snippet: str):
+    """Split a search snippet into text and html.Mark children"""
+    children = []
+    for i, part in enumerate(snippet.replace(SNIPPET_MARK_END, SNIPPET_MARK_START).split(SNIPPET_MARK_START)):
+        if part:
+            children.append(html.Mark(part) if i % 2 else part)
+    return children
+
+def create_notes_results(results: list):
+    """Ranked note matches with highlighted snippets"""
+    if not results:
+        return html.Div("No matching notes", className="text-muted p-3")
+    
+    return html.Ul([
+        html.Li([
+            html.Div(f"{result['plan_name']} · Week {result['week']}, Day {result['day']}",
+                     className="notes-result-title"),
+            html.Div(_highlight(result["snippet"]), className="notes-result-snippet")
+        ], className="notes-result")
+        for result in results
+    ], className="list-unstyled mt-3 mb-0")
+
 def get_training_grid():
-    """Training plan grid display"""
+    """Training plan grid display with weekly summary alongside"""
     return html.Div([
-        html.Div(id="training-grid-container")
+        dbc.Row([
+            dbc.Col(html.Div(id="training-grid-container"), lg=8),
+            dbc.Col([
+                html.Div(id="weekly-summary-container"),
+                html.Div(id="training-load-container", className="mt-4")
+            ], lg=4),
+        ])
     ], className="grid-section")
 
-def create_grid_table(weeks: int, plan_id: str, completed_cells: list):
+def create_grid_table(weeks: int, plan_id: str, completed_cells: Iterable[Tuple[int, int]],
+                      schedule: Optional[List[Tuple[str, str, str]]] = None):
     """Generate the training grid table"""
     days = ["Day 1: Recovery", "Day 2: Speed", "Day 3: Endurance"]
-    
-    # Sample workout templates
-    workout_templates = {
-        1: ["20 min ez", "10 min ez, 10 min (8:30-9 pace), 10 min ez", "3.5 miles"],
-        2: ["20 min ez", "10 min ez, 10 min (8:30-9 pace), 10 min ez", "4.5 miles"],
-        3: ["25 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "6 miles"],
-        4: ["30 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "5 miles"],
-        5: ["30 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "5-5.5 miles"],
-        6: ["20 min ez", "10 min ez, 15 min (8:30-9 pace), 10 min ez", "4.5 miles"],
-        7: ["20 min ez", "20 min ez or rest", "RACE"],
-    }
+    completed = set(completed_cells)
+    if schedule is None:
+        schedule = [FALLBACK_WEEK] * weeks
     
     # Header row
     header = html.Tr([
@@ -82,10 +123,8 @@ def create_grid_table(weeks: int, plan_id: str, completed_cells: list):
     for week in range(1, weeks + 1):
         cells = [html.Td(f"Week {week}", className="week-label")]
         
-        template = workout_templates.get(week, ["Easy run", "Tempo run", "Long run"])
-        
-        for day_idx, day_workout in enumerate(template[:3]):
-            is_completed = (week, day_idx + 1) in completed_cells
+        for day_idx, day_workout in enumerate(schedule[week - 1]):
+            is_completed = (week, day_idx + 1) in completed
             cell_class = "grid-cell completed" if is_completed else "grid-cell"
             
             cells.append(
@@ -104,6 +143,98 @@ def create_grid_table(weeks: int, plan_id: str, completed_cells: list):
         html.Tbody(rows)
     ], bordered=True, hover=True, className="training-grid")
 
+def _format_pace(minutes: float) -> str:
+    whole = int(minutes)
+    seconds = round((minutes - whole) * 60)
+    if seconds == 60:
+        whole, seconds = whole + 1, 0
+    return f"{whole}:{seconds:02d}"
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def create_track_summary(track: Optional[dict], distance_unit: str = "miles"):
+    """Totals and splits of an attached GPS track"""
+    if not track:
+        return None
+    
+    unit_m = METERS_PER_UNIT.get(distance_unit, METERS_PER_UNIT["miles"])
+    label = "mi" if distance_unit == "miles" else distance_unit
+    splits = [
+        html.Span(f"{i}: {_format_duration(split['duration_s'] * unit_m / split['distance_m'])}/{label}")
+        for i, split in enumerate(track["splits"], start=1)
+    ]
+    return html.Div([
+        html.Div(f"GPS track ({track['format'].upper()}, {track['points']} points) · "
+                 f"{track['distance_m'] / unit_m:.2f} {label} · "
+                 f"moving {_format_duration(track['moving_s'])} of {_format_duration(track['elapsed_s'])} · "
+                 f"+{track['elevation_gain_m']:.0f} m"),
+        html.Div(splits, className="track-splits")
+    ], className="track-summary")
+
+def create_summary_table(summaries: list):
+    """Weekly mileage, time, pace and intensity from precomputed summaries"""
+    if not summaries:
+        return html.Div("No workouts logged yet", className="text-muted text-center p-5")
+    
+    header = html.Tr([
+        html.Th(label, className="grid-header")
+        for label in ["Week", "Miles", "Time", "Pace", "Intensity"]
+    ])
+    
+    rows = []
+    for summary in summaries:
+        avg_pace = summary["avg_pace"]
+        avg_intensity = summary["avg_intensity"]
+        rows.append(html.Tr([
+            html.Td(f"Week {summary['week']}", className="week-label"),
+            html.Td(f"{summary['total_miles']:.1f}", className="summary-cell"),
+            html.Td(f"{summary['total_minutes']:.0f} min", className="summary-cell"),
+            html.Td(f"{_format_pace(avg_pace)}/mi" if avg_pace else "–", className="summary-cell"),
+            html.Td(f"{avg_intensity:.1f}" if avg_intensity else "–", className="summary-cell"),
+        ]))
+    
+    return dbc.Table([
+        html.Thead(header),
+        html.Tbody(rows)
+    ], bordered=True, className="training-grid summary-table")
+
+def create_training_load_chart(series: dict):
+    """Daily load with acute and chronic load over the last TRAINING_LOAD_CHART_DAYS"""
+    if not len(series["day"]):
+        return html.Div("Log workouts with time and intensity to see your training load",
+                        className="text-muted text-center p-3")
+    
+    recent = slice(-TRAINING_LOAD_CHART_DAYS, None)
+    days = [str(day) for day in series["day"][recent]]
+    figure = {
+        "data": [
+            {"type": "bar", "x": days, "y": series["load"][recent].tolist(), "name": "Daily load",
+             "marker": {"color": "rgba(99, 102, 241, 0.35)"}},
+            {"type": "scatter", "mode": "lines", "x": days, "y": series["acute"][recent].tolist(),
+             "name": f"Acute ({ACUTE_DAYS} d)", "line": {"color": "#ef4444"}},
+            {"type": "scatter", "mode": "lines", "x": days, "y": series["chronic"][recent].tolist(),
+             "name": f"Chronic ({CHRONIC_DAYS} d)", "line": {"color": "#10b981"}},
+        ],
+        "layout": {
+            "height": 300,
+            "margin": {"l": 40, "r": 10, "t": 10, "b": 30},
+            "legend": {"orientation": "h", "y": -0.2},
+            "paper_bgcolor": "rgba(0,0,0,0)",
+            "plot_bgcolor": "rgba(0,0,0,0)",
+            "yaxis": {"title": {"text": "min × intensity"}},
+        },
+    }
+    ratio = series["ratio"][-1]
+    return html.Div([
+        html.H5("Training Load", className="section-title"),
+        dcc.Graph(figure=figure, config={"displayModeBar": False}),
+        html.Div(f"Acute:chronic ratio {ratio:.2f}" if ratio == ratio else "Acute:chronic ratio –",
+                 className="text-muted text-center")
+    ], className="training-load")
+
 def get_workout_modal():
     """Modal for logging workout details"""
     return dbc.Modal([
@@ -163,6 +294,20 @@ def get_workout_modal():
                     ], md=12),
                 ], className="mb-3"),
                 
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Label("GPS Track"),
+                        dcc.Upload(
+                            id="track-upload",
+                            children=html.Div("Drop a GPX or TCX file here, or click to choose one"),
+                            accept=".gpx,.tcx",
+                            max_size=GPS_UPLOAD_MAX_BYTES,
+                            className="track-upload"
+                        ),
+                        html.Div(id="track-summary")
+                    ], md=12),
+                ], className="mb-3"),
+                
                 dbc.Row([
                     dbc.Col([
                         dbc.Label("Notes"),
@@ -175,9 +320,12 @@ def get_workout_modal():
                 ], className="mb-3"),
                 
                 # Hidden stores for week, day, plan
+                dcc.Store(id="selected-cell"),
                 dcc.Store(id="modal-week"),
                 dcc.Store(id="modal-day"),
                 dcc.Store(id="modal-plan"),
+                # Set when the opened workout has a GPS track to show
+                dcc.Store(id="track-cell"),
             ])
         ]),
         dbc.ModalFooter([
@@ -186,18 +334,25 @@ def get_workout_modal():
         ])
     ], id="workout-modal", size="lg", is_open=False)
 
-def get_layout():
+def get_layout(sync_interval_ms: int = 15000):
     """Main application layout"""
     return dbc.Container([
         get_header(),
         get_plan_creator(),
         get_plan_selector(),
+        get_notes_search(),
         get_training_grid(),
         get_workout_modal(),
         
         # Session storage
         dcc.Store(id="session-id", storage_type="local"),
         
+        # Logs of the selected plan, and saves not yet synced (kept across reloads)
+        dcc.Store(id="log-cache"),
+        dcc.Store(id="pending-logs", storage_type="local"),
+        dcc.Store(id="sync-ack"),
+        dcc.Interval(id="sync-interval", interval=sync_interval_ms, disabled=True),
+        
         # Toast for notifications
         html.Div(id="notification-container")
     ], fluid=True, className="main-container")
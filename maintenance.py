@@ -0,0 +1,170 @@
+"""Background upkeep of the SQLite files: purge, incremental vacuum, ANALYZE.
+
+Deleted plans leave free pages behind, and SQLite keeps them in the
+file. Databases created with auto_vacuum = INCREMENTAL can hand them
+back to the filesystem a few at a time, so each pass:
+
+    1. purges plans soft-deleted more than purge_after_days ago, in batches
+    2. releases free pages vacuum_pages at a time, pausing between steps,
+       for at most vacuum_steps steps
+    3. refreshes planner statistics with ANALYZE, sampling analysis_limit
+       rows per index
+
+Every step is its own short transaction, so saves from the app wait at
+most one step. Passes run from one process: either a scheduled
+maintenance.py, or the app with KRUNNER_MAINTENANCE_INTERVAL_S set (off
+by default, since every gunicorn worker would run its own). Older
+database files need one full VACUUM first.
+
+Usage:
+    python maintenance.py run                         # one pass now
+    python maintenance.py schedule --interval 300     # a pass every 5 minutes until stopped
+    python maintenance.py vacuum                      # one-off full VACUUM; stop the app first
+    python maintenance.py stats
+"""
+import argparse
+import atexit
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+import config
+from storage import open_storage
+
+logger = logging.getLogger(__name__)
+
+def run_maintenance(db, purge_after_days: Optional[float] = 0, purge_batch: int = 100,
+                    vacuum_pages: int = 256, vacuum_steps: int = 16, pause: float = 0.05,
+                    analysis_limit: int = 400) -> Dict[str, float]:
+    """One maintenance pass; returns plans purged, pages released and timing
+    
+    purge_after_days=None leaves soft-deleted plans alone.
+    """
+    started = time.perf_counter()
+    purged = 0
+    while purge_after_days is not None:
+        count = db.purge_deleted_plans(purge_after_days, purge_batch)
+        purged += count
+        if count < purge_batch:
+            break
+    
+    released = 0
+    for step in range(vacuum_steps):
+        if step:
+            time.sleep(pause)
+        count = db.incremental_vacuum(vacuum_pages)
+        released += count
+        if count < vacuum_pages:
+            break
+    
+    db.analyze(analysis_limit)
+    return {
+        "purged": purged,
+        "pages_released": released,
+        "seconds": time.perf_counter() - started,
+    }
+
+class MaintenanceThread:
+    """Runs run_maintenance on a database every interval seconds"""
+    
+    def __init__(self, db, interval: float, purge_after_days: Optional[float] = None, **options):
+        self.db = db
+        self.interval = interval
+        self.purge_after_days = purge_after_days
+        self.options = options
+        self._stop = threading.Event()
+        
+        self.passes = 0
+        self.purged = 0
+        self.pages_released = 0
+        self.errors = 0
+        self.last_pass_ms = 0.0
+        
+        self._thread = threading.Thread(target=self._run, name="krunner-maintenance", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def run_once(self):
+        """Run a pass now, on the calling thread"""
+        result = run_maintenance(self.db, self.purge_after_days, **self.options)
+        self.passes += 1
+        self.purged += result["purged"]
+        self.pages_released += result["pages_released"]
+        self.last_pass_ms = result["seconds"] * 1000
+    
+    def close(self):
+        """Stop the thread, letting a pass in progress finish"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+    
+    def stats(self) -> Dict[str, float]:
+        """Pass, purge and vacuum counters"""
+        return {
+            "passes": self.passes,
+            "purged": self.purged,
+            "pages_released": self.pages_released,
+            "errors": self.errors,
+            "last_pass_ms": self.last_pass_ms,
+        }
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                self.errors += 1
+                logger.exception("Database maintenance pass failed")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Purge deleted plans and reclaim space in the Krunner database")
+    parser.add_argument("--db", default="krunner.db", help="SQLite database path (default: krunner.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("run", "purge, release free pages and ANALYZE once"),
+                               ("schedule", "run a pass every --interval seconds until stopped")):
+        run = sub.add_parser(command, help=help_text)
+        run.add_argument("--purge-after-days", type=float, default=config.PURGE_DELETED_AFTER_DAYS,
+                         help="purge plans soft-deleted at least this long ago (default: %(default)s)")
+        run.add_argument("--vacuum-steps", type=int, default=1000,
+                         help="most incremental vacuum steps of 256 pages (default: %(default)s)")
+        if command == "schedule":
+            run.add_argument("--interval", type=float, default=300,
+                             help="seconds between passes (default: %(default)s)")
+    sub.add_parser("vacuum", help="rebuild the files with a full VACUUM, enabling incremental vacuum")
+    sub.add_parser("stats", help="print page counts as JSON")
+    args = parser.parse_args(argv)
+    
+    db = open_storage(config.STORAGE, args.db, config.DB_SHARDS)
+    try:
+        before = db.storage_stats()
+        if args.command == "run":
+            result = run_maintenance(db, args.purge_after_days, vacuum_steps=args.vacuum_steps)
+            print(f"✅ Purged {result['purged']:,} plan(s), released {result['pages_released']:,} page(s) "
+                  f"in {result['seconds'] * 1000:.1f} ms", file=sys.stderr)
+        elif args.command == "schedule":
+            while True:
+                try:
+                    result = run_maintenance(db, args.purge_after_days, vacuum_steps=args.vacuum_steps)
+                    print(f"✅ Purged {result['purged']:,} plan(s), released {result['pages_released']:,} page(s) "
+                          f"in {result['seconds'] * 1000:.1f} ms", file=sys.stderr, flush=True)
+                except Exception as e:
+                    # A scheduled run carries on after a failed pass
+                    print(f"❌ Maintenance pass failed: {e}", file=sys.stderr, flush=True)
+                time.sleep(args.interval)
+        elif args.command == "vacuum":
+            db.vacuum()
+            after = db.storage_stats()
+            print(f"✅ {before['bytes']:,} -> {after['bytes']:,} bytes; "
+                  f"incremental vacuum enabled on {after['incremental_vacuum']} file(s)", file=sys.stderr)
+        else:
+            print(json.dumps(before, indent=2))
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
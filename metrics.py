@@ -0,0 +1,198 @@
+"""Latency, row-count and payload metrics exposed in Prometheus text format.
+
+Nothing is wrapped unless instrument_database / instrument_callbacks are
+called, so with KRUNNER_METRICS off the hot paths carry no overhead.
+"""
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from dash.exceptions import PreventUpdate
+from flask import Response
+
+slow_query_logger = logging.getLogger("krunner.slow_query")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Database plumbing and streaming methods whose cost is paid by the caller
+NOT_INSTRUMENTED = {
+    "connection", "transaction", "in_transaction", "stream", "close", "write_behind_stats",
+    "export_plans", "export_logs", "iter_log_values",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """Fixed-bucket histogram with a running sum and count"""
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Thread-safe store of counters and histograms, rendered as Prometheus text"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+    
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+    
+    def observe(self, name: str, labels: Dict[str, str], value: float,
+                buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+    
+    def inc(self, name: str, labels: Dict[str, str], amount: float = 1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+    
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]):
+        """Register a callable yielding (gauge name, labels, value) at scrape time"""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {value}")
+        
+        gauges: Dict[str, List[str]] = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append(f"{name}{_labels(tuple(sorted(labels.items())))} {value}")
+        for name, samples in sorted(gauges.items()):
+            self._header(lines, name, "gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+    
+    def _header(self, lines: List[str], name: str, kind: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in key)
+    return "{" + ",".join(escaped) + "}"
+
+def _row_count(result) -> int:
+    if isinstance(result, (list, tuple, set, dict)):
+        return 1 if isinstance(result, dict) else len(result)
+    if isinstance(result, bool):
+        return int(result)
+    if isinstance(result, int):
+        return result
+    return 0 if result is None else 1
+
+def instrument_database(db, registry: Optional[MetricsRegistry] = None,
+                        slow_query_ms: Optional[float] = None):
+    """Time every public Database method, recording metrics and logging slow calls"""
+    if registry is not None:
+        registry.describe("krunner_db_call_seconds", "Latency of Database method calls")
+        registry.describe("krunner_db_rows_total", "Rows returned or written by Database methods")
+        registry.describe("krunner_db_errors_total", "Database method calls that raised")
+    
+    for name, method in inspect.getmembers(type(db), inspect.isfunction):
+        if name.startswith("_") or name in NOT_INSTRUMENTED:
+            continue
+        setattr(db, name, _timed_method(getattr(db, name), name, registry, slow_query_ms))
+
+def _timed_method(bound, name: str, registry: Optional[MetricsRegistry], slow_query_ms: Optional[float]):
+    labels = {"method": name}
+    
+    @functools.wraps(bound)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = bound(*args, **kwargs)
+        except Exception:
+            if registry is not None:
+                registry.inc("krunner_db_errors_total", labels)
+            raise
+        elapsed = time.perf_counter() - started
+        if registry is not None:
+            registry.observe("krunner_db_call_seconds", labels, elapsed)
+            registry.inc("krunner_db_rows_total", labels, _row_count(result))
+        if slow_query_ms and elapsed * 1000 >= slow_query_ms:
+            slow_query_logger.warning("Slow database call %s took %.1f ms (args=%r, kwargs=%r)",
+                                      name, elapsed * 1000, args, kwargs)
+        return result
+    return wrapper
+
+def instrument_callbacks(app, registry: MetricsRegistry):
+    """Time every registered server-side Dash callback, including response serialization"""
+    registry.describe("krunner_callback_seconds", "Latency of Dash callbacks including serialization")
+    registry.describe("krunner_callback_payload_bytes", "Size of serialized Dash callback responses")
+    registry.describe("krunner_callback_errors_total", "Dash callbacks that raised")
+    registry.describe("krunner_callback_prevented_total", "Dash callbacks that raised PreventUpdate")
+    
+    for spec in app.callback_map.values():
+        # Clientside callbacks have no server function
+        if "callback" in spec:
+            spec["callback"] = _timed_callback(spec["callback"], registry)
+
+def _timed_callback(dispatch, registry: MetricsRegistry):
+    labels = {"callback": getattr(dispatch, "__name__", "unknown")}
+    
+    @functools.wraps(dispatch)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = dispatch(*args, **kwargs)
+        except PreventUpdate:
+            registry.inc("krunner_callback_prevented_total", labels)
+            raise
+        except Exception:
+            registry.inc("krunner_callback_errors_total", labels)
+            raise
+        registry.observe("krunner_callback_seconds", labels, time.perf_counter() - started)
+        if isinstance(response, (str, bytes)):
+            registry.observe("krunner_callback_payload_bytes", labels, len(response), SIZE_BUCKETS)
+        return response
+    return wrapper
+
+def register_metrics_route(server, registry: MetricsRegistry):
+    """Expose the registry on /metrics"""
+    
+    @server.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
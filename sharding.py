@@ -0,0 +1,337 @@
+"""Sessions spread over several SQLite files.
+
+Each session_id hashes to one shard, which holds its plans, logs,
+summaries and note index, so runners on different shards write in
+parallel instead of queueing for one file's write lock. Workout
+templates are global and live on shard 0.
+"""
+import itertools
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from database import Database
+from storage import StorageBackend, sync_result
+
+def shard_path(db_path: str, index: int) -> str:
+    """File of one shard: krunner.db -> krunner-03.db"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}-{index:02d}{ext or '.db'}"
+
+class ShardedDatabase(StorageBackend):
+    """StorageBackend routing each session to one of several Database shards
+    
+    Calls that only carry a plan_id find the plan's shard through a
+    bounded plan -> shard cache, falling back to asking every shard.
+    Plans never move between shards, so cached routes stay valid.
+    """
+    
+    def __init__(self, db_path: str = "krunner.db", shards: int = 8,
+                 route_cache_size: int = 100000, **options):
+        self.shards = [Database(shard_path(db_path, i), **options) for i in range(shards)]
+        self.route_cache_size = route_cache_size
+        self._routes = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def shard_for_session(self, session_id: str) -> Database:
+        """The shard holding a session's data"""
+        return self.shards[zlib.crc32(session_id.encode()) % len(self.shards)]
+    
+    def _remember(self, plan_id: str, shard: Database):
+        with self._lock:
+            self._routes[plan_id] = shard
+            self._routes.move_to_end(plan_id)
+            if len(self._routes) > self.route_cache_size:
+                self._routes.popitem(last=False)
+    
+    def shard_for_plan(self, plan_id: str) -> Optional[Database]:
+        """The shard holding a plan, or None if no shard has it"""
+        with self._lock:
+            shard = self._routes.get(plan_id)
+            if shard is not None:
+                self._routes.move_to_end(plan_id)
+                return shard
+        
+        for shard in self.shards:
+            plan = shard.get_plan(plan_id)
+            if plan is not None:
+                self._remember(plan_id, shard)
+                return shard
+        return None
+    
+    # Training Plans
+    def create_plan(self, session_id: str, name: str, weeks: int, race_distance: str) -> str:
+        shard = self.shard_for_session(session_id)
+        plan_id = shard.create_plan(session_id, name, weeks, race_distance)
+        self._remember(plan_id, shard)
+        return plan_id
+    
+    def create_plans_bulk(self, session_ids: List[str], name: str, weeks: int, race_distance: str,
+                          logs: Optional[List[Dict]] = None) -> List[str]:
+        """One transaction per shard; shards that already committed stay committed if a later one fails"""
+        by_shard: Dict[Database, List[int]] = {}
+        for index, session_id in enumerate(session_ids):
+            by_shard.setdefault(self.shard_for_session(session_id), []).append(index)
+        
+        plan_ids: List[Optional[str]] = [None] * len(session_ids)
+        for shard, indexes in by_shard.items():
+            created = shard.create_plans_bulk([session_ids[i] for i in indexes], name, weeks,
+                                              race_distance, logs)
+            for index, plan_id in zip(indexes, created):
+                plan_ids[index] = plan_id
+                self._remember(plan_id, shard)
+        return plan_ids
+    
+    def get_plans(self, session_id: str) -> List[Dict]:
+        return self.shard_for_session(session_id).get_plans(session_id)
+    
+    def search_plans(self, session_id: str, prefix: str = "", after: Optional[Tuple] = None,
+                     limit: int = 20) -> Tuple[List[Dict], Optional[Tuple]]:
+        return self.shard_for_session(session_id).search_plans(session_id, prefix, after, limit)
+    
+    def get_plan(self, plan_id: str) -> Optional[Dict]:
+        shard = self.shard_for_plan(plan_id)
+        return shard.get_plan(plan_id) if shard is not None else None
+    
+    def export_plans(self, session_id: Optional[str] = None, chunk_size: int = 500) -> Iterator[Dict]:
+        if session_id is not None:
+            return self.shard_for_session(session_id).export_plans(session_id, chunk_size)
+        return itertools.chain.from_iterable(shard.export_plans(None, chunk_size) for shard in self.shards)
+    
+    def delete_plan(self, plan_id: str, soft: bool = False) -> bool:
+        return self.delete_plans([plan_id], soft) > 0
+    
+    def delete_plans(self, plan_ids: Iterable[str], soft: bool = False) -> int:
+        """One transaction per shard"""
+        by_shard: Dict[Database, List[str]] = {}
+        for plan_id in plan_ids:
+            shard = self.shard_for_plan(plan_id)
+            if shard is not None:
+                by_shard.setdefault(shard, []).append(plan_id)
+        with self._lock:
+            for ids in by_shard.values():
+                for plan_id in ids:
+                    self._routes.pop(plan_id, None)
+        return sum(shard.delete_plans(ids, soft) for shard, ids in by_shard.items())
+    
+    def undelete_plan(self, plan_id: str) -> bool:
+        # Deleted plans are invisible to shard_for_plan
+        return any(shard.undelete_plan(plan_id) for shard in self.shards)
+    
+    def purge_deleted_plans(self, older_than_days: float = 0, limit: int = 100) -> int:
+        return sum(shard.purge_deleted_plans(older_than_days, limit) for shard in self.shards)
+    
+    # Workout Templates
+    def get_workout_templates(self) -> List[Dict]:
+        return self.shards[0].get_workout_templates()
+    
+    def workout_templates_signature(self) -> Tuple[int, int]:
+        return self.shards[0].workout_templates_signature()
+    
+    def save_workout_template(self, race_distance: str, weeks: int, schedule: List[List[str]]):
+        self.shards[0].save_workout_template(race_distance, weeks, schedule)
+    
+    def delete_workout_template(self, race_distance: str, weeks: int) -> bool:
+        return self.shards[0].delete_workout_template(race_distance, weeks)
+    
+    # Workout Logs
+    def save_workout_log(self, plan_id: str, week: int, day: int,
+                         actual_time: Optional[float] = None,
+                         actual_distance: Optional[float] = None,
+                         actual_pace: Optional[float] = None,
+                         distance_unit: str = 'miles',
+                         intensity: Optional[int] = None,
+                         notes: str = '') -> str:
+        shard = self.shard_for_plan(plan_id)
+        if shard is None:
+            raise KeyError(f"Unknown training plan {plan_id}")
+        return shard.save_workout_log(plan_id, week, day, actual_time, actual_distance,
+                                      actual_pace, distance_unit, intensity, notes)
+    
+    def save_workout_logs(self, logs: List[Dict]) -> int:
+        by_shard: Dict[Database, List[Dict]] = {}
+        for log in logs:
+            shard = self.shard_for_plan(log['plan_id'])
+            if shard is None:
+                raise KeyError(f"Unknown training plan {log['plan_id']}")
+            by_shard.setdefault(shard, []).append(log)
+        
+        return sum(shard.save_workout_logs(batch) for shard, batch in by_shard.items())
+    
+    def sync_workout_logs(self, logs: List[Dict]) -> List[Dict]:
+        by_shard: Dict[Database, List[Tuple[int, Dict]]] = {}
+        results: Dict[int, Dict] = {}
+        for index, log in enumerate(logs):
+            # Invalid logs are rejected by whichever shard gets them
+            plan_id = log.get('plan_id') if isinstance(log, dict) else None
+            shard = self.shard_for_plan(plan_id) if isinstance(plan_id, str) else self.shards[0]
+            if shard is None:
+                results[index] = sync_result(log)
+            else:
+                by_shard.setdefault(shard, []).append((index, log))
+        
+        for shard, batch in by_shard.items():
+            for (index, _), result in zip(batch, shard.sync_workout_logs([log for _, log in batch])):
+                results[index] = result
+        return [results[index] for index in range(len(logs))]
+    
+    def import_workout_logs(self, records: Iterable[Dict], chunk_size: int = 5000,
+                            progress: Optional[Callable[[int], None]] = None) -> int:
+        """Upsert normalized records, each into its session's shard, in per-shard chunks"""
+        buffers: List[List[Dict]] = [[] for _ in self.shards]
+        total = 0
+        
+        def write(index: int):
+            nonlocal total
+            total += self.shards[index].import_workout_logs(buffers[index], chunk_size)
+            buffers[index] = []
+            if progress:
+                progress(total)
+        
+        for record in records:
+            index = zlib.crc32(record['session_id'].encode()) % len(self.shards)
+            buffers[index].append(record)
+            if len(buffers[index]) >= chunk_size:
+                write(index)
+        for index, buffer in enumerate(buffers):
+            if buffer:
+                write(index)
+        return total
+    
+    def get_workout_log(self, plan_id: str, week: int, day: int) -> Optional[Dict]:
+        shard = self.shard_for_plan(plan_id)
+        return shard.get_workout_log(plan_id, week, day) if shard is not None else None
+    
+    def get_all_logs_for_plan(self, plan_id: str) -> List[Dict]:
+        shard = self.shard_for_plan(plan_id)
+        return shard.get_all_logs_for_plan(plan_id) if shard is not None else []
+    
+    def get_completed_cells(self, plan_id: str) -> List[Tuple[int, int]]:
+        shard = self.shard_for_plan(plan_id)
+        return shard.get_completed_cells(plan_id) if shard is not None else []
+    
+    def export_logs(self, session_id: Optional[str] = None, plan_id: Optional[str] = None,
+                    chunk_size: int = 500) -> Iterator[Dict]:
+        if session_id is not None:
+            return self.shard_for_session(session_id).export_logs(session_id, plan_id, chunk_size)
+        if plan_id is not None:
+            shard = self.shard_for_plan(plan_id)
+            return shard.export_logs(None, plan_id, chunk_size) if shard is not None else iter(())
+        return itertools.chain.from_iterable(shard.export_logs(None, None, chunk_size) for shard in self.shards)
+    
+    def iter_log_values(self, plan_id: Optional[str] = None, session_id: Optional[str] = None,
+                        chunk_size: int = 5000) -> Iterator[List[tuple]]:
+        if plan_id is not None:
+            shard = self.shard_for_plan(plan_id)
+            return shard.iter_log_values(plan_id, None, chunk_size) if shard is not None else iter(())
+        if session_id is not None:
+            return self.shard_for_session(session_id).iter_log_values(None, session_id, chunk_size)
+        raise ValueError("plan_id or session_id is required")
+    
+    def search_notes(self, session_id: str, query: str, limit: int = 20) -> List[Dict]:
+        return self.shard_for_session(session_id).search_notes(session_id, query, limit)
+    
+    # GPS Tracks
+    def attach_track(self, plan_id: str, week: int, day: int, source: Union[str, BinaryIO],
+                     distance_unit: str = 'miles') -> Dict:
+        shard = self.shard_for_plan(plan_id)
+        if shard is None:
+            raise KeyError(f"Unknown training plan {plan_id}")
+        return shard.attach_track(plan_id, week, day, source, distance_unit)
+    
+    def get_track_cells(self, plan_id: str) -> List[Tuple[int, int]]:
+        shard = self.shard_for_plan(plan_id)
+        return shard.get_track_cells(plan_id) if shard is not None else []
+    
+    def get_track(self, plan_id: str, week: int, day: int, samples: bool = False) -> Optional[Dict]:
+        shard = self.shard_for_plan(plan_id)
+        return shard.get_track(plan_id, week, day, samples) if shard is not None else None
+    
+    # Archiving
+    def archive_plan(self, plan_id: str) -> bool:
+        shard = self.shard_for_plan(plan_id)
+        return shard.archive_plan(plan_id) if shard is not None else False
+    
+    def archive_finished_plans(self, grace_days: int = 14) -> int:
+        return sum(shard.archive_finished_plans(grace_days) for shard in self.shards)
+    
+    def open_archive(self, plan_id: str):
+        shard = self.shard_for_plan(plan_id)
+        return shard.open_archive(plan_id) if shard is not None else None
+    
+    # Training Load
+    def get_training_load(self, session_id: str) -> List[Dict]:
+        return self.shard_for_session(session_id).get_training_load(session_id)
+    
+    def rebuild_training_load(self, session_id: Optional[str] = None) -> int:
+        if session_id is None:
+            return sum(shard.rebuild_training_load() for shard in self.shards)
+        return self.shard_for_session(session_id).rebuild_training_load(session_id)
+    
+    # Weekly Summaries
+    def get_weekly_summaries(self, plan_id: str) -> List[Dict]:
+        shard = self.shard_for_plan(plan_id)
+        return shard.get_weekly_summaries(plan_id) if shard is not None else []
+    
+    def rebuild_weekly_summaries(self, plan_id: Optional[str] = None) -> int:
+        if plan_id is None:
+            return sum(shard.rebuild_weekly_summaries() for shard in self.shards)
+        shard = self.shard_for_plan(plan_id)
+        return shard.rebuild_weekly_summaries(plan_id) if shard is not None else 0
+    
+    # Space and statistics
+    def incremental_vacuum(self, pages: int = 256) -> int:
+        return sum(shard.incremental_vacuum(pages) for shard in self.shards)
+    
+    def analyze(self, analysis_limit: int = 400):
+        for shard in self.shards:
+            shard.analyze(analysis_limit)
+    
+    def vacuum(self):
+        for shard in self.shards:
+            shard.vacuum()
+    
+    def storage_stats(self) -> Dict[str, int]:
+        """Pages and bytes summed over shards; incremental_vacuum counts shards that have it"""
+        totals: Dict[str, int] = {}
+        for shard in self.shards:
+            for key, value in shard.storage_stats().items():
+                if key == "page_size":
+                    totals[key] = value
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+    
+    def maintenance_stats(self) -> Dict[str, float]:
+        """Maintenance counters summed over shards"""
+        totals: Dict[str, float] = {}
+        for shard in self.shards:
+            for key, value in shard.maintenance_stats().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+    
+    # Write-behind and lifecycle
+    def flush(self):
+        for shard in self.shards:
+            shard.flush()
+    
+    def pending_writes(self, plan_id: str) -> int:
+        shard = self.shard_for_plan(plan_id)
+        return shard.pending_writes(plan_id) if shard is not None else 0
+    
+    def write_behind_stats(self) -> Dict[str, int]:
+        """Write-behind metrics summed over shards (maxima for batch sizes)"""
+        totals: Dict[str, int] = {}
+        for shard in self.shards:
+            for key, value in shard.write_behind_stats().items():
+                if key.endswith("batch_size"):
+                    totals[key] = max(totals.get(key, 0), value)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+    
+    def close(self):
+        for shard in self.shards:
+            shard.close()
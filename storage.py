@@ -0,0 +1,233 @@
+"""Storage backend interface.
+
+Callbacks, the importer, exporters and analytics depend only on
+StorageBackend. Implementations:
+
+    database.Database         one SQLite file (the default)
+    database.MemoryDatabase   private in-memory SQLite, for tests and benchmarks
+    sharding.ShardedDatabase  sessions spread over N SQLite files
+"""
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+BACKENDS = ("sqlite", "memory", "sharded")
+
+def sync_result(log: Dict, applied: bool = False, error: Optional[str] = None) -> Dict:
+    """Outcome of one synced log, echoing the cell and updated_at the client sent"""
+    fields = log if isinstance(log, dict) else {}
+    result = {key: fields.get(key) for key in ("plan_id", "week", "day", "updated_at")}
+    result["applied"] = applied
+    if error is not None:
+        result["error"] = error
+    return result
+
+class StorageBackend(ABC):
+    """Everything the app needs from storage"""
+    
+    # Training Plans
+    @abstractmethod
+    def create_plan(self, session_id: str, name: str, weeks: int, race_distance: str) -> str:
+        """Create a new training plan"""
+    
+    @abstractmethod
+    def create_plans_bulk(self, session_ids: List[str], name: str, weeks: int, race_distance: str,
+                          logs: Optional[List[Dict]] = None) -> List[str]:
+        """Create one plan per session, each starting with a copy of logs; returns ids in session order"""
+    
+    @abstractmethod
+    def get_plans(self, session_id: str) -> List[Dict]:
+        """Get all training plans for a session"""
+    
+    @abstractmethod
+    def search_plans(self, session_id: str, prefix: str = "", after: Optional[Tuple] = None,
+                     limit: int = 20) -> Tuple[List[Dict], Optional[Tuple]]:
+        """Get one page of a session's plans and the cursor for the next page"""
+    
+    @abstractmethod
+    def get_plan(self, plan_id: str) -> Optional[Dict]:
+        """Get a specific training plan"""
+    
+    @abstractmethod
+    def export_plans(self, session_id: Optional[str] = None, chunk_size: int = 500) -> Iterator[Dict]:
+        """Stream training plans for one session, or for every session"""
+    
+    @abstractmethod
+    def delete_plan(self, plan_id: str, soft: bool = False) -> bool:
+        """Delete a training plan and all associated workout logs"""
+    
+    @abstractmethod
+    def delete_plans(self, plan_ids: Iterable[str], soft: bool = False) -> int:
+        """Delete training plans with everything attached; soft only marks them deleted"""
+    
+    @abstractmethod
+    def undelete_plan(self, plan_id: str) -> bool:
+        """Bring back a soft-deleted plan that has not been purged yet"""
+    
+    @abstractmethod
+    def purge_deleted_plans(self, older_than_days: float = 0, limit: int = 100) -> int:
+        """Permanently delete plans soft-deleted at least older_than_days ago"""
+    
+    # Workout Templates
+    @abstractmethod
+    def get_workout_templates(self) -> List[Dict]:
+        """Get every stored workout template with its decoded schedule"""
+    
+    @abstractmethod
+    def workout_templates_signature(self) -> Tuple[int, int]:
+        """Value that changes whenever any template does"""
+    
+    @abstractmethod
+    def save_workout_template(self, race_distance: str, weeks: int, schedule: List[List[str]]):
+        """Add or replace the template for a race distance and plan length"""
+    
+    @abstractmethod
+    def delete_workout_template(self, race_distance: str, weeks: int) -> bool:
+        """Delete the template for a race distance and plan length"""
+    
+    # Workout Logs
+    @abstractmethod
+    def save_workout_log(self, plan_id: str, week: int, day: int,
+                         actual_time: Optional[float] = None,
+                         actual_distance: Optional[float] = None,
+                         actual_pace: Optional[float] = None,
+                         distance_unit: str = 'miles',
+                         intensity: Optional[int] = None,
+                         notes: str = '') -> str:
+        """Save or update a workout log"""
+    
+    @abstractmethod
+    def save_workout_logs(self, logs: List[Dict]) -> int:
+        """Save or update many workout logs; later duplicates win"""
+    
+    @abstractmethod
+    def sync_workout_logs(self, logs: List[Dict]) -> List[Dict]:
+        """Apply a batch of edits made on a client, keeping the most recently edited version"""
+    
+    @abstractmethod
+    def import_workout_logs(self, records: Iterable[Dict], chunk_size: int = 5000,
+                            progress: Optional[Callable[[int], None]] = None) -> int:
+        """Upsert normalized workout logs in chunks, creating plans as needed"""
+    
+    @abstractmethod
+    def get_workout_log(self, plan_id: str, week: int, day: int) -> Optional[Dict]:
+        """Get a specific workout log"""
+    
+    @abstractmethod
+    def get_all_logs_for_plan(self, plan_id: str) -> List[Dict]:
+        """Get all workout logs for a plan"""
+    
+    @abstractmethod
+    def get_completed_cells(self, plan_id: str) -> List[Tuple[int, int]]:
+        """Get list of (week, day) tuples that have completed logs"""
+    
+    @abstractmethod
+    def export_logs(self, session_id: Optional[str] = None, plan_id: Optional[str] = None,
+                    chunk_size: int = 500) -> Iterator[Dict]:
+        """Stream workout logs for a plan, a session, or everything"""
+    
+    @abstractmethod
+    def iter_log_values(self, plan_id: Optional[str] = None, session_id: Optional[str] = None,
+                        chunk_size: int = 5000) -> Iterator[List[tuple]]:
+        """Yield chunks of canonical-unit log tuples for a plan or a session"""
+    
+    @abstractmethod
+    def search_notes(self, session_id: str, query: str, limit: int = 20) -> List[Dict]:
+        """Find a session's workouts by their notes, best matches first"""
+    
+    # GPS Tracks
+    @abstractmethod
+    def attach_track(self, plan_id: str, week: int, day: int, source: Union[str, BinaryIO],
+                     distance_unit: str = 'miles') -> Dict:
+        """Store a GPX/TCX track for a workout and fill in the log's time, distance and pace"""
+    
+    @abstractmethod
+    def get_track_cells(self, plan_id: str) -> List[Tuple[int, int]]:
+        """Get list of (week, day) tuples that have a GPS track"""
+    
+    @abstractmethod
+    def get_track(self, plan_id: str, week: int, day: int, samples: bool = False) -> Optional[Dict]:
+        """Get a workout's track summary, with its decoded samples if asked"""
+    
+    # Archiving
+    @abstractmethod
+    def archive_plan(self, plan_id: str) -> bool:
+        """Move a plan's workout logs out of the database into its archive file"""
+    
+    @abstractmethod
+    def archive_finished_plans(self, grace_days: int = 14) -> int:
+        """Archive every plan whose race is more than grace_days in the past"""
+    
+    @abstractmethod
+    def open_archive(self, plan_id: str):
+        """The memory-mapped PlanArchive of an archived plan, or None"""
+    
+    # Training Load
+    @abstractmethod
+    def get_training_load(self, session_id: str) -> List[Dict]:
+        """Days with load for a session, oldest first, with acute and chronic load after each"""
+    
+    @abstractmethod
+    def rebuild_training_load(self, session_id: Optional[str] = None) -> int:
+        """Recompute training load from the logs of one session, or of every session"""
+    
+    # Weekly Summaries
+    @abstractmethod
+    def get_weekly_summaries(self, plan_id: str) -> List[Dict]:
+        """Get per-week totals for a plan"""
+    
+    @abstractmethod
+    def rebuild_weekly_summaries(self, plan_id: Optional[str] = None) -> int:
+        """Recompute weekly summaries for one plan, or for every plan"""
+    
+    # Space and statistics
+    @abstractmethod
+    def incremental_vacuum(self, pages: int = 256) -> int:
+        """Return up to pages free pages to the filesystem"""
+    
+    @abstractmethod
+    def analyze(self, analysis_limit: int = 400):
+        """Refresh query planner statistics"""
+    
+    @abstractmethod
+    def vacuum(self):
+        """Rebuild the database files in full"""
+    
+    @abstractmethod
+    def storage_stats(self) -> Dict[str, int]:
+        """Database size in pages and bytes, and how many pages are free"""
+    
+    @abstractmethod
+    def maintenance_stats(self) -> Dict[str, float]:
+        """Background maintenance counters, empty when it is off"""
+    
+    # Write-behind and lifecycle
+    @abstractmethod
+    def flush(self):
+        """Wait until every queued save is committed"""
+    
+    @abstractmethod
+    def pending_writes(self, plan_id: str) -> int:
+        """Number of queued saves for a plan that are not committed yet"""
+    
+    @abstractmethod
+    def write_behind_stats(self) -> Dict[str, int]:
+        """Write-behind queue metrics, empty when it is off"""
+    
+    @abstractmethod
+    def close(self):
+        """Flush queued writes and release every connection"""
+
+def open_storage(backend: str = "sqlite", db_path: str = "krunner.db", shards: int = 8,
+                 **options) -> StorageBackend:
+    """Create the configured backend; options go to each underlying Database"""
+    # Imported here because the implementations import this module
+    if backend == "sqlite":
+        from database import Database
+        return Database(db_path, **options)
+    if backend == "memory":
+        from database import MemoryDatabase
+        return MemoryDatabase(**options)
+    if backend == "sharded":
+        from sharding import ShardedDatabase
+        return ShardedDatabase(db_path, shards, **options)
+    raise ValueError(f"Unknown storage backend {backend!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,154 @@
+"""Workout templates, compiled from the workout_templates table.
+
+A template is the schedule a coach wrote for one race distance and plan
+length: one [recovery, speed, endurance] entry per week. Plans of any
+length are scheduled from the template closest in length, keeping its
+final taper weeks fixed before the race and stretching or compressing
+the build-up weeks proportionally to fill the rest.
+
+Usage:
+    python templates.py list
+    python templates.py load templates.json    # [{"race_distance", "weeks", "schedule"}, ...]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+from storage import StorageBackend, open_storage
+
+# Template used for any race distance without one of its own
+DEFAULT_DISTANCE = "*"
+
+# Last resort when the table holds no templates at all
+FALLBACK_WEEK = ("Easy run", "Tempo run", "Long run")
+
+# Weeks at the end of a template (cutback and race) that are never stretched
+TAPER_WEEKS = 2
+
+Week = Tuple[str, str, str]
+
+def normalize_distance(race_distance: Optional[str]) -> str:
+    """Lookup key for a free-text race distance, e.g. "Half Marathon" becomes halfmarathon"""
+    return "".join((race_distance or "").lower().split()) or DEFAULT_DISTANCE
+
+def scale_schedule(template: List[Week], weeks: int) -> List[Week]:
+    """Fit a template to a plan of the given length by periodization"""
+    length = len(template)
+    if not length:
+        return [FALLBACK_WEEK] * weeks
+    taper = min(TAPER_WEEKS, length - 1)
+    if weeks <= taper:
+        return template[length - weeks:]
+    
+    # Map build-up weeks onto the template's build-up proportionally
+    build, template_build = weeks - taper, length - taper
+    schedule = [template[week * template_build // build] for week in range(build)]
+    return schedule + template[length - taper:]
+
+class TemplateEngine:
+    """Compiled lookup of scheduled workouts per (race distance, plan length)
+    
+    Templates are read once into memory. Each plan length is scaled on
+    first use and cached, so rendering a cell is an O(1) list index. The
+    table signature is rechecked at most every check_interval seconds, so
+    templates saved by another process show up without a restart.
+    """
+    
+    def __init__(self, db: StorageBackend, check_interval: float = 5.0):
+        self.db = db
+        self.check_interval = check_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Dict[int, List[Week]]] = {}
+        self._schedules: Dict[Tuple[str, int], List[Week]] = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self.reload()
+    
+    def reload(self):
+        """Recompile every template from the database"""
+        signature = self.db.workout_templates_signature()
+        templates: Dict[str, Dict[int, List[Week]]] = {}
+        for row in self.db.get_workout_templates():
+            templates.setdefault(row["race_distance"], {})[row["weeks"]] = [
+                tuple(week[:3]) + FALLBACK_WEEK[len(week):] for week in row["schedule"]
+            ]
+        
+        with self._lock:
+            self._templates = templates
+            self._schedules = {}
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            self.version += 1
+    
+    def refresh(self):
+        """Reload if templates changed since the last check"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        if self.db.workout_templates_signature() != self._signature:
+            self.reload()
+        else:
+            self._checked_at = time.monotonic()
+    
+    def schedule(self, race_distance: Optional[str], weeks: int) -> List[Week]:
+        """Workouts for each week of a plan, indexed by week - 1"""
+        self.refresh()
+        key = (normalize_distance(race_distance), weeks)
+        schedule = self._schedules.get(key)
+        if schedule is None:
+            schedule = self._compile(*key)
+            with self._lock:
+                self._schedules[key] = schedule
+        return schedule
+    
+    def _compile(self, distance: str, weeks: int) -> List[Week]:
+        by_length = self._templates.get(distance) or self._templates.get(DEFAULT_DISTANCE)
+        if not by_length:
+            return [FALLBACK_WEEK] * weeks
+        # Closest plan length wins; ties go to the longer template
+        length = min(by_length, key=lambda n: (abs(n - weeks), -n))
+        return scale_schedule(by_length[length], weeks)
+    
+    def save(self, race_distance: str, weeks: int, schedule: List[List[str]]):
+        """Add or replace a template and recompile"""
+        self.db.save_workout_template(normalize_distance(race_distance), weeks, schedule)
+        self.reload()
+    
+    def delete(self, race_distance: str, weeks: int) -> bool:
+        """Delete a template and recompile"""
+        deleted = self.db.delete_workout_template(normalize_distance(race_distance), weeks)
+        self.reload()
+        return deleted
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage Krunner workout templates")
+    parser.add_argument("--db", default="krunner.db", help="SQLite database path (default: krunner.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="print stored templates as JSON")
+    load = subparsers.add_parser("load", help="add or replace templates from a JSON file")
+    load.add_argument("path", help="JSON list of {race_distance, weeks, schedule}")
+    args = parser.parse_args(argv)
+    
+    db = open_storage(config.STORAGE, args.db, config.DB_SHARDS)
+    try:
+        if args.command == "list":
+            json.dump(db.get_workout_templates(), sys.stdout, indent=2)
+            print()
+            return 0
+        
+        with open(args.path) as f:
+            templates = json.load(f)
+        for template in templates:
+            db.save_workout_template(normalize_distance(template["race_distance"]),
+                                     int(template["weeks"]), template["schedule"])
+        print(f"✅ Loaded {len(templates)} template(s)")
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import MemoryDatabase
+from storage import open_storage
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database"""
+    database = MemoryDatabase()
+    yield database
+    database.close()
+
+@pytest.fixture(params=["memory", "sharded"])
+def storage(request, tmp_path):
+    """A fresh backend of each kind: in memory, and sharded over three files"""
+    backend = open_storage(request.param, str(tmp_path / "krunner.db"), 3)
+    yield backend
+    backend.close()
@@ -0,0 +1,67 @@
+import os
+
+from archive import archive_path
+from database import MemoryDatabase
+
+def _plan_with_notes(db):
+    plan_id = db.create_plan("s1", "Autumn", 4, "10K")
+    db.save_workout_log(plan_id, 1, 1, actual_time=30, actual_distance=3, notes="hill repeats felt strong")
+    db.save_workout_log(plan_id, 1, 2, actual_time=45, actual_distance=5, intensity=4, notes="")
+    db.save_workout_log(plan_id, 2, 3, actual_time=60, actual_distance=6.5, distance_unit="km",
+                        notes="long run by the river")
+    return plan_id
+
+def test_archive_round_trip(db):
+    plan_id = _plan_with_notes(db)
+    before = db.get_all_logs_for_plan(plan_id)
+    summaries = db.get_weekly_summaries(plan_id)
+    
+    assert db.archive_plan(plan_id)
+    assert db.open_archive(plan_id) is not None
+    assert db.get_all_logs_for_plan(plan_id) == before
+    assert sorted(db.get_completed_cells(plan_id)) == [(1, 1), (1, 2), (2, 3)]
+    assert db.get_weekly_summaries(plan_id) == summaries
+    
+    # A save moves the logs back into the database
+    db.save_workout_log(plan_id, 3, 1, actual_time=20, actual_distance=2)
+    assert db.open_archive(plan_id) is None
+    assert not os.path.exists(archive_path(db.archive_dir, plan_id))
+    assert len(db.get_all_logs_for_plan(plan_id)) == 4
+
+def test_notes_search_after_archiving(db):
+    plan_id = _plan_with_notes(db)
+    assert db.archive_plan(plan_id)
+    
+    results = db.search_notes("s1", "hill")
+    assert [(r["plan_id"], r["week"], r["day"]) for r in results] == [(plan_id, 1, 1)]
+    assert db.search_notes("s2", "hill") == []
+    
+    # Restored logs are found once, through the live index
+    db.save_workout_log(plan_id, 3, 1, actual_time=20, actual_distance=2, notes="easy shakeout")
+    assert len(db.search_notes("s1", "river")) == 1
+    assert len(db.search_notes("s1", "shakeout")) == 1
+
+def test_deleting_an_archived_plan_drops_its_notes(db):
+    plan_id = _plan_with_notes(db)
+    assert db.archive_plan(plan_id)
+    assert db.delete_plan(plan_id)
+    
+    assert db.search_notes("s1", "hill") == []
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM archived_notes_fts").fetchone()[0] == 0
+
+def test_plans_archived_before_the_notes_index_are_indexed(tmp_path):
+    db = MemoryDatabase(archive_dir=str(tmp_path))
+    try:
+        plan_id = _plan_with_notes(db)
+        assert db.archive_plan(plan_id)
+        # As on a database archived before migration 14
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM archived_notes")
+            cursor.execute("PRAGMA user_version = 13")
+        assert db.search_notes("s1", "hill") == []
+        
+        db.init_db()
+        assert len(db.search_notes("s1", "hill")) == 1
+    finally:
+        db.close()
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from backup import create_snapshot, list_snapshots, prune_snapshots, restore_snapshot
+from database import Database
+
+def test_snapshot_verify_and_restore(tmp_path):
+    path = str(tmp_path / "krunner.db")
+    backup_dir = str(tmp_path / "backups")
+    db = Database(path)
+    plan_id = db.create_plan("s1", "Plan", 4, "5K")
+    archived = db.create_plan("s1", "Old plan", 4, "5K")
+    db.save_workout_log(plan_id, 1, 1, actual_time=30, notes="before the backup")
+    db.save_workout_log(archived, 1, 2, actual_time=40, notes="archived notes")
+    db.archive_plan(archived)
+    
+    manifest = create_snapshot([path], backup_dir, baseline_seconds=0.05)
+    assert [f["integrity"] for f in manifest["files"]] == ["ok"]
+    assert [s["name"] for s in list_snapshots(backup_dir)] == [manifest["name"]]
+    
+    # Changes after the snapshot are undone by the restore
+    db.save_workout_log(plan_id, 1, 2, actual_time=50)
+    db.delete_plan(archived)
+    db.close()
+    
+    restore_snapshot(os.path.join(backup_dir, manifest["name"]), [path])
+    db = Database(path)
+    try:
+        assert [(log["week"], log["day"]) for log in db.get_all_logs_for_plan(plan_id)] == [(1, 1)]
+        assert db.open_archive(archived) is not None
+        assert db.get_all_logs_for_plan(archived)[0]["notes"] == "archived notes"
+        assert len(db.search_notes("s1", "archived")) == 1
+    finally:
+        db.close()
+
+def test_restore_refuses_an_open_database(tmp_path):
+    path = str(tmp_path / "krunner.db")
+    backup_dir = str(tmp_path / "backups")
+    db = Database(path)
+    try:
+        manifest = create_snapshot([path], backup_dir, baseline_seconds=0.05)
+        with pytest.raises(RuntimeError, match="appears to be open"):
+            restore_snapshot(os.path.join(backup_dir, manifest["name"]), [path])
+    finally:
+        db.close()
+
+def test_prune_keeps_the_newest(tmp_path):
+    backup_dir = tmp_path / "backups"
+    for name in ("20260101T000000Z", "20260102T000000Z", "20260103T000000Z"):
+        (backup_dir / name).mkdir(parents=True)
+        (backup_dir / name / "manifest.json").write_text(f'{{"name": "{name}"}}')
+    (backup_dir / "20260104T000000Z.partial").mkdir()
+    
+    assert prune_snapshots(str(backup_dir), keep=1) == ["20260101T000000Z", "20260102T000000Z"]
+    assert [s["name"] for s in list_snapshots(str(backup_dir))] == ["20260103T000000Z"]
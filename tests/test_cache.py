@@ -0,0 +1,84 @@
+from cache import RenderCache
+from database import MemoryDatabase
+from templates import TemplateEngine
+
+class Renders:
+    """Render callbacks that count their calls"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, key):
+        def render():
+            self.calls.append(key)
+            return f"grid {key} #{len(self.calls)}"
+        return render
+
+def test_least_recently_used_entry_is_evicted():
+    cache, render = RenderCache(maxsize=2), Renders()
+    cache.get_or_render("a", 1, render("a"))
+    cache.get_or_render("b", 1, render("b"))
+    cache.get_or_render("a", 1, render("a"))  # a is now the most recent
+    cache.get_or_render("c", 1, render("c"))  # so b goes
+    
+    cache.get_or_render("a", 1, render("a"))
+    cache.get_or_render("b", 1, render("b"))
+    assert render.calls == ["a", "b", "c", "b"]
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 2, "misses": 4, "evictions": 2}
+
+def test_new_version_replaces_the_entry():
+    cache, render = RenderCache(), Renders()
+    assert cache.get_or_render("a", (1, 0, 1), render("a")) == "grid a #1"
+    assert cache.get_or_render("a", (1, 0, 1), render("a")) == "grid a #1"
+    assert cache.get_or_render("a", (2, 0, 1), render("a")) == "grid a #2"
+    # An older version is a miss too, not a hit on a stale entry
+    assert cache.get_or_render("a", (1, 0, 1), render("a")) == "grid a #3"
+    assert cache.stats()["size"] == 1
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 3, 0)
+
+def test_invalidate_and_clear():
+    cache, render = RenderCache(), Renders()
+    cache.get_or_render("a", 1, render("a"))
+    cache.get_or_render("b", 1, render("b"))
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    cache.get_or_render("a", 1, render("a"))
+    cache.get_or_render("b", 1, render("b"))
+    cache.clear()
+    assert cache.stats()["size"] == 0
+    assert render.calls == ["a", "b", "a"]
+
+def _grid_version(db, templates, plan_id):
+    # The version display_grid renders a plan's grid for
+    return db.get_plan(plan_id)["revision"], db.pending_writes(plan_id), templates.version
+
+def test_grid_version_changes_with_saves_and_templates(db):
+    templates = TemplateEngine(db, check_interval=0)
+    plan_id = db.create_plan("s1", "Spring", 4, "5K")
+    version = _grid_version(db, templates, plan_id)
+    assert _grid_version(db, templates, plan_id) == version
+    
+    db.save_workout_log(plan_id, 1, 1, actual_time=30)
+    saved = _grid_version(db, templates, plan_id)
+    assert saved[0] > version[0]
+    
+    templates.save("5K", 4, [["Easy", "Intervals", "Long"]] * 4)
+    assert _grid_version(db, templates, plan_id)[2] > saved[2]
+
+def test_queued_saves_change_the_grid_version():
+    db = MemoryDatabase(write_behind=True)
+    try:
+        templates = TemplateEngine(db)
+        plan_id = db.create_plan("s1", "Spring", 4, "5K")
+        version = _grid_version(db, templates, plan_id)
+        
+        # Hold the batch open so the save is still queued
+        db.write_queue.linger = 0.2
+        db.save_workout_log(plan_id, 1, 1, actual_time=30)
+        assert _grid_version(db, templates, plan_id)[1:] == (1, version[2])
+        db.flush()
+        
+        committed = _grid_version(db, templates, plan_id)
+        assert committed[1] == 0 and committed[0] > version[0]
+    finally:
+        db.close()
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from cohort import provision_cohort
+
+SESSIONS = ["runner-1", "runner-2", "runner-3"]
+
+@pytest.fixture
+def coach_plan(db):
+    plan_id = db.create_plan("coach", "Spring block", 4, "Half Marathon")
+    db.save_workout_log(plan_id, 1, 1, actual_time=30, actual_distance=3, intensity=2)
+    db.save_workout_log(plan_id, 1, 3, actual_time=60, actual_distance=6, intensity=3)
+    db.save_workout_log(plan_id, 2, 2, actual_time=40, actual_distance=4, intensity=4)
+    return plan_id
+
+def _counts(db):
+    with db.connection() as conn:
+        return tuple(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                     for table in ("training_plans", "workout_logs", "weekly_summaries"))
+
+def test_clone_creates_plans_with_logs_summaries_and_load(db, coach_plan):
+    result = provision_cohort(db, SESSIONS + ["runner-1", " "], clone_from=coach_plan)
+    assert list(result["plans"]) == SESSIONS
+    assert result["logs"] == 9
+    
+    source = db.get_weekly_summaries(coach_plan)
+    for session_id, plan_id in result["plans"].items():
+        plan = db.get_plan(plan_id)
+        assert (plan["session_id"], plan["name"], plan["weeks"]) == (session_id, "Spring block", 4)
+        assert sorted(db.get_completed_cells(plan_id)) == [(1, 1), (1, 3), (2, 2)]
+        assert db.get_weekly_summaries(plan_id) == source
+        # 30 * 2 + 60 * 3 + 40 * 4 on the day of the copy
+        assert [row["load"] for row in db.get_training_load(session_id)] == [pytest.approx(400.0)]
+
+def test_shorter_plans_skip_later_weeks(db, coach_plan):
+    result = provision_cohort(db, SESSIONS, weeks=1, clone_from=coach_plan)
+    assert result["logs"] == 6
+    for plan_id in result["plans"].values():
+        assert sorted(db.get_completed_cells(plan_id)) == [(1, 1), (1, 3)]
+
+def test_failure_partway_rolls_everything_back(db, coach_plan):
+    before = _counts(db)
+    logs = db.get_all_logs_for_plan(coach_plan)
+    # The last copied log breaks a NOT NULL constraint after the plans and other logs are in
+    logs[-1] = {**logs[-1], "day": None}
+    with pytest.raises(sqlite3.IntegrityError):
+        db.create_plans_bulk(SESSIONS, "Spring block", 4, "Half Marathon", logs)
+    assert _counts(db) == before
+    assert all(db.get_plans(session_id) == [] for session_id in SESSIONS)
+    
+    with pytest.raises(sqlite3.IntegrityError):
+        db.create_plans_bulk(["runner-1", None, "runner-3"], "Spring block", 4, "Half Marathon")
+    assert _counts(db) == before
+
+def test_needs_a_plan_to_create(db):
+    with pytest.raises(ValueError):
+        provision_cohort(db, SESSIONS, name="Spring block")
+    with pytest.raises(KeyError):
+        provision_cohort(db, SESSIONS, clone_from="no-such-plan")
+    assert provision_cohort(db, ["", "  "], "Spring block", 4, "5K")["plans"] == {}
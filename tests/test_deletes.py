@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+from maintenance import run_maintenance
+
+def _plan(db, session_id="s1", name="Plan", notes="tempo run"):
+    plan_id = db.create_plan(session_id, name, 4, "5K")
+    db.save_workout_log(plan_id, 1, 1, actual_time=30, actual_distance=3, intensity=3, notes=notes)
+    db.save_workout_log(plan_id, 2, 2, actual_time=40, actual_distance=4, intensity=2)
+    return plan_id
+
+def _rows(db, table, plan_id):
+    with db.connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE plan_id = ?", (plan_id,)).fetchone()[0]
+
+def test_delete_cascades_to_everything_attached(db):
+    plan_id = _plan(db)
+    kept = _plan(db, name="Kept")
+    with db.transaction() as cursor:
+        cursor.execute("""
+            INSERT INTO workout_tracks (plan_id, week, day, format, points, distance_m, elapsed_s,
+                                        moving_s, elevation_gain_m, split_m, splits, samples)
+            VALUES (?, 1, 1, 'gpx', 0, 0, 0, 0, 0, 1000, '[]', x'')
+        """, (plan_id,))
+    
+    assert db.delete_plans([plan_id, "missing"]) == 1
+    for table in ("workout_logs", "weekly_summaries", "workout_tracks"):
+        assert _rows(db, table, plan_id) == 0
+    assert [r["plan_id"] for r in db.search_notes("s1", "tempo")] == [kept]
+    assert _rows(db, "workout_logs", kept) == 2
+
+def test_foreign_keys_are_enforced(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        db.save_workout_log("no-such-plan", 1, 1, actual_time=30)
+
+def test_soft_delete_hides_until_purged(storage):
+    plan_id = _plan(storage)
+    other = _plan(storage, name="Other")
+    assert storage.delete_plan(plan_id, soft=True)
+    
+    assert storage.get_plan(plan_id) is None
+    assert [p["id"] for p in storage.get_plans("s1")] == [other]
+    assert storage.search_notes("s1", "tempo")[0]["plan_id"] == other
+    assert {p["id"] for p in storage.export_plans()} == {other}
+    assert {log["plan_id"] for log in storage.export_logs()} == {other}
+    
+    assert storage.undelete_plan(plan_id)
+    assert storage.get_plan(plan_id) is not None
+    
+    assert storage.delete_plans([plan_id], soft=True) == 1
+    assert storage.purge_deleted_plans(older_than_days=1) == 0
+    assert storage.purge_deleted_plans() == 1
+    assert not storage.undelete_plan(plan_id)
+    assert storage.get_plan(other) is not None
+
+def test_maintenance_purges_and_shrinks_the_file(storage):
+    plan_ids = [_plan(storage, f"s{n}", notes="interval session " * 50) for n in range(40)]
+    full = storage.storage_stats()
+    assert full["incremental_vacuum"]
+    
+    storage.delete_plans(plan_ids[:30], soft=True)
+    result = run_maintenance(storage, purge_after_days=0, vacuum_steps=100, pause=0)
+    assert result["purged"] == 30
+    assert result["pages_released"] > 0
+    assert storage.storage_stats()["page_count"] < full["page_count"]
+    assert storage.storage_stats()["freelist_count"] == 0
+
+def test_incremental_vacuum_refuses_to_run_in_a_transaction(db):
+    with db.transaction():
+        with pytest.raises(RuntimeError):
+            db.incremental_vacuum()
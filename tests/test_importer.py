@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from importer import import_file, normalize_record, parse_timestamp
+
+RECORD = {"session_id": "s1", "plan_name": "Spring", "week": "2", "day": "1", "actual_time": "30"}
+
+def test_parse_timestamp_formats():
+    assert parse_timestamp("2026-03-01") == "2026-03-01 00:00:00"
+    assert parse_timestamp("2026-03-01T07:30:15.250") == "2026-03-01 07:30:15"
+    assert parse_timestamp("2026-03-01T07:30:00+02:00") == "2026-03-01 05:30:00"
+    assert parse_timestamp("") is None
+
+def test_invalid_created_at_is_rejected():
+    with pytest.raises(ValueError, match="invalid timestamp"):
+        normalize_record({**RECORD, "created_at": "yesterday"})
+
+def test_imported_created_at_counts_towards_training_load(db):
+    record = normalize_record({**RECORD, "intensity": "3", "created_at": "2026-03-01T07:30:00Z"})
+    assert db.import_workout_logs([record]) == 1
+    
+    rows = db.get_training_load("s1")
+    assert len(rows) == 1
+    assert rows[0]["load"] == pytest.approx(90.0)
+
+def test_corrupt_jsonl_lines_are_skipped(db, tmp_path):
+    good = json.dumps(RECORD)
+    path = tmp_path / "history.jsonl"
+    path.write_text("\n".join([good, "{bad json", "[1, 2]", json.dumps({**RECORD, "day": "2"})]) + "\n")
+    
+    stats = import_file(db, str(path), verbose=False)
+    assert (stats.imported, stats.skipped) == (2, 2)
+    plan_id = normalize_record(RECORD)["plan_id"]
+    assert {log["day"] for log in db.get_all_logs_for_plan(plan_id)} == {1, 2}
+
+def test_unreadable_csv_row_is_skipped(db, tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text("session_id,plan_name,week,day\n"
+                    "s1,Spring,2,1\n"
+                    "s1,Spring,2,\0\n"
+                    "s1,Spring,2,3\n")
+    
+    stats = import_file(db, str(path), verbose=False)
+    assert (stats.imported, stats.skipped) == (2, 1)
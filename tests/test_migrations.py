@@ -0,0 +1,54 @@
+import sqlite3
+
+from database import MIGRATIONS, Database
+
+def _database_at(path, version):
+    """A file with the first version migrations applied, as an older release left it"""
+    conn = sqlite3.connect(path)
+    for statements in MIGRATIONS[:version]:
+        for statement in statements:
+            conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+    return conn
+
+def test_fresh_database_is_at_the_latest_version(tmp_path):
+    db = Database(str(tmp_path / "fresh.db"))
+    try:
+        with db.connection() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    finally:
+        db.close()
+
+def test_every_version_upgrades(tmp_path):
+    for version in range(len(MIGRATIONS)):
+        path = str(tmp_path / f"v{version}.db")
+        _database_at(path, version).close()
+        db = Database(path)
+        try:
+            plan_id = db.create_plan("s1", "Plan", 4, "5K")
+            db.save_workout_log(plan_id, 1, 1, actual_time=30, notes="upgraded")
+            assert db.search_notes("s1", "upgraded")
+        finally:
+            db.close()
+
+def test_orphaned_rows_are_removed_when_keys_are_enforced(tmp_path):
+    path = str(tmp_path / "orphans.db")
+    conn = _database_at(path, 12)
+    conn.execute("INSERT INTO training_plans (id, session_id, name, weeks, race_distance) VALUES ('p', 's1', 'Plan', 4, '5K')")
+    conn.execute("INSERT INTO workout_logs (id, plan_id, week, day, notes) VALUES ('a', 'p', 1, 1, 'kept')")
+    # Left behind by a plan deleted while foreign keys were off
+    conn.execute("INSERT INTO workout_logs (id, plan_id, week, day, notes) VALUES ('b', 'gone', 1, 1, 'orphan')")
+    conn.commit()
+    conn.close()
+    
+    db = Database(path)
+    try:
+        with db.connection() as conn:
+            assert [row[0] for row in conn.execute("SELECT id FROM workout_logs")] == ["a"]
+        assert db.delete_plan("p")
+        with db.connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM workout_logs").fetchone()[0] == 0
+    finally:
+        db.close()
@@ -0,0 +1,77 @@
+import pytest
+
+from database import SNIPPET_MARK_END, SNIPPET_MARK_START, notes_match_query
+
+def _cells(results):
+    return [(r["plan_id"], r["week"], r["day"]) for r in results]
+
+@pytest.fixture
+def plan_id(db):
+    plan_id = db.create_plan("s1", "Spring", 4, "10K")
+    db.save_workout_log(plan_id, 1, 1, actual_time=30, notes='tempo "near" the track* - felt OK')
+    db.save_workout_log(plan_id, 1, 2, actual_time=45, notes="hill repeats near the park")
+    db.save_workout_log(plan_id, 2, 3, actual_time=60, notes="long run, tempo finish")
+    return plan_id
+
+@pytest.mark.parametrize("query", ['"', '"tempo', "tempo*", "*", "-", "- tempo", "tempo NEAR",
+                                   "NEAR(tempo run)", "AND", "tempo OR", "notes:tempo", "^tempo", "(tempo"])
+def test_fts_syntax_in_queries_is_matched_literally(db, plan_id, query):
+    # Never raises, and operators are searched for as plain words
+    results = db.search_notes("s1", query)
+    assert all(r["plan_id"] == plan_id for r in results)
+
+def test_operator_words_are_plain_terms(db, plan_id):
+    assert sorted(_cells(db.search_notes("s1", "near"))) == [(plan_id, 1, 1), (plan_id, 1, 2)]
+    assert _cells(db.search_notes("s1", "tempo NEAR")) == [(plan_id, 1, 1)]
+    assert db.search_notes("s1", "tempo OR hill") == []
+
+def test_queries_without_words_return_nothing(db, plan_id):
+    assert notes_match_query("s1", '" * - ( )') is None
+    assert db.search_notes("s1", "*") == []
+    assert db.search_notes("s1", "") == []
+
+def test_last_term_is_a_prefix(db, plan_id):
+    assert sorted(_cells(db.search_notes("s1", "tem"))) == [(plan_id, 1, 1), (plan_id, 2, 3)]
+    assert _cells(db.search_notes("s1", "tempo fin")) == [(plan_id, 2, 3)]
+    assert db.search_notes("s1", "tem finish") == []
+
+def test_session_ids_with_quotes_stay_in_their_session(db, plan_id):
+    other = db.create_plan('s1" OR "x', "Other", 4, "5K")
+    db.save_workout_log(other, 1, 1, actual_time=20, notes="tempo")
+    assert _cells(db.search_notes('s1" OR "x', "tempo")) == [(other, 1, 1)]
+    assert other not in {r["plan_id"] for r in db.search_notes("s1", "tempo")}
+
+def test_snippets_mark_matches(db, plan_id):
+    (result,) = db.search_notes("s1", "hill")
+    assert f"{SNIPPET_MARK_START}hill{SNIPPET_MARK_END}" in result["snippet"]
+    assert result["plan_name"] == "Spring"
+
+def test_archived_and_live_results_are_merged(db, plan_id):
+    archived = db.create_plan("s1", "Autumn", 4, "10K")
+    db.save_workout_log(archived, 1, 1, actual_time=30, notes="tempo tempo tempo on the track")
+    db.save_workout_log(archived, 1, 2, actual_time=30, notes="easy")
+    assert db.archive_plan(archived)
+    
+    results = db.search_notes("s1", "tempo")
+    assert sorted(_cells(results)) == sorted([(plan_id, 1, 1), (plan_id, 2, 3), (archived, 1, 1)])
+    # One ranking across both indexes: the denser match comes first
+    assert _cells(results)[0] == (archived, 1, 1)
+    assert [r["rank"] for r in results] == sorted(r["rank"] for r in results)
+    assert results[0]["plan_name"] == "Autumn"
+    assert f"{SNIPPET_MARK_START}tempo{SNIPPET_MARK_END}" in results[0]["snippet"]
+    
+    assert len(db.search_notes("s1", "tempo", limit=2)) == 2
+    assert db.search_notes("s2", "tempo") == []
+
+def test_deleted_plans_drop_out_of_both_indexes(db, plan_id):
+    archived = db.create_plan("s1", "Autumn", 4, "10K")
+    db.save_workout_log(archived, 1, 1, actual_time=30, notes="tempo")
+    assert db.archive_plan(archived)
+    
+    db.delete_plan(archived, soft=True)
+    assert archived not in {r["plan_id"] for r in db.search_notes("s1", "tempo")}
+    db.undelete_plan(archived)
+    assert archived in {r["plan_id"] for r in db.search_notes("s1", "tempo")}
+    
+    db.delete_plan(plan_id)
+    assert {r["plan_id"] for r in db.search_notes("s1", "tempo")} == {archived}
@@ -0,0 +1,65 @@
+def _pages(db, session_id, prefix="", limit=2):
+    """Every page of a search, following the cursors"""
+    pages, cursor = [], None
+    while True:
+        plans, cursor = db.search_plans(session_id, prefix, after=cursor, limit=limit)
+        pages.append([plan["name"] for plan in plans])
+        if cursor is None:
+            return pages
+
+def _create(db, names, created_at="2026-03-01 07:00:00"):
+    plan_ids = [db.create_plan("s1", name, 4, "5K") for name in names]
+    # Same second for all of them, so only the id breaks the tie
+    with db.transaction() as cursor:
+        cursor.executemany("UPDATE training_plans SET created_at = ? WHERE id = ?",
+                           [(created_at, plan_id) for plan_id in plan_ids])
+    return plan_ids
+
+def test_ties_on_created_at_page_by_id(db):
+    plan_ids = _create(db, [f"Plan {i}" for i in range(5)])
+    by_id = {plan_id: f"Plan {i}" for i, plan_id in enumerate(plan_ids)}
+    expected = [by_id[plan_id] for plan_id in sorted(plan_ids, reverse=True)]
+    
+    pages = _pages(db, "s1")
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sum(pages, []) == expected
+
+def test_ties_on_name_ignore_case(db):
+    _create(db, ["Marathon", "marathon", "MARATHON", "Mile", "Half"])
+    pages = _pages(db, "s1", "ma")
+    assert [len(page) for page in pages] == [2, 1]
+    assert sorted(sum(pages, [])) == ["MARATHON", "Marathon", "marathon"]
+
+def test_last_page_has_no_cursor(db):
+    _create(db, ["A", "B", "C", "D"])
+    plans, cursor = db.search_plans("s1", limit=2)
+    plans, cursor = db.search_plans("s1", after=cursor, limit=2)
+    assert len(plans) == 2 and cursor is None
+    
+    # A page that ends exactly at the limit doesn't leave an empty page behind
+    assert len(_pages(db, "s1", limit=4)) == 1
+    assert db.search_plans("s2") == ([], None)
+
+def test_cursor_survives_deleting_its_plan(db):
+    _create(db, [f"Plan {i}" for i in range(3)], "2026-03-01 07:00:00")
+    _create(db, [f"Plan {i}" for i in range(3, 6)], "2026-03-02 07:00:00")
+    first, cursor = db.search_plans("s1", limit=3)
+    
+    # The cursor's plan and one not shown yet both go
+    db.delete_plan(first[-1]["id"])
+    rest, _ = db.search_plans("s1", limit=10)
+    db.delete_plan(rest[-1]["id"])
+    
+    second, cursor = db.search_plans("s1", after=cursor, limit=3)
+    assert cursor is None
+    assert {plan["id"] for plan in second} == {plan["id"] for plan in rest[2:-1]}
+    assert not {plan["id"] for plan in first} & {plan["id"] for plan in second}
+
+def test_cursor_skips_soft_deleted_plans(db):
+    plan_ids = _create(db, ["Alpha", "Amber", "Arrow", "Atlas"])
+    plans, cursor = db.search_plans("s1", "a", limit=2)
+    assert [plan["name"] for plan in plans] == ["Alpha", "Amber"]
+    
+    db.delete_plan(plan_ids[2], soft=True)
+    plans, cursor = db.search_plans("s1", "a", after=cursor, limit=2)
+    assert [plan["name"] for plan in plans] == ["Atlas"] and cursor is None
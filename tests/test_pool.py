@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from database import ConnectionPool, MemoryDatabase
+from export import register_export_routes
+
+def test_acquire_times_out_when_the_pool_is_exhausted():
+    pool = ConnectionPool(lambda: sqlite3.connect(":memory:"), max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+def test_streams_do_not_hold_pooled_connections():
+    db = MemoryDatabase(pool_size=1, pool_timeout=0.05, max_streams=2)
+    try:
+        for i in range(3):
+            db.create_plan("s1", f"Plan {i}", 4, "5K")
+        
+        # Two stalled exports, each read to its first row
+        exports = [db.export_plans("s1", chunk_size=1) for _ in range(2)]
+        assert all(next(rows)["session_id"] == "s1" for rows in exports)
+        
+        # The pool still serves requests, but a third export has to wait
+        assert db.get_plan(db.create_plan("s1", "Another", 4, "5K")) is not None
+        with pytest.raises(TimeoutError):
+            next(db.export_plans("s1"))
+        
+        exports[0].close()
+        assert len(list(db.export_plans("s1"))) == 4
+        assert all(row["session_id"] == "s1" for row in exports[1])
+    finally:
+        db.close()
+
+def test_export_route_answers_503_when_exports_are_busy():
+    db = MemoryDatabase(pool_timeout=0.05, max_streams=1)
+    try:
+        db.create_plan("s1", "Spring", 4, "5K")
+        server = Flask(__name__)
+        register_export_routes(server, db)
+        client = server.test_client()
+        
+        stalled = db.export_plans("s1")
+        next(stalled)
+        assert client.get("/export/plans.csv?session_id=s1").status_code == 503
+        
+        stalled.close()
+        response = client.get("/export/plans.csv?session_id=s1")
+        assert response.status_code == 200
+        assert response.data.count(b"\n") == 2
+    finally:
+        db.close()
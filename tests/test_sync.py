@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+def _stamp(offset_ms: int = 0) -> str:
+    moment = datetime.now(timezone.utc) + timedelta(milliseconds=offset_ms)
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+def _edit(plan_id, week=1, day=1, **fields):
+    return {"plan_id": plan_id, "week": week, "day": day, "actual_time": 30, "actual_distance": 3.1,
+            "distance_unit": "miles", "intensity": 3, "notes": "", "updated_at": _stamp(), **fields}
+
+def test_newer_edit_wins(storage):
+    plan_id = storage.create_plan("s1", "Plan", 4, "5K")
+    first = storage.sync_workout_logs([_edit(plan_id, actual_time=30, updated_at=_stamp(-2000))])
+    assert first[0]["applied"]
+    
+    older = storage.sync_workout_logs([_edit(plan_id, actual_time=99, updated_at=_stamp(-3000))])
+    assert not older[0]["applied"]
+    assert storage.get_workout_log(plan_id, 1, 1)["actual_time"] == 30
+    
+    newer = storage.sync_workout_logs([_edit(plan_id, actual_time=45, updated_at=_stamp(-1000))])
+    assert newer[0]["applied"]
+    assert storage.get_workout_log(plan_id, 1, 1)["actual_time"] == 45
+
+def test_edit_older_than_a_server_save_in_the_same_second_loses(storage):
+    plan_id = storage.create_plan("s1", "Plan", 4, "5K")
+    edited = _stamp()
+    storage.save_workout_log(plan_id, 1, 1, actual_time=50, actual_distance=5)
+    
+    result = storage.sync_workout_logs([_edit(plan_id, actual_time=20, updated_at=edited)])
+    assert not result[0]["applied"]
+    assert storage.get_workout_log(plan_id, 1, 1)["actual_time"] == 50
+
+def test_server_saves_store_milliseconds(storage):
+    plan_id = storage.create_plan("s1", "Plan", 4, "5K")
+    storage.save_workout_log(plan_id, 1, 1, actual_time=50)
+    storage.save_workout_logs([{"plan_id": plan_id, "week": 1, "day": 2, "actual_time": 10}])
+    for day in (1, 2):
+        assert len(storage.get_workout_log(plan_id, 1, day)["updated_at"]) == len("2026-01-01 00:00:00.000")
+
+def test_clock_ahead_is_capped(storage):
+    plan_id = storage.create_plan("s1", "Plan", 4, "5K")
+    ahead = _stamp(3600 * 1000)
+    assert storage.sync_workout_logs([_edit(plan_id, updated_at=ahead)])[0]["applied"]
+    assert storage.get_workout_log(plan_id, 1, 1)["updated_at"] < ahead
+    
+    # A later real edit still wins
+    time.sleep(0.005)
+    assert storage.sync_workout_logs([_edit(plan_id, actual_time=40, updated_at=_stamp(10))])[0]["applied"]
+
+@pytest.mark.parametrize("bad", [
+    {"actual_time": "fast"},
+    {"actual_distance": [1]},
+    {"updated_at": None},
+    {"updated_at": "yesterday"},
+    {"week": 5},
+    {"week": "two"},
+    {"day": 4},
+    {"intensity": 9},
+    {"distance_unit": "furlongs"},
+    {"plan_id": None},
+])
+def test_bad_log_is_rejected_without_failing_the_batch(storage, bad):
+    plan_id = storage.create_plan("s1", "Plan", 4, "5K")
+    batch = [_edit(plan_id, 1, 1), {**_edit(plan_id, 2, 2), **bad}, _edit(plan_id, 3, 3)]
+    results = storage.sync_workout_logs(batch)
+    
+    assert [result["applied"] for result in results] == [True, False, True]
+    assert results[1]["error"]
+    # The client matches results to its queue by what it sent
+    sent = batch[1]
+    assert [results[1][key] for key in ("plan_id", "week", "day", "updated_at")] == \
+        [sent["plan_id"], sent["week"], sent["day"], sent["updated_at"]]
+    assert storage.get_workout_log(plan_id, 2, 2) is None
+    assert storage.get_workout_log(plan_id, 3, 3)["actual_time"] == 30
+
+def test_missing_fields_are_rejected(storage):
+    plan_id = storage.create_plan("s1", "Plan", 4, "5K")
+    results = storage.sync_workout_logs([{"plan_id": plan_id, "week": 1}, "junk", _edit(plan_id)])
+    assert [result["applied"] for result in results] == [False, False, True]
+    assert results[1] == {"plan_id": None, "week": None, "day": None, "updated_at": None,
+                          "applied": False, "error": results[1]["error"]}
+
+def test_edits_to_deleted_plans_are_not_applied(storage):
+    plan_id = storage.create_plan("s1", "Plan", 4, "5K")
+    storage.delete_plan(plan_id, soft=True)
+    result = storage.sync_workout_logs([_edit(plan_id)])
+    assert not result[0]["applied"] and "error" not in result[0]
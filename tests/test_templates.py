@@ -0,0 +1,61 @@
+from templates import FALLBACK_WEEK, TemplateEngine, normalize_distance, scale_schedule
+
+# Six weeks: four build-up weeks, then cutback and race
+TEMPLATE = [(f"Easy {w}", f"Speed {w}", f"Long {w}") for w in range(1, 5)] + [
+    ("Cutback easy", "Cutback speed", "Cutback long"),
+    ("Shakeout", "Strides", "Race"),
+]
+
+def test_scaling_keeps_the_taper_and_stretches_the_build_up():
+    schedule = scale_schedule(TEMPLATE, 10)
+    assert len(schedule) == 10
+    assert schedule[-2:] == TEMPLATE[-2:]
+    # Each build-up week repeated twice, in order
+    assert schedule[:8] == [TEMPLATE[w // 2] for w in range(8)]
+
+def test_scaling_compresses_the_build_up():
+    schedule = scale_schedule(TEMPLATE, 4)
+    assert schedule == [TEMPLATE[0], TEMPLATE[2], *TEMPLATE[-2:]]
+
+def test_plans_no_longer_than_the_taper_get_its_last_weeks():
+    assert scale_schedule(TEMPLATE, 2) == TEMPLATE[-2:]
+    assert scale_schedule(TEMPLATE, 1) == TEMPLATE[-1:]
+    assert scale_schedule(TEMPLATE, 6) == TEMPLATE
+    assert scale_schedule([], 3) == [FALLBACK_WEEK] * 3
+
+def test_closest_template_length_is_scaled(db):
+    engine = TemplateEngine(db)
+    engine.save("Ultra", 6, TEMPLATE)
+    engine.save("Ultra", 12, [("Base", "Hills", "Back to back")] * 10 + TEMPLATE[-2:])
+    
+    assert engine.schedule("ultra", 6) == TEMPLATE
+    assert engine.schedule("ULTRA", 8) == scale_schedule(TEMPLATE, 8)
+    # Equally close to both: the longer template wins
+    assert engine.schedule("Ultra", 9)[0] == ("Base", "Hills", "Back to back")
+    assert len(engine.schedule("Ultra", 20)) == 20
+
+def test_templates_saved_elsewhere_show_up_after_the_check_interval(db):
+    engine = TemplateEngine(db, check_interval=3600)
+    version = engine.version
+    before = engine.schedule("Ultra", 6)
+    
+    # Another process writes straight to the table
+    db.save_workout_template(normalize_distance("Ultra"), 6, [list(week) for week in TEMPLATE])
+    assert engine.schedule("Ultra", 6) == before
+    
+    engine.check_interval = 0
+    assert engine.schedule("Ultra", 6) == TEMPLATE
+    assert engine.version == version + 1
+    
+    # Unchanged signature: no reload
+    engine.schedule("Ultra", 6)
+    assert engine.version == version + 1
+    
+    db.delete_workout_template(normalize_distance("Ultra"), 6)
+    assert engine.schedule("Ultra", 6) == before
+    assert engine.version == version + 2
+
+def test_short_template_weeks_are_padded(db):
+    db.save_workout_template("ultra", 2, [["Easy"], ["Easy", "Hills"]])
+    assert TemplateEngine(db).schedule("Ultra", 2) == [("Easy", "Tempo run", "Long run"),
+                                                       ("Easy", "Hills", "Long run")]
@@ -0,0 +1,90 @@
+import io
+
+import numpy as np
+import pytest
+
+from tracks import pack_track, parse_track, summarize_track, unpack_track
+
+# Three points 0.001 degrees of latitude (about 111 m) and a minute apart
+GPX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="47.0000000" lon="8.5000000"><ele>400.0</ele><time>2026-03-01T07:00:00Z</time></trkpt>
+    <trkpt lat="47.0010000" lon="8.5000000"><ele>402.5</ele><time>2026-03-01T07:01:00Z</time></trkpt>
+    <trkpt lat="47.0020000" lon="8.5000000"><ele>401.0</ele><time>2026-03-01T07:02:00Z</time></trkpt>
+  </trkseg></trk>
+</gpx>"""
+
+TCX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+  <Activities><Activity Sport="Running"><Lap StartTime="2026-03-01T07:00:00Z"><Track>
+    <Trackpoint><Time>2026-03-01T07:00:00Z</Time>
+      <Position><LatitudeDegrees>47.0</LatitudeDegrees><LongitudeDegrees>8.5</LongitudeDegrees></Position>
+      <AltitudeMeters>400.0</AltitudeMeters></Trackpoint>
+    <Trackpoint><Time>2026-03-01T07:01:00Z</Time>
+      <Position><LatitudeDegrees>47.001</LatitudeDegrees><LongitudeDegrees>8.5</LongitudeDegrees></Position>
+      <AltitudeMeters>402.5</AltitudeMeters></Trackpoint>
+    <Trackpoint><Time>2026-03-01T07:02:00Z</Time>
+      <Position><LatitudeDegrees>47.002</LatitudeDegrees><LongitudeDegrees>8.5</LongitudeDegrees></Position>
+      <AltitudeMeters>401.0</AltitudeMeters></Trackpoint>
+  </Track></Lap></Activity></Activities>
+</TrainingCenterDatabase>"""
+
+@pytest.mark.parametrize("data, fmt", [(GPX, "gpx"), (TCX, "tcx")])
+def test_pack_round_trip(data, fmt):
+    track = parse_track(io.BytesIO(data))
+    assert track["format"] == fmt
+    
+    decoded = unpack_track(pack_track(track))
+    assert decoded["time"] == pytest.approx(track["time"], abs=1e-3)
+    assert decoded["lat"] == pytest.approx(track["lat"], abs=1e-7)
+    assert decoded["lon"] == pytest.approx(track["lon"], abs=1e-7)
+    assert decoded["ele"] == pytest.approx(track["ele"], abs=0.01)
+
+@pytest.mark.parametrize("data", [GPX, TCX])
+def test_summary(data):
+    summary = summarize_track(parse_track(io.BytesIO(data)), split_m=100)
+    assert summary["points"] == 3
+    assert summary["started_at"] == "2026-03-01 07:00:00"
+    assert summary["distance_m"] == pytest.approx(222.4, abs=0.5)
+    assert summary["elapsed_s"] == summary["moving_s"] == 120
+    assert [round(split["distance_m"], 1) for split in summary["splits"]] == [100, 100, 22.4]
+    assert sum(split["duration_s"] for split in summary["splits"]) == pytest.approx(120)
+
+def test_missing_elevation_packs_as_interpolated():
+    track = parse_track(io.BytesIO(GPX.replace(b"<ele>402.5</ele>", b"")))
+    assert np.isnan(track["ele"][1])
+    assert unpack_track(pack_track(track))["ele"][1] == pytest.approx(400.5)
+
+@pytest.mark.parametrize("data", [b"name,time\nrun,30\n", b"<gpx></gpx>", GPX[:200]])
+def test_rejects_non_tracks(data):
+    with pytest.raises(ValueError):
+        parse_track(io.BytesIO(data))
+
+def test_unknown_encoding_is_rejected():
+    blob = pack_track(parse_track(io.BytesIO(GPX)))
+    with pytest.raises(ValueError, match="Unsupported track encoding"):
+        unpack_track(b"XXXX" + blob[4:])
+
+def test_attach_track_fills_in_the_log(db):
+    plan_id = db.create_plan("s1", "Spring", 4, "5K")
+    db.save_workout_log(plan_id, 1, 2, None, None, None, "km", 4, "hills")
+    
+    summary = db.attach_track(plan_id, 1, 2, io.BytesIO(GPX), "km")
+    assert summary["distance_m"] == pytest.approx(222.4, abs=0.5)
+    
+    log = db.get_workout_log(plan_id, 1, 2)
+    assert (log["actual_time"], log["actual_distance"], log["actual_pace"]) == (2.0, 0.22, 9.09)
+    assert (log["intensity"], log["notes"]) == (4, "hills")
+    assert db.get_track_cells(plan_id) == [(1, 2)]
+    
+    stored = db.get_track(plan_id, 1, 2, samples=True)
+    assert stored["elapsed_s"] == 120
+    assert stored["samples"]["lat"] == pytest.approx([47.0, 47.001, 47.002])
+
+def test_attach_rejects_a_non_gpx_upload(db):
+    plan_id = db.create_plan("s1", "Spring", 4, "5K")
+    with pytest.raises(ValueError):
+        db.attach_track(plan_id, 1, 1, io.BytesIO(b"not a track"), "miles")
+    assert db.get_workout_log(plan_id, 1, 1) is None
+    assert db.get_track(plan_id, 1, 1) is None
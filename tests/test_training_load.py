@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+import pytest
+
+from training_load import ACUTE_ALPHA, daily_series, ewma
+
+def _log(plan_id, week, day, created_at, minutes, intensity):
+    return {"id": f"{plan_id}-{week}-{day}", "plan_id": plan_id, "week": week, "day": day,
+            "actual_time": minutes, "actual_distance": 5.0, "actual_pace": None,
+            "distance_unit": "miles", "intensity": intensity, "notes": "", "created_at": created_at}
+
+def _loads(db, session_id):
+    return [(row["day"], round(row["load"], 6), round(row["acute"], 6), round(row["chronic"], 6))
+            for row in db.get_training_load(session_id)]
+
+def test_ewma_matches_the_recurrence():
+    loads = np.random.default_rng(1).uniform(0, 200, 300)
+    expected, state = [], 5.0
+    for load in loads:
+        state = state * (1 - ACUTE_ALPHA) + ACUTE_ALPHA * load
+        expected.append(state)
+    assert ewma(loads, ACUTE_ALPHA, 5.0) == pytest.approx(expected)
+
+def test_incremental_updates_match_a_full_rebuild(db):
+    rng = random.Random(7)
+    plans = [db.create_plan("s1", f"Plan {n}", 12, "10K") for n in range(2)]
+    db.get_training_load("s1")
+    
+    # Batches in date order, then edits and late entries on earlier days
+    for week in range(1, 13):
+        db.save_workout_logs([
+            _log(plans[week % 2], week, day, f"2026-03-{week * 2:02d} 07:00:00", rng.randint(20, 90), rng.randint(1, 5))
+            for day in range(1, 4)
+        ])
+    for _ in range(20):
+        week, day = rng.randint(1, 12), rng.randint(1, 3)
+        db.save_workout_logs([_log(plans[week % 2], week, day, f"2026-02-{rng.randint(1, 28):02d} 18:00:00",
+                                   rng.randint(20, 90), rng.choice([None, 1, 3, 5]))])
+    db.save_workout_log(plans[0], 2, 1, actual_time=45, actual_distance=6, intensity=4)
+    db.save_workout_log(plans[0], 2, 1, actual_time=50, actual_distance=6, intensity=2)
+    db.save_workout_log(plans[1], 1, 2, actual_time=30, actual_distance=3)
+    
+    incremental = _loads(db, "s1")
+    assert incremental
+    db.rebuild_training_load("s1")
+    assert _loads(db, "s1") == incremental
+
+def test_deleted_plans_leave_the_training_load(db):
+    kept = db.create_plan("s1", "Kept", 4, "5K")
+    dropped = db.create_plan("s1", "Dropped", 4, "5K")
+    db.save_workout_logs([_log(kept, 1, 1, "2026-03-01 07:00:00", 30, 3),
+                          _log(dropped, 1, 1, "2026-03-01 08:00:00", 60, 5)])
+    assert [row["load"] for row in db.get_training_load("s1")] == [pytest.approx(390.0)]
+    
+    db.delete_plan(dropped, soft=True)
+    assert [row["load"] for row in db.get_training_load("s1")] == [pytest.approx(90.0)]
+
+def test_daily_series_decays_between_rows():
+    rows = [{"day": 100, "load": 60.0, "acute": 15.0, "chronic": 4.0},
+            {"day": 103, "load": 30.0, "acute": 17.0, "chronic": 5.5}]
+    series = daily_series(rows, end_day=105)
+    assert len(series["day"]) == 6
+    assert series["load"].tolist() == [60.0, 0.0, 0.0, 30.0, 0.0, 0.0]
+    assert series["acute"][2] == pytest.approx(15.0 * (1 - ACUTE_ALPHA) ** 2)
@@ -0,0 +1,36 @@
+from database import MemoryDatabase
+
+def test_saves_are_group_committed_and_read_back():
+    db = MemoryDatabase(write_behind=True)
+    try:
+        plan_id = db.create_plan("s1", "Plan", 4, "5K")
+        for day in (1, 2, 3):
+            db.save_workout_log(plan_id, 1, day, actual_time=10 * day)
+        # Queued saves are visible before they are committed
+        assert db.get_workout_log(plan_id, 1, 3)["actual_time"] == 30
+        
+        db.flush()
+        assert db.pending_writes(plan_id) == 0
+        assert sorted(db.get_completed_cells(plan_id)) == [(1, 1), (1, 2), (1, 3)]
+        assert db.write_behind_stats()["writes"] == 3
+    finally:
+        db.close()
+
+def test_a_bad_save_does_not_sink_its_batch():
+    db = MemoryDatabase(write_behind=True)
+    try:
+        plan_id = db.create_plan("s1", "Plan", 4, "5K")
+        # Hold the batch open so the bad save shares it with the good ones
+        db.write_queue.linger = 0.2
+        db.save_workout_log(plan_id, 1, 1, actual_time=30)
+        db.save_workout_log("no-such-plan", 1, 1, actual_time=30)
+        db.save_workout_log(plan_id, 1, 2, actual_time=40)
+        db.flush()
+        
+        stats = db.write_behind_stats()
+        assert stats["errors"] == 1
+        assert stats["max_batch_size"] == 3
+        assert sorted(db.get_completed_cells(plan_id)) == [(1, 1), (1, 2)]
+        assert db.write_queue.pending_log("no-such-plan", 1, 1) is None
+    finally:
+        db.close()
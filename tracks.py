@@ -0,0 +1,185 @@
+"""GPS tracks (GPX or TCX) attached to workout logs.
+
+Files are parsed as a stream with iterparse, clearing each point once it
+is read, so memory grows with the number of points rather than the size
+of the document. Points are stored as one compressed blob per workout:
+
+    b"KRTK" | version (uint8) | points (uint32) | start, epoch ms (int64) | zlib(columns)
+
+with delta-encoded int32 columns for time (ms), latitude and longitude
+(1e-7 degrees, about 1 cm) and elevation (cm). Distances, splits,
+moving time and elevation gain are computed over whole arrays.
+"""
+import struct
+import zlib
+from array import array
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, List, Union
+from xml.etree import ElementTree
+
+import numpy as np
+
+TRACK_MAGIC = b"KRTK"
+TRACK_VERSION = 1
+TRACK_HEADER = struct.Struct("<4sBIq")
+COORD_SCALE = 1e7
+
+EARTH_RADIUS_M = 6371008.8
+# Slower than this between two points counts as stopped
+MOVING_SPEED_MPS = 0.5
+# Points averaged to smooth GPS elevation noise before summing climbs
+ELEVATION_WINDOW = 5
+
+# Local tag names of one point and of the element holding consecutive points
+POINT_TAGS = {"trkpt": "gpx", "Trackpoint": "tcx"}
+SEGMENT_TAGS = {"trkseg", "Track"}
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+def _timestamp(text: str) -> float:
+    """Epoch seconds of an ISO 8601 time; naive times are taken as UTC"""
+    parsed = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def parse_track(source: Union[str, BinaryIO]) -> Dict[str, np.ndarray]:
+    """Read the timed, positioned points of a GPX or TCX file
+    
+    Returns "time" (epoch seconds), "lat", "lon" and "ele" (meters,
+    NaN where missing) arrays plus the detected "format".
+    """
+    times, lats, lons, eles = array("d"), array("d"), array("d"), array("d")
+    fmt = None
+    segment = None
+    try:
+        for event, elem in ElementTree.iterparse(source, events=("start", "end")):
+            tag = _local(elem.tag)
+            if event == "start":
+                if tag in SEGMENT_TAGS:
+                    segment = elem
+                continue
+            if tag not in POINT_TAGS:
+                continue
+            
+            fmt = POINT_TAGS[tag]
+            values = {"lat": elem.get("lat"), "lon": elem.get("lon")}
+            for child in elem.iter():
+                name = _local(child.tag)
+                if name in ("time", "Time"):
+                    values["time"] = child.text
+                elif name in ("ele", "AltitudeMeters"):
+                    values["ele"] = child.text
+                elif name == "LatitudeDegrees":
+                    values["lat"] = child.text
+                elif name == "LongitudeDegrees":
+                    values["lon"] = child.text
+            
+            # Points without a time or position (e.g. treadmill TCX) can't place a split
+            if values.get("time") and values["lat"] and values["lon"]:
+                times.append(_timestamp(values["time"]))
+                lats.append(float(values["lat"]))
+                lons.append(float(values["lon"]))
+                eles.append(float(values["ele"]) if values.get("ele") else np.nan)
+            
+            # Drop the point and its now-empty slot in the segment
+            elem.clear()
+            if segment is not None:
+                segment.clear()
+    except ElementTree.ParseError as e:
+        raise ValueError(f"Not a valid GPX or TCX file: {e}") from None
+    
+    if len(times) < 2:
+        raise ValueError("The track has fewer than two timed GPS points")
+    
+    time = np.frombuffer(times)
+    order = np.argsort(time, kind="stable")
+    return {
+        "format": fmt,
+        "time": time[order],
+        "lat": np.frombuffer(lats)[order],
+        "lon": np.frombuffer(lons)[order],
+        "ele": np.frombuffer(eles)[order],
+    }
+
+def pack_track(track: Dict[str, np.ndarray]) -> bytes:
+    """Encode a parsed track as a compact blob"""
+    time_ms = np.round(track["time"] * 1000).astype(np.int64)
+    ele = track["ele"]
+    valid = ~np.isnan(ele)
+    # Gaps are filled in; a track without any elevation stores zeros
+    if valid.any() and not valid.all():
+        ele = np.interp(np.arange(len(ele)), np.flatnonzero(valid), ele[valid])
+    ele_cm = np.round(np.nan_to_num(ele) * 100).astype(np.int64)
+    
+    columns = [time_ms - time_ms[0],
+               np.round(track["lat"] * COORD_SCALE).astype(np.int64),
+               np.round(track["lon"] * COORD_SCALE).astype(np.int64),
+               ele_cm]
+    # Neighbouring points differ little, so deltas compress well
+    body = b"".join(np.diff(column, prepend=0).astype("<i4").tobytes() for column in columns)
+    header = TRACK_HEADER.pack(TRACK_MAGIC, TRACK_VERSION, len(time_ms), int(time_ms[0]))
+    return header + zlib.compress(body)
+
+def unpack_track(blob: bytes) -> Dict[str, np.ndarray]:
+    """Decode a blob written by pack_track"""
+    magic, version, points, start_ms = TRACK_HEADER.unpack_from(blob)
+    if magic != TRACK_MAGIC or version != TRACK_VERSION:
+        raise ValueError("Unsupported track encoding")
+    
+    deltas = np.frombuffer(zlib.decompress(blob[TRACK_HEADER.size:]), dtype="<i4").reshape(4, points)
+    time_ms, lat, lon, ele_cm = np.cumsum(deltas, axis=1, dtype=np.int64)
+    return {
+        "time": (time_ms + start_ms) / 1000.0,
+        "lat": lat / COORD_SCALE,
+        "lon": lon / COORD_SCALE,
+        "ele": ele_cm / 100.0,
+    }
+
+def segment_lengths(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Haversine distance in meters between consecutive points"""
+    phi = np.radians(lat)
+    half_dphi = np.diff(phi) / 2
+    half_dlambda = np.diff(np.radians(lon)) / 2
+    a = np.sin(half_dphi) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def elevation_gain(ele: np.ndarray) -> float:
+    """Total climb in meters after smoothing, ignoring missing elevations"""
+    ele = ele[~np.isnan(ele)]
+    if len(ele) < 2:
+        return 0.0
+    window = min(ELEVATION_WINDOW, len(ele))
+    smoothed = np.convolve(ele, np.ones(window) / window, mode="valid")
+    return float(np.clip(np.diff(smoothed), 0, None).sum())
+
+def splits(distance: np.ndarray, time: np.ndarray, split_m: float) -> List[Dict[str, float]]:
+    """Time for each split_m of cumulative distance; the last split may be partial"""
+    total = float(distance[-1])
+    marks = np.arange(split_m, total, split_m)
+    # Crossing times of each split boundary, interpolated between points
+    ends = np.concatenate([np.interp(marks, distance, time), time[-1:]])
+    durations = np.diff(ends, prepend=time[0])
+    lengths = np.diff(np.concatenate([marks, [total]]), prepend=0.0)
+    return [{"distance_m": float(length), "duration_s": float(duration)}
+            for length, duration in zip(lengths, durations) if length > 0]
+
+def summarize_track(track: Dict[str, np.ndarray], split_m: float = 1609.344) -> Dict:
+    """Distance, elapsed and moving time, elevation gain and splits of a track"""
+    time = track["time"]
+    lengths = segment_lengths(track["lat"], track["lon"])
+    gaps = np.diff(time)
+    moving = lengths >= MOVING_SPEED_MPS * gaps
+    distance = np.concatenate([[0.0], np.cumsum(lengths)])
+    
+    return {
+        "points": len(time),
+        "started_at": datetime.fromtimestamp(time[0], timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "distance_m": float(distance[-1]),
+        "elapsed_s": float(time[-1] - time[0]),
+        "moving_s": float(gaps[moving].sum()),
+        "elevation_gain_m": elevation_gain(track["ele"]),
+        "split_m": split_m,
+        "splits": splits(distance, time, split_m),
+    }
@@ -0,0 +1,81 @@
+"""Acute and chronic training load per session.
+
+A workout's load is its minutes × intensity, counted on the day it was
+logged (the log's created_at, in UTC). Acute load (fatigue) and chronic
+load (fitness) are exponentially weighted moving averages of daily load
+over ACUTE_DAYS and CHRONIC_DAYS, with alpha = 2 / (days + 1):
+
+    ewma[d] = ewma[d - 1] * (1 - alpha) + alpha * load[d]
+
+Database keeps one row per day with load, holding that day's averages,
+so a save on the latest day updates them in O(1) and an edit to an
+older day recomputes only from that day on. This module expands those
+rows into daily series.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+ACUTE_ALPHA = 2 / (ACUTE_DAYS + 1)
+CHRONIC_ALPHA = 2 / (CHRONIC_DAYS + 1)
+
+# Days per block of ewma; (1 - alpha) ** -BLOCK stays far from overflowing
+BLOCK = 64
+
+def current_day() -> int:
+    """Today's UTC day number"""
+    return int(np.datetime64("now", "D").astype(np.int64))
+
+def days_since_epoch(timestamps) -> np.ndarray:
+    """UTC day numbers of 'YYYY-MM-DD ...' timestamps"""
+    return np.array([str(t)[:10] for t in timestamps], dtype="datetime64[D]").astype(np.int64)
+
+def ewma(loads: np.ndarray, alpha: float, initial: float = 0.0) -> np.ndarray:
+    """Exponentially weighted moving average of consecutive daily loads
+    
+    initial is the average on the day before loads[0]. Each block uses
+    the closed form initial * r^k + alpha * sum(r^(k-j) * load[j]), with
+    r = 1 - alpha, so the only Python loop is over blocks.
+    """
+    out = np.empty(len(loads))
+    powers = (1 - alpha) ** np.arange(1, BLOCK + 1)
+    state = initial
+    for start in range(0, len(loads), BLOCK):
+        block = loads[start:start + BLOCK]
+        scale = powers[:len(block)]
+        out[start:start + len(block)] = scale * (state + alpha * np.cumsum(block / scale))
+        state = out[start + len(block) - 1]
+    return out
+
+def daily_series(rows: List[Dict], end_day: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Expand Database.get_training_load rows into one value per day
+    
+    Days without a row decay from the previous row. The series runs from
+    the first row to end_day (default: the last row).
+    """
+    if not rows:
+        return {name: np.empty(0) for name in ("day", "load", "acute", "chronic", "ratio")}
+    
+    row_days = np.array([row["day"] for row in rows], dtype=np.int64)
+    end_day = max(int(row_days[-1]), end_day if end_day is not None else 0)
+    days = np.arange(row_days[0], end_day + 1)
+    # Latest row on or before each day, and how long ago it was
+    index = np.searchsorted(row_days, days, side="right") - 1
+    elapsed = days - row_days[index]
+    
+    load = np.zeros(len(days))
+    load[row_days - row_days[0]] = [row["load"] for row in rows]
+    acute = np.array([row["acute"] for row in rows])[index] * (1 - ACUTE_ALPHA) ** elapsed
+    chronic = np.array([row["chronic"] for row in rows])[index] * (1 - CHRONIC_ALPHA) ** elapsed
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(chronic > 0, acute / chronic, np.nan)
+    
+    return {
+        "day": days.astype("datetime64[D]"),
+        "load": load,
+        "acute": acute,
+        "chronic": chronic,
+        "ratio": ratio,
+    }
@@ -0,0 +1,144 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling the writer thread to stop
+_STOP = object()
+
+class WriteBehindQueue:
+    """Background writer that group-commits queued workout saves
+    
+    Saves are applied in batches of up to max_batch logs, one transaction
+    (and one fsync) per batch. The writer waits up to linger seconds for
+    more saves to join a batch. Until a save is committed it stays visible
+    through pending_log/pending_cells, so reads see their own writes.
+    """
+    
+    def __init__(self, db, max_batch: int = 256, linger: float = 0.005):
+        self.db = db
+        self.max_batch = max_batch
+        self.linger = linger
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        self.writes = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        
+        self._thread = threading.Thread(target=self._run, name="krunner-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, log: Dict):
+        """Queue a log for the next batch"""
+        if self._closed:
+            raise RuntimeError("write-behind queue is closed")
+        key = (log['plan_id'], log['week'], log['day'])
+        with self._lock:
+            self._pending[key] = log
+        self._queue.put(log)
+    
+    def pending_log(self, plan_id: str, week: int, day: int) -> Optional[Dict]:
+        """The queued, not yet committed log for a cell, if any"""
+        with self._lock:
+            return self._pending.get((plan_id, week, day))
+    
+    def pending_logs(self, plan_id: str) -> List[Dict]:
+        """Queued, not yet committed logs for a plan"""
+        with self._lock:
+            return [log for key, log in self._pending.items() if key[0] == plan_id]
+    
+    def pending_cells(self, plan_id: str) -> List[Tuple[int, int]]:
+        """(week, day) of queued, not yet committed logs for a plan"""
+        with self._lock:
+            return [(key[1], key[2]) for key in self._pending if key[0] == plan_id]
+    
+    def flush(self):
+        """Block until everything queued so far is committed"""
+        self._queue.join()
+    
+    def close(self):
+        """Commit what is queued and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+    
+    def stats(self) -> Dict[str, int]:
+        """Queue depth and batch-size counters"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "pending": pending,
+            "writes": self.writes,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+        }
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            
+            # Gather whatever else arrives within the linger window
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            
+            self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                return
+    
+    def _commit(self, batch: List[Dict]):
+        try:
+            self.db.save_workout_logs(batch)
+        except Exception:
+            # Fall back to one transaction per log so one bad row cannot sink the batch
+            logger.exception("Write-behind batch of %d failed; retrying individually", len(batch))
+            for log in batch:
+                try:
+                    self.db.save_workout_logs([log])
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Dropping workout save for %s week %s day %s",
+                                     log['plan_id'], log['week'], log['day'])
+        
+        with self._lock:
+            for log in batch:
+                key = (log['plan_id'], log['week'], log['day'])
+                # A newer save for the same cell may already be queued
+                if self._pending.get(key) is log:
+                    del self._pending[key]
+        
+        self.writes += len(batch)
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))